@@ -0,0 +1,84 @@
+"""
+Benchmark the merge step: lossless stream copy (remux) against re-encoding.
+
+It generates a synthetic H.264 video and an AAC audio file with ffmpeg,
+then times `VideoService.merging` on copies of them with both paths.
+
+Usage (with pyutube installed, ex: `pip install -e .`):
+    $ python benchmarks/bench_merge.py --seconds 30 --size 1920x1080 --runs 3
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from moviepy.config import FFMPEG_BINARY
+
+from pyutube.services.VideoService import VideoService
+
+
+def make_inputs(directory: str, seconds: int, size: str) -> tuple[str, str]:
+    """
+    Generate the synthetic video and audio files used by the benchmark.
+
+    Returns:
+        tuple[str, str]: The paths of the video and audio files.
+    """
+    video_path = os.path.join(directory, "source_video.mp4")
+    audio_path = os.path.join(directory, "source_audio.m4a")
+
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", video_path,
+    ], check=True)
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:a", "aac", audio_path,
+    ], check=True)
+
+    return video_path, audio_path
+
+
+def time_merge(directory: str, video_path: str, audio_path: str, remux: bool) -> float:
+    """
+    Time one merge on fresh copies of the inputs, since merging removes them.
+
+    Returns:
+        float: The merge time in seconds.
+    """
+    work_directory = tempfile.mkdtemp(dir=directory)
+    shutil.copy(video_path, os.path.join(work_directory, "bench_1080p.mp4"))
+    shutil.copy(audio_path, os.path.join(work_directory, "bench_audio.m4a"))
+
+    service = VideoService("", None, work_directory)
+    start = time.perf_counter()
+    service.merging("bench_1080p.mp4", "bench_audio.m4a", codecs=("avc1.640028", "mp4a.40.2"), remux=remux)
+    elapsed = time.perf_counter() - start
+
+    shutil.rmtree(work_directory)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=30, help="Length of the synthetic media")
+    parser.add_argument("--size", default="1920x1080", help="Size of the synthetic video")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs for each path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        video_path, audio_path = make_inputs(directory, args.seconds, args.size)
+
+        for name, remux in (("remux", True), ("re-encode", False)):
+            times = [time_merge(directory, video_path, audio_path, remux) for _ in range(args.runs)]
+            print(f"{name:>10}: median {statistics.median(times):.3f}s  min {min(times):.3f}s  ({args.runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
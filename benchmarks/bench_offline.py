@@ -0,0 +1,303 @@
+"""
+Benchmark the download paths offline, against the local YouTube stand-in of `standin.py`.
+
+Scenarios:
+    single_video  a video download with the video and audio streams, and the merge
+    audio_only    an audio-only download
+    playlist      a playlist of audio-only videos (1000 by default), listed page by page
+                  and downloaded through the worker pool, like a job of `pyutube serve`
+    merge         the remux of the downloaded streams alone
+    stream_merge  a video download merged while it downloads (`--stream-merge`)
+
+The requests of pytubefix for youtube.com (the watch pages, the player JS, the
+innertube API and the playlist pages) are sent to the stand-in, so the video
+info and the playlist pages are fetched and parsed on every run, like from
+YouTube. The metadata cache is disabled, and pyutube keeps its files and
+pytubefix its OAuth token in temporary directories, so nothing is requested
+from YouTube and the user's cache, archive and token are not touched.
+
+The results are written as JSON, and can be compared with an earlier run.
+
+Usage (with pyutube installed, ex: `pip install -e .`):
+    $ python benchmarks/bench_offline.py --output results.json
+    $ python benchmarks/bench_offline.py --bandwidth 2M --latency 0.05 --compare results.json
+    $ python benchmarks/bench_offline.py --scenarios playlist --items 200 --jobs 8
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from moviepy.config import FFMPEG_BINARY
+
+from standin import URL_LIFETIME, StandInServer
+
+VIDEO_ITAG = 137
+AUDIO_ITAG = 140
+PLAYLIST_AUDIO_ITAG = 139
+PLAYLIST_ID = "PLpyutubeStandIn"
+SCENARIOS = ("single_video", "audio_only", "playlist", "merge", "stream_merge")
+
+
+def parse_size(text: str) -> float:
+    """
+    Parse a size like `500k`, `2M` or `0` into bytes.
+    """
+    units = {"k": 1024, "m": 1024 * 1024, "g": 1024 * 1024 * 1024}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def make_media(directory: str, seconds: int, size: str, audio_seconds: int) -> dict:
+    """
+    Generate fragmented mp4 streams like the YouTube adaptive streams.
+
+    Returns:
+        dict: The bytes of the video, the audio and the short playlist audio.
+    """
+    fragmented = ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"]
+    paths = {name: os.path.join(directory, f"{name}.mp4") for name in ("video", "audio", "playlist_audio")}
+
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", *fragmented, paths["video"],
+    ], check=True)
+    for name, duration in (("audio", seconds), ("playlist_audio", audio_seconds)):
+        subprocess.run([
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:a", "aac", *fragmented, paths[name],
+        ], check=True)
+
+    media = {}
+    for name, path in paths.items():
+        with open(path, "rb") as file:
+            media[name] = file.read()
+    return media
+
+
+class Benchmark:
+    def __init__(self, args, work_directory: str, media: dict):
+        self.args = args
+        self.work_directory = work_directory
+        self.media = media
+        self.server = StandInServer(
+            {VIDEO_ITAG: media["video"], AUDIO_ITAG: media["audio"], PLAYLIST_AUDIO_ITAG: media["playlist_audio"]},
+            bandwidth=parse_size(args.bandwidth),
+            latency=args.latency,
+            throttle_after=int(parse_size(args.throttle_after)),
+            throttle_rate=parse_size(args.throttle_rate),
+        ).start()
+
+        self.server.add_video("benchvideo0", "Bench video", args.seconds, (VIDEO_ITAG, AUDIO_ITAG))
+        self.playlist_ids = [f"bench{index:06d}" for index in range(args.items)]
+        for index, video_id in enumerate(self.playlist_ids):
+            self.server.add_video(
+                video_id, f"Bench playlist video {index:04d}", args.audio_seconds, (VIDEO_ITAG, PLAYLIST_AUDIO_ITAG))
+        self.server.add_playlist(PLAYLIST_ID, "Bench playlist", self.playlist_ids)
+
+        # pyutube keeps its cache and archive in these directories
+        os.environ["XDG_CACHE_HOME"] = os.path.join(work_directory, "cache")
+        os.environ["XDG_DATA_HOME"] = os.path.join(work_directory, "data")
+        os.environ["LOCALAPPDATA"] = os.environ["XDG_CACHE_HOME"]
+        os.environ["APPDATA"] = os.environ["XDG_DATA_HOME"]
+        # Every run fetches the video info, the cache would skip it after the first one
+        os.environ["PYUTUBE_NO_CACHE"] = "1"
+
+        from pytubefix import innertube
+
+        from pyutube.utils import get_session
+
+        # pyutube signs in with OAuth, the stand-in takes any token that did not expire
+        innertube._token_file = os.path.join(work_directory, "tokens.json")
+        with open(innertube._token_file, "w", encoding="utf-8") as file:
+            json.dump({"access_token": "standin", "refresh_token": "standin",
+                       "expires": time.time() + URL_LIFETIME, "visitorData": None, "po_token": None}, file)
+
+        self.server.route(get_session())
+
+    def output_directory(self) -> str:
+        return tempfile.mkdtemp(dir=self.work_directory, prefix="out-")
+
+    def download_service(self, url, path, **options):
+        from pyutube.services.DownloadService import DownloadService
+
+        return DownloadService(
+            url, path, "best", show_progress=False, interactive=False,
+            connections=self.args.connections, jobs=self.args.jobs, prefetch=self.args.prefetch, **options)
+
+    def run_single_video(self, stream_merge: bool = False) -> bool:
+        service = self.download_service(
+            "https://www.youtube.com/watch?v=benchvideo0", self.output_directory(), stream_merge=stream_merge)
+        return bool(service.download())
+
+    def run_audio_only(self) -> bool:
+        service = self.download_service(
+            "https://www.youtube.com/watch?v=benchvideo0", self.output_directory(), is_audio=True)
+        return bool(service.download())
+
+    def run_playlist(self) -> bool:
+        from pyutube.handlers.BatchHandler import BatchHandler
+
+        url = f"https://www.youtube.com/playlist?list={PLAYLIST_ID}"
+        batch_handler = BatchHandler(url)
+        service = self.download_service(None, self.output_directory(), is_audio=True)
+        results = []
+        succeeded = service.download_batch(batch_handler.iter_video_ids([url]), results)
+        return succeeded and len(results) == len(self.playlist_ids) and not batch_handler.rejected
+
+    def run_stream_merge(self) -> bool:
+        return self.run_single_video(stream_merge=True)
+
+    def prepare_merge(self) -> str:
+        directory = self.output_directory()
+        with open(os.path.join(directory, "bench_1080p.mp4"), "wb") as file:
+            file.write(self.media["video"])
+        with open(os.path.join(directory, "bench_audio.m4a"), "wb") as file:
+            file.write(self.media["audio"])
+        return directory
+
+    def run_merge(self, directory: str) -> bool:
+        from pyutube.services.VideoService import VideoService
+
+        service = VideoService("", None, directory)
+        service.merging("bench_1080p.mp4", "bench_audio.m4a", codecs=("avc1.640028", "mp4a.40.2"))
+        return True
+
+    def run(self, scenario: str) -> dict:
+        """
+        Run a scenario `--runs` times.
+
+        Returns:
+            dict: The times, bytes, requests and connections of the runs.
+        """
+        from pyutube.utils import get_connection_stats
+
+        times = []
+        succeeded = True
+        requests_before, bytes_before = self.server.requests, self.server.bytes_sent
+        connections_before = sum(host["connections"] for host in get_connection_stats().values())
+
+        for _ in range(self.args.runs):
+            if scenario == "merge":
+                directory = self.prepare_merge()
+                start = time.perf_counter()
+                succeeded = self.run_merge(directory) and succeeded
+            else:
+                start = time.perf_counter()
+                succeeded = getattr(self, f"run_{scenario}")() and succeeded
+            times.append(time.perf_counter() - start)
+
+        runs = self.args.runs
+        bytes_sent = (self.server.bytes_sent - bytes_before) // runs
+        median = statistics.median(times)
+        return {
+            "succeeded": succeeded,
+            "times": times,
+            "median": median,
+            "min": min(times),
+            "bytes": bytes_sent,
+            "throughput": bytes_sent / median if median else 0,
+            "requests": (self.server.requests - requests_before) // runs,
+            "connections": (sum(host["connections"] for host in get_connection_stats().values())
+                            - connections_before) // runs,
+        }
+
+    def close(self) -> None:
+        self.server.stop()
+
+
+def compare(results: dict, previous: dict) -> None:
+    """
+    Print the median time of each scenario against an earlier run.
+    """
+    print("\nCompared with the earlier run:")
+    for scenario, result in results["scenarios"].items():
+        old = previous.get("scenarios", {}).get(scenario)
+        if not old or not old.get("median"):
+            continue
+        ratio = result["median"] / old["median"]
+        print(f"{scenario:>14}: {old['median']:.3f}s -> {result['median']:.3f}s  ({ratio:.2f}x the time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated scenarios to run")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs for each scenario")
+    parser.add_argument("--seconds", type=int, default=30, help="Length of the synthetic video")
+    parser.add_argument("--size", default="1280x720", help="Size of the synthetic video")
+    parser.add_argument("--items", type=int, default=1000, help="Number of videos of the playlist scenario")
+    parser.add_argument("--audio-seconds", type=int, default=3, help="Length of the playlist videos")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of videos downloaded at once")
+    parser.add_argument("--connections", type=int, default=4, help="Number of connections for each stream")
+    parser.add_argument("--prefetch", type=int, default=2, help="Number of videos prefetched ahead")
+    parser.add_argument("--bandwidth", default="0", help="Bytes per second of each response, like 2M")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds before each response starts")
+    parser.add_argument("--throttle-after", default="0", help="Bytes of each response sent at full speed")
+    parser.add_argument("--throttle-rate", default="0", help="Bytes per second of a throttled response")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare the results with this earlier JSON file")
+    args = parser.parse_args()
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from pyutube.utils import __version__, console, error_console, use_shared_session
+
+    use_shared_session()
+    work_directory = tempfile.mkdtemp(prefix="pyutube-bench-")
+    benchmark = None
+    try:
+        media = make_media(work_directory, args.seconds, args.size, args.audio_seconds)
+        benchmark = Benchmark(args, work_directory, media)
+
+        results = {
+            "created_at": time.time(),
+            "pyutube": __version__,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "scenarios": {},
+        }
+
+        for scenario in scenarios:
+            # The download messages would bury the results
+            console.quiet = error_console.quiet = True
+            try:
+                result = benchmark.run(scenario)
+            finally:
+                console.quiet = error_console.quiet = False
+
+            results["scenarios"][scenario] = result
+            # `\r\033[K` clears the line of the spinners
+            print(f"\r\033[K{scenario:>14}: median {result['median']:.3f}s  min {result['min']:.3f}s  "
+                  f"{result['throughput'] / 1024 / 1024:.1f} MiB/s  {result['requests']} requests  "
+                  f"{result['connections']} connections{'' if result['succeeded'] else '  (FAILED)'}")
+    finally:
+        if benchmark is not None:
+            benchmark.close()
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
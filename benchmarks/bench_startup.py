@@ -0,0 +1,96 @@
+"""
+Benchmark the cold-start time of the pyutube CLI with `python -X importtime`.
+
+Scenarios:
+    version      `pyutube --version`
+    invalid_url  `pyutube <invalid URL>`
+    audio_only   the modules loaded by an audio-only download, without the network part
+
+For each scenario it reports the median wall time, the total import time,
+and which heavy modules were loaded.
+
+Usage (with pyutube installed, ex: `pip install -e .`):
+    $ python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+SCENARIOS = {
+    "version": ["-m", "pyutube", "--version"],
+    "invalid_url": ["-m", "pyutube", "https://example.com/not-a-youtube-link"],
+    "audio_only": ["-c", "import pyutube.cli; import pyutube.services.DownloadService"],
+}
+HEAVY_MODULES = ("moviepy", "pytubefix", "inquirer", "requests", "yaspin")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Parse the `-X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_scenario(arguments: list, runs: int) -> dict:
+    """
+    Run a scenario several times in fresh interpreters.
+
+    Returns:
+        dict: The median wall time, the median import time, and the loaded heavy modules.
+    """
+    wall_times = []
+    import_times = []
+    modules = {}
+    # The update check runs in the background and may upgrade packages at exit
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", PYUTUBE_NO_UPDATE_CHECK="1")
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *arguments],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True, env=env, timeout=120,
+        )
+        wall_times.append(time.perf_counter() - start)
+
+        modules = parse_importtime(result.stderr)
+        import_times.append(sum(self_us for self_us, _ in modules.values()) / 1e6)
+
+    return {
+        "wall_time": statistics.median(wall_times),
+        "import_time": statistics.median(import_times),
+        "modules": len(modules),
+        "heavy_modules": sorted(
+            heavy for heavy in HEAVY_MODULES
+            if any(name == heavy or name.startswith(f"{heavy}.") for name in modules)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs for each scenario")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help="Scenarios to run")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        result = run_scenario(SCENARIOS[name], args.runs)
+        print(
+            f"{name:>12}: wall {result['wall_time']:.3f}s  imports {result['import_time']:.3f}s "
+            f"({result['modules']} modules)  heavy: {', '.join(result['heavy_modules']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
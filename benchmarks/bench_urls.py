@@ -0,0 +1,117 @@
+"""
+Benchmark the URL classification of big batches.
+
+It generates a batch of video, short, playlist, bare id and invalid links,
+with duplicates, and times:
+
+    classify_many  `URLHandler.classify_many`, the bulk validation and deduplication
+    per_url        a `URLHandler` for each link, like the interactive CLI
+    legacy         the separate video, shorts and playlist patterns URLHandler used before
+
+Usage (with pyutube installed, ex: `pip install -e .`):
+    $ python benchmarks/bench_urls.py --urls 200000 --runs 3
+"""
+
+import argparse
+import random
+import re
+import statistics
+import string
+import time
+
+from pyutube.handlers.URLHandler import URLHandler
+
+ID_CHARACTERS = string.ascii_letters + string.digits + "_-"
+URL_FORMATS = (
+    "https://www.youtube.com/watch?v={video_id}",
+    "https://youtube.com/watch?v={video_id}&list={playlist_id}",
+    "https://www.youtube.com/watch?feature=share&v={video_id}",
+    "https://youtu.be/{video_id}?si=abcdef",
+    "https://www.youtube.com/shorts/{video_id}",
+    "https://www.youtube.com/embed/{video_id}",
+    "https://www.youtube.com/playlist?list={playlist_id}",
+    "{video_id}",
+    "https://example.com/watch?v={video_id}",
+    "not a link",
+)
+
+
+def make_urls(count: int, duplicates: float, seed: int = 0) -> list[str]:
+    """
+    Generate the links of the batch, `duplicates` of them repeat an earlier one.
+    """
+    generator = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        if urls and generator.random() < duplicates:
+            urls.append(generator.choice(urls))
+            continue
+
+        video_id = "".join(generator.choices(ID_CHARACTERS, k=11))
+        playlist_id = "PL" + "".join(generator.choices(ID_CHARACTERS, k=32))
+        urls.append(generator.choice(URL_FORMATS).format(video_id=video_id, playlist_id=playlist_id))
+    return urls
+
+
+def per_url(urls: list[str]) -> int:
+    ids = {}
+    for url in urls:
+        url_handler = URLHandler(url)
+        is_valid_link, link_type = url_handler.classify()
+        if is_valid_link and link_type != "playlist":
+            ids[url_handler.get_video_id()] = None
+    return len(ids)
+
+
+def classify_many(urls: list[str]) -> int:
+    links, _ = URLHandler.classify_many(urls)
+    return len(links)
+
+
+def legacy(urls: list[str]) -> int:
+    """The classification before the single pattern: up to 4 uncompiled patterns for each link."""
+    video_pattern = re.compile(
+        r"^(?:https?://)?(?:www\.)?(?:youtube(?:-nocookie)?\.com/(?:(watch\?v=|watch\?feature\=share\&v=)|embed/"
+        r"|v/|live_stream\?channel=|live\/)|youtu\.be/)([a-zA-Z0-9_-]{11})"
+    )
+    shorts_pattern = (
+        r"(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/(?:[^\/\n\s]+\/\S+\/|shorts\/|watch\?.*?v=))"
+        r"(?:(?:[^\/\n\s]+\/)?)([a-zA-Z0-9_-]+)"
+    )
+    playlist_pattern = r"^(?:https?:\/\/)?(?:www\.)?youtube\.com\/playlist\?list=([a-zA-Z0-9_-]+)"
+    id_pattern = re.compile(r"(?:v=|\/)([0-9A-Za-z_-]{11})")
+
+    ids = {}
+    for url in urls:
+        if len(url) == 11 and all(character in ID_CHARACTERS for character in url):
+            url = f"https://www.youtube.com/watch?v={url}"
+        if video_pattern.match(url) or re.match(shorts_pattern, url):
+            match = id_pattern.search(url)
+            if match:
+                ids[match.group(1)] = None
+        elif re.match(playlist_pattern, url):
+            pass
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--urls", type=int, default=200_000, help="Number of links in the batch")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="Share of links repeating an earlier one")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs for each method")
+    args = parser.parse_args()
+
+    urls = make_urls(args.urls, args.duplicates)
+    for name, method in (("classify_many", classify_many), ("per_url", per_url), ("legacy", legacy)):
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            method(urls)
+            times.append(time.perf_counter() - start)
+
+        median = statistics.median(times)
+        print(f"{name:>14}: median {median:.3f}s  min {min(times):.3f}s  {args.urls / median:,.0f} links/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+A local HTTP stand-in for YouTube, used by the offline benchmarks.
+
+It serves what pytubefix requests for a video or a playlist, with synthetic content:
+
+    /watch?v=<id>               The watch page, with the URL of the player JS
+    /s/player/.../base.js       The player JS, with the signature and `n` functions
+    /youtubei/v1/player         The video info and its stream manifest (innertube)
+    /playlist?list=<id>         The playlist page, with its first 100 videos
+    /youtubei/v1/browse         The next 100 videos of a playlist (innertube)
+    /videoplayback?id=&itag=    The media streams, with range requests like googlevideo
+
+The stream URLs are signed with a signature cipher and an `n` parameter, which
+pytubefix must decipher with the player JS, like for YouTube: the media requests
+with a wrong signature are refused. The pages are padded to about the size of the
+YouTube ones, so their transfer and parsing cost like the real ones.
+
+`route` sends the requests of a session for youtube.com to the stand-in, pyutube
+sends all the pytubefix requests through its shared session.
+
+The responses can be slowed down:
+
+    bandwidth       The bytes per second of each response (0 is unlimited).
+    latency         The seconds before each response starts.
+    throttle_after  The bytes of each response sent at full speed, before
+    throttle_rate   the response drops to this many bytes per second,
+                    like YouTube does for clients it throttles.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlparse, urlsplit
+
+SEND_CHUNK_SIZE = 64 * 1024
+URL_LIFETIME = 6 * 60 * 60
+# The videos of a playlist page and of each continuation, like YouTube
+PLAYLIST_PAGE_SIZE = 100
+# About the size of the YouTube watch page and player JS
+WATCH_PAGE_SIZE = 700 * 1024
+PLAYER_JS_SIZE = 2500 * 1024
+PLAYER_JS_PATH = "/s/player/standin/player_ias.vflset/en_US/base.js"
+# The `n` parameter of the stream URLs once deciphered, it is sent reversed
+N_PARAMETER = "standinN0123"
+# The hosts of the requests sent to the stand-in by `route`
+YOUTUBE_URLS = ("https://youtube.com", "https://www.youtube.com")
+
+# The player JS: the signature and the `n` functions reverse their argument,
+# in the forms pytubefix finds them in the YouTube player
+PLAYER_JS = """var Bn=[nq];
+var sg=function(a){a=a.split("");a=a.reverse();return a.join("")};
+var nq=function(a){return a.split("").reverse().join("")};
+Q.prototype.go=function(a){a.D&&(b=a.get("n"))&&(b=Bn[0](b),a.set("n",b))};
+var yt={signatureTimestamp:20000};
+"""
+
+FORMATS = {
+    137: {"mimeType": 'video/mp4; codecs="avc1.640028"', "width": 1920, "height": 1080, "fps": 30},
+    140: {"mimeType": 'audio/mp4; codecs="mp4a.40.2"'},
+    139: {"mimeType": 'audio/mp4; codecs="mp4a.40.5"'},
+}
+
+
+def pad(text: str, size: int, comment: tuple) -> bytes:
+    """
+    Pad a page to `size` bytes with comment lines.
+    """
+    start, end = comment
+    line = f"{start} {'x' * 100} {end}\n"
+    padding = line * max(0, (size - len(text)) // len(line))
+    return (text + padding).encode()
+
+
+class StandInServer:
+    def __init__(self, media: dict, bandwidth: float = 0, latency: float = 0,
+                 throttle_after: int = 0, throttle_rate: float = 0):
+        """
+        Args:
+            media: The bytes served for each itag, see `FORMATS` for the itags known.
+            bandwidth: The bytes per second of each response, 0 is unlimited.
+            latency: The seconds before each response starts.
+            throttle_after: The bytes of each response sent before the throttling starts, 0 disables it.
+            throttle_rate: The bytes per second of a response once it is throttled.
+        """
+        self.media = media
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.throttle_after = throttle_after
+        self.throttle_rate = throttle_rate
+        self.videos = {}
+        self.playlists = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self) -> "StandInServer":
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.make_handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="standin-server", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def add_video(self, video_id: str, title: str, length: int, itags: tuple) -> None:
+        """
+        Serve a video.
+
+        Args:
+            video_id: The id of the video, 11 characters like the YouTube ones.
+            title: The title of the video.
+            length: The length of the video in seconds.
+            itags: The streams of the video, their bytes are the media of the itags.
+        """
+        self.videos[video_id] = {"title": title, "length": length, "itags": tuple(itags)}
+
+    def add_playlist(self, playlist_id: str, title: str, video_ids: list) -> None:
+        """
+        Serve a playlist of videos added with `add_video`.
+        """
+        self.playlists[playlist_id] = {"title": title, "video_ids": list(video_ids)}
+
+    def route(self, session) -> None:
+        """
+        Send the requests of a requests session for youtube.com to the stand-in.
+
+        Args:
+            session: The session, the pools of its adapter for http:// are copied.
+        """
+        from requests.adapters import HTTPAdapter
+
+        base_url = self.base_url
+        pool = session.get_adapter("http://")
+
+        class StandInAdapter(HTTPAdapter):
+            def send(self, request, **kwargs):
+                url = urlsplit(request.url)
+                request.url = f"{base_url}{url.path}{'?' + url.query if url.query else ''}"
+                return super().send(request, **kwargs)
+
+        adapter = StandInAdapter(
+            pool_connections=pool._pool_connections, pool_maxsize=pool._pool_maxsize, pool_block=pool._pool_block)
+        for url in YOUTUBE_URLS:
+            session.mount(url, adapter)
+
+    def url(self, video_id: str, itag: int) -> str:
+        expire = int(time.time()) + URL_LIFETIME
+        query = urlencode({"id": video_id, "itag": itag, "expire": expire, "n": N_PARAMETER[::-1]})
+        return f"{self.base_url}/videoplayback?{query}"
+
+    @staticmethod
+    def signature(video_id: str, itag: int) -> str:
+        return f"{video_id}.{itag}.standin"
+
+    def count(self, requests: int = 0, sent: int = 0) -> None:
+        with self.lock:
+            self.requests += requests
+            self.bytes_sent += sent
+
+    def player_response(self, video_id: str) -> dict:
+        """
+        The innertube player response of a video, its streams are signed with a signature cipher.
+        """
+        video = self.videos.get(video_id)
+        if video is None:
+            return {"playabilityStatus": {"status": "ERROR", "reason": "Video unavailable"}}
+
+        formats = []
+        for itag in video["itags"]:
+            media = self.media[itag]
+            cipher = urlencode({"s": self.signature(video_id, itag)[::-1], "sp": "sig"})
+            formats.append({
+                "itag": itag,
+                **FORMATS[itag],
+                "bitrate": len(media) * 8 // max(1, video["length"]),
+                "contentLength": str(len(media)),
+                "signatureCipher": f"{cipher}&url={quote(self.url(video_id, itag), safe='')}",
+            })
+
+        return {
+            "playabilityStatus": {"status": "OK"},
+            "videoDetails": {
+                "videoId": video_id,
+                "title": video["title"],
+                "lengthSeconds": str(video["length"]),
+                "author": "pyutube stand-in",
+            },
+            "streamingData": {"expiresInSeconds": str(URL_LIFETIME), "adaptiveFormats": formats},
+        }
+
+    def playlist_items(self, playlist_id: str, start: int) -> list:
+        """
+        The items of a playlist page, with the continuation of the next page.
+        """
+        playlist = self.playlists[playlist_id]
+        items = [
+            {"playlistVideoRenderer": {
+                "videoId": video_id,
+                "title": {"runs": [{"text": self.videos[video_id]["title"]}]},
+                "lengthSeconds": str(self.videos[video_id]["length"]),
+            }}
+            for video_id in playlist["video_ids"][start:start + PLAYLIST_PAGE_SIZE]
+        ]
+        if start + PLAYLIST_PAGE_SIZE < len(playlist["video_ids"]):
+            token = f"{playlist_id}:{start + PLAYLIST_PAGE_SIZE}"
+            items.append({"continuationItemRenderer": {
+                "continuationEndpoint": {"continuationCommand": {"token": token}}}})
+        return items
+
+    def watch_page(self, video_id: str) -> bytes:
+        return pad(
+            f'<html><head><script src="{PLAYER_JS_PATH}"></script></head>'
+            f'<body><script>var ytInitialData = {json.dumps({"videoId": video_id})};</script></body></html>\n',
+            WATCH_PAGE_SIZE, ("<!--", "-->"))
+
+    def playlist_page(self, playlist_id: str) -> bytes:
+        playlist = self.playlists[playlist_id]
+        data = {
+            "contents": {"twoColumnBrowseResultsRenderer": {"tabs": [{"tabRenderer": {"content": {
+                "sectionListRenderer": {"contents": [{"itemSectionRenderer": {"contents": [
+                    {"playlistVideoListRenderer": {"contents": self.playlist_items(playlist_id, 0)}}
+                ]}}]}
+            }}}]}},
+            "sidebar": {"playlistSidebarRenderer": {"items": [{"playlistSidebarPrimaryInfoRenderer": {
+                "title": {"runs": [{"text": playlist["title"]}]},
+                "stats": [{"runs": [{"text": str(len(playlist["video_ids"]))}]}, {"simpleText": "0 views"}],
+            }}]}},
+            "responseContext": {"webResponseContextExtensionData": {"ytConfigData": {"visitorData": "standin"}}},
+        }
+        return pad(f"<html><body><script>var ytInitialData = {json.dumps(data)};</script></body></html>\n",
+                   WATCH_PAGE_SIZE, ("<!--", "-->"))
+
+    def send_body(self, handler: BaseHTTPRequestHandler, body: bytes) -> None:
+        """
+        Send a response body, paced by the bandwidth and the throttling settings.
+        """
+        started = time.monotonic()
+        sent = 0
+        throttled_at = None
+
+        while sent < len(body):
+            chunk = body[sent:sent + SEND_CHUNK_SIZE]
+            handler.wfile.write(chunk)
+            sent += len(chunk)
+            self.count(sent=len(chunk))
+
+            if self.throttle_after and self.throttle_rate and sent >= self.throttle_after:
+                if throttled_at is None:
+                    throttled_at = (time.monotonic(), sent)
+                since, sent_before = throttled_at
+                delay = (sent - sent_before) / self.throttle_rate - (time.monotonic() - since)
+            elif self.bandwidth:
+                delay = sent / self.bandwidth - (time.monotonic() - started)
+            else:
+                delay = 0
+
+            if delay > 0:
+                time.sleep(delay)
+
+    def make_handler(self):
+        server = self
+        player_js = pad(PLAYER_JS, PLAYER_JS_SIZE, ("/*", "*/"))
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def get_media(self) -> bytes:
+                """
+                The media of a stream URL, or None if there is no such stream or its URL is not deciphered.
+                """
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path != "/videoplayback" or "itag" not in query:
+                    return None
+
+                itag = int(query["itag"])
+                if (query.get("sig") != server.signature(query.get("id"), itag)
+                        or query.get("n") != N_PARAMETER):
+                    return None
+                return server.media.get(itag)
+
+            def send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    server.send_body(self, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def send_page(self) -> bool:
+                """
+                Send the page of a GET request, if it is not a media stream.
+                """
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/watch" and query.get("v", [None])[0] in server.videos:
+                    self.send(200, server.watch_page(query["v"][0]), "text/html; charset=utf-8")
+                elif url.path == "/playlist" and query.get("list", [None])[0] in server.playlists:
+                    self.send(200, server.playlist_page(query["list"][0]), "text/html; charset=utf-8")
+                elif url.path == PLAYER_JS_PATH:
+                    self.send(200, player_js, "text/javascript")
+                else:
+                    return False
+                return True
+
+            def do_POST(self) -> None:
+                server.count(requests=1)
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if server.latency:
+                    time.sleep(server.latency)
+
+                path = urlparse(self.path).path
+                if path == "/youtubei/v1/player":
+                    response = server.player_response(body.get("videoId"))
+                elif path == "/youtubei/v1/browse" and ":" in body.get("continuation", ""):
+                    playlist_id, start = body["continuation"].rsplit(":", 1)
+                    response = {"onResponseReceivedActions": [{"appendContinuationItemsAction": {
+                        "continuationItems": server.playlist_items(playlist_id, int(start))}}]}
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send(200, json.dumps(response).encode(), "application/json")
+
+            def do_HEAD(self) -> None:
+                server.count(requests=1)
+                media = self.get_media()
+                if media is None:
+                    self.send_error(403)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(media)))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+            def do_GET(self) -> None:
+                server.count(requests=1)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if self.send_page():
+                    return
+
+                media = self.get_media()
+                if media is None:
+                    self.send_error(403)
+                    return
+
+                match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)) if match.group(2) else len(media) - 1, len(media) - 1)
+                    if start > end:
+                        self.send_error(416)
+                        return
+                    body = media[start:end + 1]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(media)}")
+                else:
+                    body = media
+                    self.send_response(200)
+
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+                try:
+                    server.send_body(self, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
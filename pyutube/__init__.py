@@ -1,7 +1,8 @@
 """This is the initialization module for the pyutube package.
 
-It provides the main entry point for the package by importing the `app`
-object from the `cli` submodule.
+It provides the main entry point for the package by exposing the `app`
+object from the `cli` submodule. The `cli` submodule is only imported when
+`app` is first accessed, so importing the package stays cheap.
 
 Example:
     To use this package, you can import the `app` object directly:
@@ -10,7 +11,16 @@ Example:
     >>> app.run()
 
 """
-from .cli import app
+
+
+import importlib
+
+
+def __getattr__(name):
+    if name in ("app", "cli"):
+        cli = importlib.import_module(".cli", __name__)
+        return cli.app if name == "app" else cli
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # List the symbols you want to export from this module
@@ -9,11 +9,29 @@ offering users flexibility and convenience in managing their media downloads.
 
 Usage:
     $ pyutube download <URL> [options]
+    $ pyutube serve [PATH] [options]
 
 Options:
     -a, --audio          Download only audio.
     -f, --footage        Download only video (footage).
     -v, --version        Show the version number.
+    -j, --jobs N         Download N playlist videos at once.
+    -c, --connections N  Download each stream over N connections.
+    -p, --prefetch N     Fetch the info of the next N playlist videos during the downloads.
+    --stream-merge       Merge the video and audio while they download, writing only the final file.
+    --no-update-check    Do not check for updates (or set PYUTUBE_NO_UPDATE_CHECK=1).
+    -b, --batch FILE     Download the URLs listed in FILE (or `-` for stdin), without prompts.
+    -q, --quality Q      Pick the resolution of each video with a policy (best, smallest,
+                         720p, 720p|nearest, <=1080p, <=2500kbps, <=500mb), without prompts.
+    --limit-rate RATE    Limit the download rate of all the streams together (500k, 2M, ...).
+    --limit-rate-per-stream RATE
+                         Limit the download rate of each stream.
+    --limit-rate-file FILE
+                         Read the rates from FILE (`2M` or `2M 500k`) whenever it changes.
+    --network-stats      Show how often the HTTP connections were reused, at exit.
+    --trace FILE         Write the timing of each download phase to FILE, in the Chrome trace format.
+    --json-events FILE   Write the events of the downloads to FILE (or `-` for stdout) as JSON lines.
+    --port N             The port of `pyutube serve`, on 127.0.0.1.
 
 Example:
     $ pyutube <YouTube_URL> -a
@@ -32,11 +50,20 @@ Example:
     $ pyutube <YouTube_short_URL>
         Download the specified YouTube short video.
 
+    $ pyutube --batch urls.txt -j 4
+        Download all the URLs listed in urls.txt, 4 at a time.
+
+    $ pyutube serve ~/Videos -j 2
+        Keep running and download the jobs submitted to http://127.0.0.1:8765, 2 at a time.
+
 Made with ❤️ By Ebraheem. Find me on GitHub: @Hetari. The project lives on @Hetari/pyutube.
 
 Thank you for using Pyutube! Your support is greatly appreciated. ⭐️
 """
 
+import atexit
+import contextlib
+import itertools
 import os
 import sys
 
@@ -46,13 +73,13 @@ from pyutube.utils import (
     __version__,
     __app__,
     clear,
+    describe_error,
     error_console,
     console,
-    check_internet_connection,
-    check_for_updates,
+    check_for_updates_in_background,
+    get_connection_stats,
+    use_shared_session,
 )
-from pyutube.services import DownloadService
-from pyutube.handlers import URLHandler
 
 # Create CLI app
 app = typer.Typer(
@@ -84,6 +111,61 @@ video_option = typer.Option(
 version_option = typer.Option(
     False, "-v", "--version", help="Show the version number"
 )
+jobs_option = typer.Option(
+    1, "-j", "--jobs", min=1, help="Number of playlist videos (or jobs of [cyan]pyutube serve[/cyan]) to download at once"
+)
+connections_option = typer.Option(
+    4, "-c", "--connections", min=1, help="Number of connections used to download each stream"
+)
+prefetch_option = typer.Option(
+    2, "-p", "--prefetch", min=0,
+    help="Number of upcoming playlist videos whose info is fetched during the downloads"
+)
+stream_merge_option = typer.Option(
+    False, "--stream-merge",
+    help="Pipe the video and audio into ffmpeg while they download, so only the final file is written"
+)
+no_update_check_option = typer.Option(
+    False, "--no-update-check", help="Do not check for updates (or set PYUTUBE_NO_UPDATE_CHECK=1)"
+)
+quality_option = typer.Option(
+    None, "-q", "--quality",
+    help="Resolution policy: best, smallest, 720p, 720p|nearest, <=1080p, <=2500kbps or <=500mb",
+    show_default=False
+)
+limit_rate_option = typer.Option(
+    None, "--limit-rate", help="Limit the download rate of all the streams together, like 500k or 2M",
+    show_default=False
+)
+limit_rate_per_stream_option = typer.Option(
+    None, "--limit-rate-per-stream", help="Limit the download rate of each stream, like 500k or 2M",
+    show_default=False
+)
+limit_rate_file_option = typer.Option(
+    None, "--limit-rate-file",
+    help="File with the global rate and optionally the rate of each stream, re-read whenever it changes",
+    show_default=False
+)
+network_stats_option = typer.Option(
+    False, "--network-stats", help="Show how often the HTTP connections were reused, at exit"
+)
+trace_option = typer.Option(
+    None, "--trace",
+    help="Write the timing of each download phase to a file, in the Chrome trace format (chrome://tracing)",
+    show_default=False
+)
+json_events_option = typer.Option(
+    None, "--json-events",
+    help="Write the events of the downloads as JSON lines to a file ([cyan]-[/cyan] for stdout)",
+    show_default=False
+)
+port_option = typer.Option(
+    8765, "--port", min=0, max=65535, help="Port of the job API of [cyan]pyutube serve[/cyan], on 127.0.0.1"
+)
+batch_option = typer.Option(
+    None, "-b", "--batch", help="File with one URL per line ([cyan]-[/cyan] for stdin), downloaded without prompts",
+    show_default=False
+)
 
 
 @app.command(
@@ -103,7 +185,21 @@ def pyutube(
     path: str = path_arg,
     audio: bool = audio_option,
     video: bool = video_option,
-    version: bool = version_option
+    version: bool = version_option,
+    jobs: int = jobs_option,
+    connections: int = connections_option,
+    prefetch: int = prefetch_option,
+    stream_merge: bool = stream_merge_option,
+    no_update_check: bool = no_update_check_option,
+    batch: str = batch_option,
+    quality: str = quality_option,
+    limit_rate: str = limit_rate_option,
+    limit_rate_per_stream: str = limit_rate_per_stream_option,
+    limit_rate_file: str = limit_rate_file_option,
+    network_stats: bool = network_stats_option,
+    trace: str = trace_option,
+    json_events: str = json_events_option,
+    port: int = port_option
 ) -> None:
     """
     Downloads a YouTube video.
@@ -111,50 +207,252 @@ def pyutube(
     Args:
         url (str): The URL of the YouTube video.
         path (str): The path to save the video. Defaults to the current working directory.
+        jobs (int): The number of playlist videos to download at once.
+        connections (int): The number of connections used to download each stream.
+        prefetch (int): The number of upcoming playlist videos whose info is fetched ahead.
+        stream_merge (bool): Whether to merge the video and audio while they download.
+        no_update_check (bool): Whether to skip the update check.
+        batch (str): A file with one URL per line, or `-` to read them from stdin.
+        quality (str): The policy used to pick the resolution of each video.
+        limit_rate (str): The download rate of all the streams together.
+        limit_rate_per_stream (str): The download rate of each stream.
+        limit_rate_file (str): A file with the rates, applied whenever it changes.
+        network_stats (bool): Whether to show the connection reuse counters at exit.
+        trace (str): The file the timing of each download phase is written to.
+        json_events (str): The file the events are written to as JSON lines, or `-` for stdout.
+        port (int): The port of the job API of `pyutube serve`.
 
     """
-    check_for_updates()
+    if not no_update_check:
+        check_for_updates_in_background()
 
     if version:
         console.print(f"Pyutube {__version__}")
-        check_for_updates()
         sys.exit()
 
+    if trace is not None:
+        from pyutube.services.TraceService import TraceService
+
+        TraceService.start(trace)
+
+    if json_events is not None:
+        from pyutube.services.EventService import EventService
+
+        try:
+            EventService.start(json_events)
+        except OSError as error:
+            error_console.print(f"❗ Could not open the events file: {error}")
+            sys.exit(1)
+
+    if quality is not None:
+        from pyutube.services.QualityService import QualityService
+
+        try:
+            QualityService(quality)
+        except ValueError as error:
+            error_console.print(f"❗ {error}")
+            sys.exit(1)
+
+    if limit_rate is not None or limit_rate_per_stream is not None or limit_rate_file is not None:
+        from pyutube.services.RateLimitService import RateLimitService
+
+        try:
+            RateLimitService.set_rates(
+                RateLimitService.parse_rate(limit_rate) if limit_rate is not None else None,
+                RateLimitService.parse_rate(limit_rate_per_stream) if limit_rate_per_stream is not None else None,
+            )
+        except ValueError as error:
+            error_console.print(f"❗ {error}")
+            sys.exit(1)
+
+        if limit_rate_file is not None:
+            RateLimitService.watch_file(limit_rate_file)
+
+    if network_stats:
+        atexit.register(show_connection_stats)
+
+    if url == "serve":
+        # `serve` is not a URL (nor a video id), it starts the job server
+        serve(path, jobs, connections, prefetch, port)
+
+    if batch is not None:
+        # The URLs come from the batch, so the only argument given is the path
+        download_batch(
+            batch, path if url is None else url, audio, jobs, connections, quality, prefetch, stream_merge)
+
     if url is None:
         error_console.print("❗ Missing argument 'URL'.")
         sys.exit()
 
-    clear()
-
-    if not check_internet_connection():
-        sys.exit()
+    # The download services (pytubefix, requests, ...) are only loaded for valid links
+    from pyutube.handlers.URLHandler import URLHandler
 
     url_handler = URLHandler(url)
-    is_valid_link, link_type = url_handler.validate()
+    with trace_span("validate_url", "cli", trace):
+        is_valid_link, link_type = url_handler.validate()
 
     if not is_valid_link:
         sys.exit()
 
-    download_service = DownloadService(url, path, None)
-    if audio:
-        download_service.is_audio = True
-        video, video_id,  _, video_audio, _ = download_service.download_preparing()
-        download_service.download_audio(video, video_audio, video_id)
+    clear()
+
+    # There is no connectivity probe, the first request to YouTube tells if we are online
+    from pyutube.services.DownloadService import DownloadService
+
+    use_shared_session()
+
+    from pyutube.services.EventService import EventService
+
+    if link_type != "playlist":
+        # The title is not known yet, it comes with the `metadata` event
+        EventService.emit("queued", video_id=url_handler.get_video_id(), index=0, total=1)
 
-    elif video or link_type == "short":
-        video, video_id,  streams, video_audio, quality = download_service.download_preparing()
-        video_file = download_service.video_service.get_video_streams(quality, streams)
-        download_service.download_video(video, video_id, video_file, video_audio)
+    download_service = DownloadService(url, path, quality, connections=connections, stream_merge=stream_merge)
+    try:
+        if audio:
+            download_service.is_audio = True
+            video, video_id,  _, video_audio, _ = download_service.download_preparing()
+            download_service.download_audio(video, video_audio, video_id)
 
-    elif link_type == "video":
-        download_service.asking_video_or_audio()
+        elif video or link_type == "short":
+            video, video_id,  streams, video_audio, quality = download_service.download_preparing()
+            video_file = download_service.video_service.get_video_streams(quality, streams, video_audio)
+            download_service.download_video(video, video_id, video_file, video_audio)
 
-    elif link_type == "playlist":
-        download_service = DownloadService(url, path, None)
-        download_service.get_playlist_links()
+        elif link_type == "video":
+            download_service.asking_video_or_audio()
 
-    else:
-        error_console.print("❗ Unsupported link type.")
+        elif link_type == "playlist":
+            download_service = DownloadService(
+                url, path, quality, jobs=jobs, connections=connections, prefetch=prefetch, stream_merge=stream_merge)
+            download_service.get_playlist_links()
+
+        else:
+            error_console.print("❗ Unsupported link type.")
+            sys.exit()
+
+    except InterruptedError as error:
+        # The user cancelled in a prompt
+        EventService.emit("cancelled", video_id=url_handler.get_video_id())
+        error_console.print(f"❗ {error}")
         sys.exit()
 
+    except Exception as error:
+        # The video info could not be fetched: no connection, an HTTP error or an unavailable video
+        EventService.error(error, video_id=url_handler.get_video_id())
+        error_console.print(f"❗ {describe_error(error)}")
+        sys.exit(1)
+
+    sys.exit()
+
+
+def download_batch(
+        source: str, path: str, audio: bool, jobs: int, connections: int, quality: str = None, prefetch: int = 2,
+        stream_merge: bool = False
+) -> None:
+    """
+    Downloads all the URLs of a batch in one process, without prompts.
+
+    Every URL is validated before the first download, the playlists are expanded as their videos
+    download, and each video is downloaded once.
+    Exits with status 1 if a URL was rejected or a download failed.
+
+    Args:
+        source (str): A file with one URL per line, or `-` to read them from stdin.
+        path (str): The path to save the videos.
+        audio (bool): Whether to download only the audio.
+        jobs (int): The number of videos to download at once.
+        connections (int): The number of connections used to download each stream.
+        quality (str): The policy used to pick the resolution of each video, `best` by default.
+        prefetch (int): The number of upcoming videos whose info is fetched ahead.
+        stream_merge (bool): Whether to merge the video and audio while they download.
+
+    """
+    from pyutube.handlers.BatchHandler import BatchHandler
+
+    use_shared_session()
+    batch_handler = BatchHandler(source)
+    try:
+        urls = batch_handler.read_urls()
+    except OSError as error:
+        error_console.print(f"❗ Could not read the batch: {error}")
+        sys.exit(1)
+
+    # The playlists are expanded as the videos download, their first page is read before the first download
+    video_ids = batch_handler.iter_video_ids(urls)
+    first_video_id = next(video_ids, None)
+    for url in batch_handler.rejected:
+        error_console.print(f"❌ Invalid link: {url}")
+    reported = len(batch_handler.rejected)
+
+    if first_video_id is None:
+        error_console.print("❗ No videos to download.")
+        sys.exit(1)
+
+    from pyutube.services.DownloadService import DownloadService
+
+    download_service = DownloadService(
+        None, path, quality, is_audio=audio, jobs=jobs, connections=connections, interactive=False,
+        prefetch=prefetch, stream_merge=stream_merge)
+    succeeded = download_service.download_batch(itertools.chain([first_video_id], video_ids))
+
+    for url in batch_handler.rejected[reported:]:
+        error_console.print(f"❌ Invalid link: {url}")
+    sys.exit(0 if succeeded and not batch_handler.rejected else 1)
+
+
+def serve(path: str, jobs: int, connections: int, prefetch: int, port: int) -> None:
+    """
+    Runs the downloads submitted to the local job API until the process is interrupted.
+
+    The process stays up between the jobs, so the HTTP connections, the caches
+    and the worker pool are reused by every job.
+
+    Args:
+        path (str): The default path to save the videos.
+        jobs (int): The number of jobs downloaded at once.
+        connections (int): The number of connections used to download each stream.
+        prefetch (int): The number of upcoming videos of a job whose info is fetched ahead.
+        port (int): The port to listen on, on 127.0.0.1.
+
+    """
+    from pyutube.handlers.ServerHandler import serve as serve_jobs
+    from pyutube.services.JobService import JobService
+
+    use_shared_session()
+    try:
+        serve_jobs(JobService(path, jobs, connections, prefetch), port=port)
+    except OSError as error:
+        error_console.print(f"❗ Could not start the server: {error}")
+        sys.exit(1)
+
     sys.exit()
+
+
+def show_connection_stats() -> None:
+    """
+    Shows the requests and connections of each host, and how many requests reused a connection.
+
+    """
+    stats = get_connection_stats()
+    if not stats:
+        return
+
+    console.print("\nHTTP connections:", style="info")
+    for host, counters in sorted(stats.items()):
+        console.print(
+            f"   {host}: {counters['requests']} requests over {counters['connections']} connections "
+            f"({counters['reused']} reused)", style="info")
+
+
+def trace_span(name: str, category: str, trace: str):
+    """
+    Times a phase of the CLI when tracing, without loading the trace service otherwise.
+
+    """
+    if trace is None:
+        return contextlib.nullcontext()
+
+    from pyutube.services.TraceService import TraceService
+
+    return TraceService.span(name, category)
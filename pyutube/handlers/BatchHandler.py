@@ -0,0 +1,92 @@
+import sys
+from collections.abc import Iterator
+
+from pyutube.handlers.URLHandler import URLHandler, classify_url
+from pyutube.utils import describe_error, error_console, mark_online
+
+
+class BatchHandler:
+    def __init__(self, source: str):
+        self.source = source
+        self.rejected = []
+
+    def read_urls(self) -> list[str]:
+        """
+        Read the URLs of the batch, one per line, from a file or from stdin (`-`).
+
+        Empty lines and lines starting with `#` are ignored.
+
+        Returns:
+            list[str]: The URLs of the batch.
+        """
+        if self.source == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(self.source, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+
+        return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+    def iter_video_ids(self, urls: list[str]) -> Iterator[str]:
+        """
+        Validate all the URLs up front, then yield the ids of the videos to download as they are known.
+
+        Playlists are expanded into their videos page by page, so the first videos can
+        download while the next pages load. Every video is yielded once, in the order it
+        first appears, and the rejected URLs are added to `self.rejected`.
+
+        Args:
+            urls: The URLs of the batch.
+
+        Yields:
+            str: The unique video ids.
+        """
+        links, rejected = URLHandler.classify_many(urls)
+        self.rejected.extend(rejected)
+        seen = set()
+
+        for link_type, link_id in links:
+            if link_type != "playlist":
+                video_ids = [link_id]
+            else:
+                video_ids = self.iter_playlist_video_ids(f"https://www.youtube.com/playlist?list={link_id}")
+
+            for video_id in video_ids:
+                if video_id not in seen:
+                    seen.add(video_id)
+                    yield video_id
+
+    def collect_video_ids(self, urls: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Collect the ids of all the videos to download, see `iter_video_ids`.
+
+        Args:
+            urls: The URLs of the batch.
+
+        Returns:
+            tuple[list[str], list[str]]: The unique video ids, and the URLs that were rejected.
+        """
+        return list(self.iter_video_ids(urls)), self.rejected
+
+    def iter_playlist_video_ids(self, url: str) -> Iterator[str]:
+        """
+        Yield the ids of the videos of a playlist, as its pages load.
+
+        A playlist that can not be loaded is added to `self.rejected`.
+
+        Args:
+            url: The URL of the playlist.
+
+        Yields:
+            str: The video ids.
+        """
+        from pytubefix import Playlist
+
+        try:
+            # The pages are read as they come, without keeping pytubefix's copy of the list
+            for video_url in Playlist(url).url_generator():
+                mark_online()
+                yield classify_url(video_url)[1]
+        except Exception as error:
+            error_console.print(f"❗ {describe_error(error)} ({url})")
+            self.rejected.append(url)
@@ -1,20 +1,27 @@
+import itertools
 import os
 import re
 import sys
-import threading
 
-from pytubefix.helpers import safe_filename
-from pytubefix import Playlist
-
-from pyutube.utils import console, asking_video_or_audio, ask_playlist_video_names, ask_for_make_playlist_in_order
+from pyutube.utils import (
+    console,
+    error_console,
+    asking_video_or_audio,
+    ask_playlist_video_names,
+    ask_for_make_playlist_in_order,
+    describe_error,
+    mark_online,
+)
 
 
 class PlaylistHandler:
-    playlist_videos = []
+    resolution_suffix = re.compile(r'(_\d{3,4}p|_\d+k|_(hd|uhd|sd))$')
 
     def __init__(self, url: str, path: str):
         self.url: str = url
         self.path: str = path
+        self.playlist_videos: list[tuple[str, str]] = []
+        self.durations: dict[str, int] = {}
 
     def process_playlist(self):
         """
@@ -30,18 +37,27 @@ class PlaylistHandler:
             console.print("Cancelled")
             return
 
+        from pytubefix import Playlist
+
         console.print("Downloading playlist...")
         playlist = Playlist(self.url)
 
-        p_title = playlist.title
-        p_total = playlist.length
-        p_videos = playlist.videos
+        try:
+            p_title = playlist.title
+            p_total = playlist.length
+        except Exception as error:
+            error_console.print(f"❗ {describe_error(error)}")
+            sys.exit(1)
+
+        mark_online()
 
         make_in_order = ask_for_make_playlist_in_order()
         console.print(f"{'✅' if make_in_order else '❌'} Make playlist in order", style="info")
         console.print()
         console.print("Fetching playlist videos...", style="info")
-        self.get_all_playlist_videos_title(p_videos)
+        for title, video_id, length in self.iter_playlist_videos(playlist):
+            self.playlist_videos.append((title, video_id))
+            self.durations[video_id] = length
 
         # if make_in_order:
         #     self.playlist_videos.reverse()
@@ -54,39 +70,110 @@ class PlaylistHandler:
             self.playlist_videos[index] = (new_video_title, video_and_id[1])
 
         console.print("Checking if the videos are already downloaded...")
-        new_path = self.check_for_downloaded_videos(p_title, p_total)
+        new_path = self.check_for_downloaded_videos(p_title, p_total, is_audio)
 
         console.print("Chose what video you want to download", style="info")
-        videos_selected = ask_playlist_video_names(self.playlist_videos)
+        videos_selected = ask_playlist_video_names([
+            (f"{title} ({self.format_duration(self.durations[video_id])})" if self.durations.get(video_id) else title,
+             video_id)
+            for title, video_id in self.playlist_videos
+        ])
 
         return new_path, is_audio, videos_selected, make_in_order, self.playlist_videos
 
-    def fetch_title_thread(self, video, index, results):
+    def iter_playlist_videos(self, playlist):
         """
-        Fetch all playlist video titles concurrently but maintain the order.
+        Yield the videos of the playlist in order, while the next pages load.
+
+        The titles and the lengths come with the ids in the playlist pages,
+        so listing the playlist takes one request for every 100 videos.
+        The pages are read with pytubefix internals, when they are missing or
+        changed, the videos are listed with the public (slower) `playlist.videos`.
+
+        Args:
+            playlist: The pytubefix playlist.
+
+        Yields:
+            tuple[str, str, int]: The title, the id and the length in seconds (0 if unknown) of each video.
+        """
+        if not (callable(getattr(playlist, "_paginate", None)) and hasattr(playlist, "_extract_video_id")):
+            yield from self.iter_public_playlist_videos(playlist)
+            return
+
+        # pytubefix keeps only the ids of the page items, keep their title and length too
+        playlist._extract_video_id = self.extract_playlist_entry
+        pages = playlist._paginate(playlist.html)
+        try:
+            first_page = next(pages, [])
+            if any(entry is not None and not isinstance(entry, tuple) for entry in first_page):
+                raise TypeError("The playlist pages are not read with the patched extractor")
+        except (AttributeError, TypeError):
+            del playlist._extract_video_id
+            yield from self.iter_public_playlist_videos(playlist)
+            return
+
+        for page in itertools.chain([first_page], pages):
+            for entry in page:
+                if entry is not None:
+                    yield entry
+
+    @staticmethod
+    def iter_public_playlist_videos(playlist):
         """
-        video_title = safe_filename(video.title)
-        video_id = video.video_id
-        results[index] = (video_title, video_id)
+        Yield the videos of the playlist with the public pytubefix API, one request for each video.
 
-    def get_all_playlist_videos_title(self, videos):
+        Args:
+            playlist: The pytubefix playlist.
+
+        Yields:
+            tuple[str, str, int]: The title, the id and the length in seconds of each video.
         """
-        Fetch all playlist video titles concurrently but maintain the order.
+        from pytubefix.helpers import safe_filename
+
+        for video in playlist.videos:
+            yield safe_filename(video.title), video.video_id, video.length or 0
+
+    @staticmethod
+    def extract_playlist_entry(item: dict) -> tuple[str, str, int]:
         """
-        total_videos = len(videos)
-        results = [None] * total_videos
-        title_threads = []
+        Extract a video of a playlist page.
 
-        for index, video in enumerate(videos):
-            thread = threading.Thread(
-                target=self.fetch_title_thread, args=(video, index, results))
-            thread.start()
-            title_threads.append(thread)
+        Args:
+            item: The item of the page, a video or a short.
 
-        for thread in title_threads:
-            thread.join()
+        Returns:
+            tuple[str, str, int]: The title, the id and the length in seconds (0 if unknown)
+            of the video, or None if the item is not a video.
+        """
+        from pytubefix.helpers import safe_filename
 
-        self.playlist_videos = results
+        try:
+            if "playlistVideoRenderer" in item:
+                renderer = item["playlistVideoRenderer"]
+                video_id = renderer["videoId"]
+                title = renderer.get("title", {})
+                title = "".join(run["text"] for run in title["runs"]) if "runs" in title else title.get("simpleText")
+                length = int(renderer.get("lengthSeconds") or 0)
+            else:
+                content = item["richItemRenderer"]["content"]
+                if "shortsLockupViewModel" in content:
+                    model = content["shortsLockupViewModel"]
+                    video_id = model["onTap"]["innertubeCommand"]["reelWatchEndpoint"]["videoId"]
+                    title = model.get("overlayMetadata", {}).get("primaryText", {}).get("content")
+                else:
+                    video_id = content["reelItemRenderer"]["videoId"]
+                    title = content["reelItemRenderer"].get("headline", {}).get("simpleText")
+                length = 0
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+
+        return safe_filename(title or video_id), video_id, length
+
+    @staticmethod
+    def format_duration(seconds: int) -> str:
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
 
     @staticmethod
     def show_playlist_info(title, total):
@@ -94,22 +181,33 @@ class PlaylistHandler:
         console.print(f"Total videos: {total}\n", style="info")
 
     def create_playlist_folder(self, title):
-        os.makedirs(title, exist_ok=True)
-        return os.path.join(self.path, title)
-
-    def check_for_downloaded_videos(self, title, total):
-        new_path = self.create_playlist_folder(safe_filename(title))
-
-        # check if there is any video already downloaded in the past
-        for file in os.listdir(new_path):
-            fileName = os.path.splitext(file)[0]
-            cleaned_file_name = re.compile(r'(_\d{3,4}p|_\d+k|_(hd|uhd|sd))$').sub('', fileName)
-
-            for video in self.playlist_videos:
-                video_name = video[0]
-                if video_name.startswith(cleaned_file_name):
-                    self.playlist_videos.remove(video)
-                    break
+        new_path = os.path.join(self.path, title)
+        os.makedirs(new_path, exist_ok=True)
+        return new_path
+
+    def check_for_downloaded_videos(self, title, total, is_audio: bool = False):
+        from pytubefix.helpers import safe_filename
+        from pyutube.services.ArchiveService import ArchiveService, KIND_AUDIO, KIND_VIDEO
+        from pyutube.services.TraceService import TraceService
+
+        with TraceService.span("check_downloaded", "filesystem", total=total):
+            new_path = self.create_playlist_folder(safe_filename(title))
+
+            # The videos recorded in the download archive for this folder, as audio or as video
+            downloaded = ArchiveService().get_downloaded(new_path, KIND_AUDIO if is_audio else KIND_VIDEO)
+            archived_files = {os.path.basename(path) for path in downloaded.values()}
+
+            # The files downloaded before the archive existed are matched by their name
+            downloaded_names = {
+                self.resolution_suffix.sub('', os.path.splitext(file)[0])
+                for file in os.listdir(new_path)
+                if file not in archived_files
+            }
+
+            self.playlist_videos = [
+                video for video in self.playlist_videos
+                if video[1] not in downloaded and video[0] not in downloaded_names
+            ]
 
         if not self.playlist_videos:
             console.print(f"All playlist are already downloaded in this directory, see '{title}' folder", style="info")
@@ -0,0 +1,214 @@
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+from pyutube.utils import console
+
+if TYPE_CHECKING:
+    # Importing the services loads pytubefix, `pyutube.handlers` is imported by every run of the CLI
+    from pyutube.services.JobService import JobService
+
+JOB_PATH_PATTERN = re.compile(r"^/jobs/([0-9]+)$")
+# The biggest request body, a job is a few hundred bytes
+MAX_BODY_SIZE = 64 * 1024
+# The host names of the local requests, a web page resolving its own name to 127.0.0.1 is refused
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+class ServerHandler(BaseHTTPRequestHandler):
+    """
+    The HTTP API of `pyutube serve`, every request and response body is JSON.
+
+    It only answers the local programs: the requests sent by web pages (with an
+    `Origin` header, or for another host name) are refused, and the bodies must
+    be sent as `application/json`, which the browsers never do without asking.
+
+        POST   /jobs        Submit a job: {"url": ..., "path", "audio", "quality", "jobs", "stream_merge"}
+        GET    /jobs        The status of all the jobs
+        GET    /jobs/<id>   The status of a job
+        DELETE /jobs/<id>   Cancel a job
+        GET    /metrics     The queue depth, the throughput and the connection reuse
+        PUT    /rate        Change the download rates: {"global": "2M", "per_stream": "500k"}
+    """
+
+    job_service: "JobService" = None
+    server_version = "pyutube"
+
+    def do_GET(self) -> None:
+        if not self.is_local_request():
+            return
+
+        if self.path == "/jobs":
+            self.send_json(200, [job.to_dict() for job in self.job_service.list_jobs()])
+        elif self.path == "/metrics":
+            self.send_json(200, self.job_service.metrics())
+        elif JOB_PATH_PATTERN.match(self.path):
+            self.send_job(self.job_service.get(JOB_PATH_PATTERN.match(self.path).group(1)))
+        else:
+            self.send_error_json(404, "Not found")
+
+    def do_POST(self) -> None:
+        if self.path != "/jobs":
+            self.send_error_json(404, "Not found")
+            return
+
+        body = self.read_json()
+        if body is None:
+            return
+
+        options = {key: body[key] for key in ("path", "audio", "quality", "jobs", "stream_merge") if key in body}
+        try:
+            job = self.job_service.submit(body.get("url"), **options)
+        except ValueError as error:
+            self.send_error_json(400, str(error))
+            return
+
+        self.send_json(201, job.to_dict())
+
+    def do_DELETE(self) -> None:
+        if not self.is_local_request():
+            return
+
+        match = JOB_PATH_PATTERN.match(self.path)
+        if match is None:
+            self.send_error_json(404, "Not found")
+            return
+
+        self.send_job(self.job_service.cancel(match.group(1)))
+
+    def do_PUT(self) -> None:
+        if self.path != "/rate":
+            self.send_error_json(404, "Not found")
+            return
+
+        body = self.read_json()
+        if body is None:
+            return
+
+        from pyutube.services.RateLimitService import RateLimitService
+
+        try:
+            rates = [
+                RateLimitService.parse_rate(str(body[key])) if body.get(key) is not None else None
+                for key in ("global", "per_stream")
+            ]
+        except ValueError as error:
+            self.send_error_json(400, str(error))
+            return
+
+        RateLimitService.set_rates(*rates)
+        self.send_json(200, {
+            "global": RateLimitService.global_bucket.rate,
+            "per_stream": RateLimitService.transfer_rate,
+        })
+
+    def is_local_request(self) -> bool:
+        """
+        Check that the request comes from a local program and not from a web page, or answer with a 403 error.
+
+        Returns:
+            bool: True if the request may be answered.
+        """
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0]
+        if self.headers.get("Origin") is not None or host not in LOCAL_HOSTS:
+            self.send_error_json(403, "Only the local programs may use the API")
+            return False
+        return True
+
+    def read_json(self) -> dict:
+        """
+        Read the JSON object of the request body, or answer with an error.
+
+        Returns:
+            dict: The object, or None if the request is refused or the body is not a JSON object.
+        """
+        if not self.is_local_request():
+            return None
+
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self.send_error_json(415, "The body must be sent as application/json")
+            return None
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_SIZE:
+            self.send_error_json(400, "Invalid body size")
+            return None
+
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self.send_error_json(400, "The body must be a JSON object")
+            return None
+
+        return body
+
+    def send_job(self, job) -> None:
+        if job is None:
+            self.send_error_json(404, "No such job")
+        else:
+            self.send_json(200, job.to_dict())
+
+    def send_error_json(self, status: int, message: str) -> None:
+        self.send_json(status, {"error": message})
+
+    def send_json(self, status: int, data) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # The requests are not logged, the jobs report what they do
+        pass
+
+
+def create_server(job_service: "JobService", host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server of the jobs, each request is answered in its own thread.
+
+    Args:
+        job_service: The service that runs the jobs.
+        host: The address to listen on, only the local machine by default.
+        port: The port to listen on, 0 picks a free one.
+
+    Returns:
+        ThreadingHTTPServer: The server, started with `serve_forever`.
+    """
+    handler = type("JobServerHandler", (ServerHandler,), {"job_service": job_service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(job_service: "JobService", host: str = "127.0.0.1", port: int = 8765) -> None:
+    """
+    Answer the requests until the process is interrupted, then cancel the jobs.
+
+    Args:
+        job_service: The service that runs the jobs.
+        host: The address to listen on.
+        port: The port to listen on.
+
+    Returns:
+        None
+    """
+    server = create_server(job_service, host, port)
+    console.print(
+        f"🚀 Pyutube is serving jobs on http://{host}:{server.server_address[1]}, "
+        f"running {job_service.workers} at a time (Ctrl+C to stop)", style="info")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n⏳ Stopping, the unfinished downloads are resumed next time...", style="info")
+    finally:
+        server.server_close()
+        job_service.shutdown()
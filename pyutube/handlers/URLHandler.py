@@ -3,6 +3,72 @@ import sys
 from pyutube.utils import console, error_console
 
 
+VIDEO_ID = r"[0-9A-Za-z_-]{11}"
+VIDEO_ID_PATTERN = re.compile(VIDEO_ID)
+
+# One pattern for all the link types, the matched group tells the type and holds the id
+URL_PATTERN = re.compile(
+    r"(?:https?://)?(?:www\.)?(?:"
+    rf"youtu\.be/(?P<video>{VIDEO_ID})"
+    r"|youtube(?:-nocookie)?\.com/(?:"
+    rf"(?:embed|v|live)/(?P<path_video>{VIDEO_ID})"
+    rf"|watch\?v=(?P<watch>{VIDEO_ID})(?![0-9A-Za-z_-]*&)"
+    rf"|shorts/(?P<short>{VIDEO_ID})"
+    r"|playlist\?list=(?P<playlist>[0-9A-Za-z_-]+)"
+    r"|watch\?(?P<query>[^#\s]*)"
+    rf"|live_stream\?channel=(?P<live_stream>{VIDEO_ID})"
+    r"))"
+)
+# The `v` and `list` parameters of a watch link, wherever they are in the query
+QUERY_PARAM_PATTERN = re.compile(r"(?:^|&)(v|list)=([0-9A-Za-z_-]*)")
+
+UNKNOWN_LINK = ("unknown", None, None)
+
+
+def classify_url(url: str) -> tuple[str, str, str]:
+    """
+    Classify a YouTube link and extract its ids, in a single match.
+
+    Args:
+        url: The link, or a bare video id.
+
+    Returns:
+        tuple[str, str, str]: The link type (video, short, playlist or unknown),
+        the video id and the playlist id, None when the link has none.
+    """
+    match = URL_PATTERN.match(url)
+    if match is None:
+        if len(url) == 11 and VIDEO_ID_PATTERN.fullmatch(url):
+            return "video", url, None
+        return UNKNOWN_LINK
+
+    kind = match.lastgroup
+    value = match.group(kind)
+
+    if kind == "watch":
+        return "video", value, None
+
+    if kind == "query":
+        params = dict(QUERY_PARAM_PATTERN.findall(value))
+        video_id = params.get("v", "")
+        # A watch link is a video, even when it is part of a playlist
+        if len(video_id) < 11:
+            return UNKNOWN_LINK
+        return "video", video_id[:11], params.get("list") or None
+
+    if kind == "playlist":
+        return "playlist", None, value
+
+    if kind == "short":
+        return "short", value, None
+
+    if kind == "live_stream":
+        # The channel of the live stream is in the link, not the video
+        return "video", None, None
+
+    return "video", value, None
+
+
 class URLHandler:
     def __init__(self, url):
         self.url = url
@@ -13,98 +79,98 @@ class URLHandler:
 
         return self.__validate_link(self.url)
 
-    def __validate_link(self, url: str) -> tuple[bool, str]:
+    def classify(self) -> tuple[bool, str]:
         """
-        Validates the given YouTube video URL.
-
-        Args:
-            url (str): The URL of the YouTube video.
+        Classify the URL like `validate`, without printing or exiting on invalid links.
 
         Returns:
-            Tuple[bool, str]: A tuple containing a boolean indicating if the link is valid
-            and a string indicating the type of the link (video or short).
+            Tuple[bool, str]: Whether the link is valid, and its type
+            (video, short, playlist or unknown).
         """
-        is_valid_link, link_type = self.__is_youtube_link(url)
-        if not is_valid_link:
-            error_console.print("❌ Invalid link")
-            sys.exit(1)
+        if self.__is_youtube_video_id(self.url):
+            self.url = f"https://www.youtube.com/watch?v={self.url}"
 
-        return is_valid_link, link_type.lower()
+        return self.__is_youtube_link(self.url)
 
-    def __is_youtube_link(self, link: str) -> tuple[bool, str]:
+    def get_video_id(self) -> str:
         """
-        Check if the given link is a YouTube video, playlist, or shorts link.
-
-        Args:
-            link (str): The link to be checked.
+        Extract the video id from a video or short URL.
 
         Returns:
-            tuple[bool, str]: True if the link is a YouTube video, playlist, or shorts link,
-            False otherwise. The second item of the tuple indicates the type of link found:
-            'video', 'playlist', or 'shorts'.
+            str | None: The video id, or None if the URL does not contain one.
         """
-        is_video = self.__is_youtube_video(link)
-        is_short = self.__is_youtube_shorts(link)
-        is_playlist = self.__is_youtube_playlist(link)
-
-        return (is_video, "video") if is_video \
-            else (is_short, "short") if is_short \
-            else (True, "playlist") if is_playlist\
-            else (False, "unknown")
+        return classify_url(self.url)[1]
 
-    def __is_youtube_shorts(self, link: str) -> bool:
+    @staticmethod
+    def classify_many(urls) -> tuple[list[tuple[str, str]], list[str]]:
         """
-        Check if the given link is a YouTube shorts link.
+        Validate many URLs at once, keeping each video and each playlist once.
 
         Args:
-            link: The link to be checked.
+            urls: The URLs (or bare video ids).
 
         Returns:
-            bool: True if the link is a YouTube shorts link, False otherwise.
+            tuple[list[tuple[str, str]], list[str]]: The unique (link type, id) of the valid
+            links in the order they first appear, the id is the playlist id of the playlists
+            and the video id of the others. And the URLs that were rejected.
         """
-        # shorts_pattern = r"(?:https?:\/\/)?(?:www\.)?youtube\.com\/shorts\/([a-zA-Z0-9_-]+)"
-        shorts_pattern = r"(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/(?:[^\/\n\s]+\/\S+\/|shorts\/|watch\?.*?v=))(?:(?:[^\/\n\s]+\/)?)([a-zA-Z0-9_-]+)"
-        shorts_match = re.match(shorts_pattern, link)
-        return bool(shorts_match)
+        links = {}
+        rejected = []
+        seen_urls = set()
+
+        for url in urls:
+            # The same link is only classified (and rejected) once
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+
+            link_type, video_id, playlist_id = classify_url(url)
+            if link_type == "playlist":
+                key = ("playlist", playlist_id)
+            elif video_id is not None:
+                key = (link_type, video_id)
+            else:
+                rejected.append(url)
+                continue
+
+            # The same video as a video and as a short is kept once
+            if key[1] not in links:
+                links[key[1]] = key
+
+        return list(links.values()), rejected
 
-    def __is_youtube_video(self, link: str) -> bool:
+    def __validate_link(self, url: str) -> tuple[bool, str]:
         """
-        Check if the given link is a YouTube video.
+        Validates the given YouTube video URL.
 
         Args:
-            link: The link to be checked.
+            url (str): The URL of the YouTube video.
 
         Returns:
-            bool: True if the link is a YouTube video, False otherwise.
+            Tuple[bool, str]: A tuple containing a boolean indicating if the link is valid
+            and a string indicating the type of the link (video or short).
         """
-        # video_pattern = re.compile(
-        # r'(?:https?://)?(?:www\.)?(?:youtube\.com/(?:(?:live/?[a-zA-Z0-9_-]{11}\?si=)|(?:(?:watch\?v=)|(?:embed/))|youtu\.be/|youtube.com/share\?v=)([a-zA-Z0-9_-]{11}))')
-        # video_pattern = re.compile(
-        # r'(?:https?://)?(?:www\.)?(?:youtube\.com/(?:(?:watch\?v=)|(?:embed/))|youtu\.be/|youtube.com/share\?v=)([a-zA-Z0-9_-]{11})')
-        # video_pattern = re.compile(
-        #     # "https://www.youtube.com/watch?time_continue=1&v=dQw4w9WgXcQ"
-        # r"^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$"
-        # )
-        video_pattern = re.compile(
-            r"^(?:https?://)?(?:www\.)?(?:youtube(?:-nocookie)?\.com/(?:(watch\?v=|watch\?feature\=share\&v=)|embed/|v/|live_stream\?channel=|live\/)|youtu\.be/)([a-zA-Z0-9_-]{11})"
-        )
-
-        return bool(video_pattern.match(link))
-
-    def __is_youtube_playlist(self, link: str) -> bool:
+        is_valid_link, link_type = self.__is_youtube_link(url)
+        if not is_valid_link:
+            error_console.print("❌ Invalid link")
+            sys.exit(1)
+
+        return is_valid_link, link_type
+
+    def __is_youtube_link(self, link: str) -> tuple[bool, str]:
         """
-        Check if the given link is a YouTube playlist.
+        Check if the given link is a YouTube video, playlist, or shorts link.
 
         Args:
-            link: The link to be checked.
+            link (str): The link to be checked.
 
         Returns:
-            bool: True if the link is a YouTube playlist, False otherwise.
+            tuple[bool, str]: True if the link is a YouTube video, playlist, or shorts link,
+            False otherwise. The second item of the tuple indicates the type of link found:
+            'video', 'playlist', 'short' or 'unknown'.
         """
-        playlist_pattern = r"^(?:https?:\/\/)?(?:www\.)?youtube\.com\/playlist\?list=([a-zA-Z0-9_-]+)"
-        watch_with_playlist_pattern = r"^(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=[a-zA-Z0-9_-]{11}&list=([a-zA-Z0-9_-]+)"
-
-        return bool(re.match(playlist_pattern, link)) or bool(re.match(watch_with_playlist_pattern, link))
+        link_type = classify_url(link)[0]
+        return link_type != "unknown", link_type
 
     def __is_youtube_video_id(self, video_id: str) -> bool:
         """
@@ -116,6 +182,4 @@ class URLHandler:
         Returns:
             bool: True if the string is a valid YouTube video ID, False otherwise.
         """
-        return len(video_id) == 11 and all(
-            c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-" for c in video_id
-        )
+        return len(video_id) == 11 and VIDEO_ID_PATTERN.fullmatch(video_id) is not None
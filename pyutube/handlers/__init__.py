@@ -1,4 +1,6 @@
 from .PlaylistHandler import PlaylistHandler
 from .URLHandler import URLHandler
+from .BatchHandler import BatchHandler
+from .ServerHandler import ServerHandler
 
-__all__ = ['PlaylistHandler', 'URLHandler']
+__all__ = ['PlaylistHandler', 'URLHandler', 'BatchHandler', 'ServerHandler']
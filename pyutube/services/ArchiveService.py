@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from pyutube.utils import get_data_dir
+
+
+ARCHIVE_FILE = "archive.sqlite3"
+# The kinds of downloads, an audio-only download does not count as the video
+KIND_AUDIO = "audio"
+KIND_VIDEO = "video"
+
+
+class ArchiveService:
+    def __init__(self, database: str = None):
+        self.database = database or os.path.join(get_data_dir(), ARCHIVE_FILE)
+        with closing(self.connect()) as connection, connection:
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(downloads)")}
+            if columns and "kind" not in columns:
+                # The archives written before the kind was recorded: the audio downloads are the .m4a files
+                connection.execute("ALTER TABLE downloads RENAME TO downloads_without_kind")
+                self.create_tables(connection)
+                connection.execute(
+                    "INSERT INTO downloads SELECT video_id, itag, size, directory, path, completed_at, "
+                    f"CASE WHEN path LIKE '%.m4a' THEN '{KIND_AUDIO}' ELSE '{KIND_VIDEO}' END "
+                    "FROM downloads_without_kind"
+                )
+                connection.execute("DROP TABLE downloads_without_kind")
+            else:
+                self.create_tables(connection)
+
+    @staticmethod
+    def create_tables(connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS downloads (
+                video_id TEXT NOT NULL,
+                itag INTEGER,
+                size INTEGER,
+                directory TEXT NOT NULL,
+                path TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                PRIMARY KEY (video_id, directory, kind)
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS downloads_directory ON downloads (directory)")
+
+    def connect(self) -> sqlite3.Connection:
+        # One connection per call, so the archive can be used from the worker threads
+        connection = sqlite3.connect(self.database, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def record(self, video_id: str, itag: int, path: str, kind: str = KIND_VIDEO) -> None:
+        """
+        Record a completed download in the archive, in a single transaction.
+
+        Args:
+            video_id: The id of the downloaded video.
+            itag: The itag of the downloaded stream.
+            path: The path of the downloaded file.
+            kind: `KIND_AUDIO` for an audio-only download, `KIND_VIDEO` otherwise.
+
+        Returns:
+            None
+        """
+        path = os.path.abspath(path)
+        size = os.path.getsize(path) if os.path.isfile(path) else None
+
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, itag, size, os.path.dirname(path), path, time.time(), kind),
+            )
+
+    def get_downloaded(self, directory: str, kind: str = KIND_VIDEO) -> dict:
+        """
+        Get the videos downloaded into a directory as the given kind, whose files are still there.
+
+        Args:
+            directory: The directory of the downloaded files.
+            kind: `KIND_AUDIO` for the audio-only downloads, `KIND_VIDEO` for the videos.
+
+        Returns:
+            dict: The path of the downloaded file of each video id.
+        """
+        with closing(self.connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT video_id, path FROM downloads WHERE directory = ? AND kind = ?",
+                (os.path.abspath(directory), kind),
+            ).fetchall()
+
+        return {video_id: path for video_id, path in rows if os.path.isfile(path)}
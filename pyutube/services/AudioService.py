@@ -1,6 +1,3 @@
-from termcolor import colored
-from yaspin import yaspin
-from yaspin.spinners import Spinners
 from pytubefix import YouTube
 
 
@@ -9,11 +6,6 @@ class AudioService:
         self.url = url
 
     @staticmethod
-    @yaspin(
-        text=colored("Downloading the audio...", "green"),
-        color="green",
-        spinner=Spinners.dots13
-    )
     def get_audio_streams(video: YouTube) -> YouTube:
         """
         Function to get audio streams from a video.
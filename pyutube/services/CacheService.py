@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+
+from pytubefix import Stream, YouTube
+from pytubefix.monostate import Monostate
+from pytubefix.query import StreamQuery
+
+from pyutube.utils import get_cache_dir
+
+
+# The title, duration and stream list of a video are trusted for this long
+METADATA_TTL = 7 * 24 * 60 * 60
+# Stream urls must stay valid for at least this long to be reused
+URL_EXPIRY_MARGIN = 30 * 60
+# Size bound of the cache, the least recently used entries are evicted first
+MAX_CACHE_SIZE = 50 * 1024 * 1024
+NO_CACHE_ENV = "PYUTUBE_NO_CACHE"
+
+
+class CachedVideo:
+    """A stand-in for a `YouTube` object, built from the metadata cache without any request."""
+
+    def __init__(self, entry: dict, on_progress_callback=None):
+        self.video_id = entry["video_id"]
+        self.watch_url = f"https://www.youtube.com/watch?v={self.video_id}"
+        self.title = entry["title"]
+        self.length = entry["length"]
+        self.stream_monostate = Monostate(
+            on_progress=on_progress_callback, on_complete=None, title=self.title, duration=self.length
+        )
+        self.fmt_streams = [Stream(stream, self.stream_monostate) for stream in entry["streams"]]
+
+    @property
+    def streams(self) -> StreamQuery:
+        return StreamQuery(self.fmt_streams)
+
+    def register_on_progress_callback(self, func) -> None:
+        self.stream_monostate.on_progress = func
+
+    def register_on_complete_callback(self, func) -> None:
+        self.stream_monostate.on_complete = func
+
+
+class CacheService:
+    lock = threading.Lock()
+
+    def __init__(self, cache_dir: str = None, max_size: int = MAX_CACHE_SIZE):
+        self.enabled = not os.environ.get(NO_CACHE_ENV)
+        self.cache_dir = cache_dir or os.path.join(get_cache_dir(), "metadata")
+        self.max_size = max_size
+
+    def get_path(self, video_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{video_id}.json")
+
+    def get(self, video_id: str) -> dict:
+        """
+        Get the cached metadata of a video, if it is fresh.
+
+        Args:
+            video_id: The id of the video.
+
+        Returns:
+            dict: The cached entry, or None if there is no fresh one.
+        """
+        if not self.enabled:
+            return None
+
+        path = self.get_path(video_id)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        now = time.time()
+        if now - entry.get("cached_at", 0) > METADATA_TTL or entry.get("expires_at", 0) - now < URL_EXPIRY_MARGIN:
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def get_video(self, video_id: str, on_progress_callback=None) -> CachedVideo:
+        """
+        Get a video from the cache, without any request to YouTube.
+
+        Args:
+            video_id: The id of the video.
+            on_progress_callback: The download progress callback of the streams.
+
+        Returns:
+            CachedVideo: The cached video, or None if there is no fresh entry.
+        """
+        entry = self.get(video_id)
+        if not entry:
+            return None
+
+        try:
+            return CachedVideo(entry, on_progress_callback)
+        except Exception:
+            # An entry written by another version of pytubefix
+            return None
+
+    def put(self, video: YouTube) -> None:
+        """
+        Save the metadata and the stream manifest of a video.
+
+        Args:
+            video: The video, with its streams already fetched.
+
+        Returns:
+            None
+        """
+        if not self.enabled or isinstance(video, CachedVideo):
+            return
+
+        streams = [self.serialize_stream(stream) for stream in video.fmt_streams]
+        expires_at = self.get_expiration(video)
+        entry = {
+            "video_id": video.video_id,
+            "title": video.title,
+            "length": video.length,
+            "cached_at": time.time(),
+            "expires_at": expires_at,
+            "streams": streams,
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(video.video_id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    @staticmethod
+    def get_expiration(video: YouTube) -> float:
+        """
+        Get the time the first stream url of a video expires at.
+
+        Args:
+            video: The video, with its streams already fetched.
+
+        Returns:
+            float: The expiration timestamp, 0 if the video has no stream.
+        """
+        return min((stream.expiration.timestamp() for stream in video.fmt_streams), default=0)
+
+    @staticmethod
+    def serialize_stream(stream: Stream) -> dict:
+        """
+        Convert a stream to the manifest format pytubefix builds its streams from.
+
+        Args:
+            stream: The stream.
+
+        Returns:
+            dict: The stream data.
+        """
+        data = {
+            "url": stream.url,
+            "itag": stream.itag,
+            "mimeType": f'{stream.mime_type}; codecs="{", ".join(stream.codecs)}"',
+            "is_otf": stream.is_otf,
+            "bitrate": stream.bitrate,
+            "contentLength": stream._filesize or 0,
+        }
+        if stream.width:
+            data["width"] = stream.width
+        if stream.height:
+            data["height"] = stream.height
+        if hasattr(stream, "fps"):
+            data["fps"] = stream.fps
+        if stream.includes_multiple_audio_tracks:
+            data["audioTrack"] = {
+                "audioIsDefault": stream.is_default_audio_track,
+                "displayName": stream.audio_track_name,
+            }
+        return data
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache fits in `max_size`.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            try:
+                entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")]
+            except OSError:
+                return
+
+            stats = []
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                stats.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in stats)
+
+            for _, size, path in sorted(stats):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total_size -= size
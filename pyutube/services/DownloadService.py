@@ -1,19 +1,30 @@
 from pyutube.handlers.PlaylistHandler import PlaylistHandler
+import contextlib
 import os
-import sys
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from pytubefix import YouTube
 from pytubefix.helpers import safe_filename
 
-from pyutube.utils import asking_video_or_audio, console, error_console
+from pyutube.utils import asking_video_or_audio, console, describe_error, error_console, is_terminal_output
 from pyutube.services.AudioService import AudioService
 from pyutube.services.VideoService import VideoService
 from pyutube.services.FileService import FileService
+from pyutube.services.ProgressService import ProgressService
+from pyutube.services.ArchiveService import ArchiveService, KIND_AUDIO, KIND_VIDEO
+from pyutube.services.EventService import EventService
+from pyutube.services.PrefetchService import PrefetchService
+from pyutube.services.TraceService import TraceService
 
 
 class DownloadService:
     def __init__(
             self, url: str, path: str, quality: str, is_audio: bool = False, make_playlist_in_order: bool = False,
+            jobs: int = 1, show_progress: bool = True, connections: int = 4, interactive: bool = True,
+            prefetch: int = 2, video: YouTube = None, stream_merge: bool = False,
+            cancel_event: threading.Event = None,
     ):
         self.url = url
         self.path = path
@@ -21,52 +32,68 @@ class DownloadService:
         self.is_audio = is_audio
 
         self.make_playlist_in_order = make_playlist_in_order
-
-        self.video_service = VideoService(self.url, self.quality, self.path)
+        self.jobs = max(1, jobs)
+        # The progress is only drawn on a terminal
+        self.show_progress = show_progress and is_terminal_output()
+        self.connections = connections
+        self.interactive = interactive
+        self.prefetch = prefetch
+        self.stream_merge = stream_merge
+        self.cancel_event = cancel_event
+
+        self.video_service = VideoService(self.url, self.quality, self.path, self.interactive, video)
         self.audio_service = AudioService(url)
-        self.file_service = FileService()
+        self.file_service = FileService(self.connections, self.interactive, cancel_event)
 
     def download(self, title_number: int = 0) -> bool:
         video, video_id,  streams, video_audio, self.quality = self.download_preparing()
 
         if self.is_audio:
-            self.download_audio(video, video_audio, video_id, title_number)
+            return self.download_audio(video, video_audio, video_id, title_number)
         else:
-            video_file = self.video_service.get_video_streams(self.quality, streams)
+            video_file = self.video_service.get_video_streams(self.quality, streams, video_audio)
             if not video_file:
                 error_console.print(
                     "Something went wrong while downloading the video.")
-                sys.exit()
+                return False
 
             return self.download_video(video, video_id, video_file, video_audio, title_number)
 
-        return True
-
     def download_audio(self, video: YouTube, video_audio: YouTube, video_id: str, title_number: int = 0) -> bool:
-        audio_filename = self.file_service.generate_filename(video_audio, video_id, is_audio=True)
-
-        if self.make_playlist_in_order:
-            base_name, extension = os.path.splitext(audio_filename)
-            audio_filename = f"{title_number}__{base_name}{extension}"
-
-        audio_filename = self.file_service.handle_existing_file(
-            video, video_id, audio_filename, self.path, self.is_audio)
+        audio_filename = self.get_audio_filename(video, video_audio, video_id, title_number)
+        if audio_filename is None:
+            EventService.emit("skipped", video_id=video_id)
+            return True
 
         try:
-            if self.is_audio:
-                console.print("⏳ Downloading the audio...", style="info")
+            console.print("⏳ Downloading the audio...", style="info")
+            with self.track_progress(video, video_id, [video_audio]):
+                self.file_service.save_file(video_audio, audio_filename,  self.path, video_id=video_id)
+            self.record_download(video_id, video_audio.itag, os.path.join(self.path, audio_filename), KIND_AUDIO)
 
-            self.file_service.save_file(video_audio, audio_filename,  self.path)
+        except InterruptedError as error:
+            EventService.emit("cancelled", video_id=video_id)
+            error_console.print(f"❗ {error}")
+            return False
 
         except Exception as error:
+            EventService.error(error, video_id=video_id)
             error_console.print(
                 f"❗ Error (please report this in github issue: https://github.com/Hetari/pyutube/issues):\n {error}")
-            sys.exit()
+            return False
 
-        if self.is_audio:
-            console.print("\n\n✅ Download completed", style="success")
-            return True
-        return audio_filename
+        console.print("\n\n✅ Download completed", style="success")
+        return True
+
+    def get_audio_filename(self, video: YouTube, video_audio: YouTube, video_id: str, title_number: int = 0) -> str:
+        audio_filename = self.file_service.generate_filename(video_audio, video_id, is_audio=True)
+
+        if self.make_playlist_in_order:
+            base_name, extension = os.path.splitext(audio_filename)
+            audio_filename = f"{title_number}__{base_name}{extension}"
+
+        return self.file_service.handle_existing_file(
+            video, video_id, audio_filename, self.path, self.is_audio)
 
     def download_video(self, video: YouTube, video_id: str, video_stream: YouTube, video_audio: YouTube,
                        title_number: int = 0) -> bool:
@@ -82,28 +109,105 @@ class DownloadService:
         # Handle existing files
         video_filename = self.file_service.handle_existing_file(
             video, video_id, video_filename, self.path, self.is_audio)
+        if video_filename is None:
+            EventService.emit("skipped", video_id=video_id)
+            return self.quality
+        audio_filename = self.get_audio_filename(video, video_audio, video_id, title_number)
+        if audio_filename is None:
+            EventService.emit("skipped", video_id=video_id)
+            return self.quality
 
         try:
             console.print("⏳ Downloading the video...", style="info")
 
-            self.file_service.save_file(video_stream, video_filename, self.path)
-            audio_filename = self.download_audio(video, video_audio, video_id, title_number)
-
             video_base_name, video_extension = os.path.splitext(video_filename)
             audio_base_name, audio_extension = os.path.splitext(audio_filename)
             video_safe_filename = f"{safe_filename(video_base_name)}{video_extension}"
             audio_safe_filename = f"{safe_filename(audio_base_name)}{audio_extension}"
-
-            self.video_service.merging(video_safe_filename, audio_safe_filename)
+            codecs = (video_stream.video_codec, video_audio.audio_codec)
+
+            # The video and audio streams are downloaded at the same time, with one progress line
+            progress = self.track_progress(video, video_id, [video_stream, video_audio])
+            merged_path = None
+            if self.stream_merge and self.video_service.can_stream_merge(codecs):
+                EventService.emit("merge_started", video_id=video_id, streaming=True)
+                try:
+                    with progress:
+                        merged_path = self.video_service.stream_merging(
+                            video_stream, video_audio, video_safe_filename, self.file_service.transfer_service,
+                            self.cancel_event.is_set if self.cancel_event is not None else None)
+                except RuntimeError as error:
+                    EventService.error(error, video_id=video_id, fallback=True)
+                    error_console.print(f"❗ Could not merge the streams while downloading them: {error}")
+                    console.print("⏳ Downloading the video and audio files...", style="info")
+
+            if merged_path is None:
+                with progress:
+                    self.file_service.save_files(
+                        [(video_stream, video_filename), (video_audio, audio_filename)], self.path, video_id)
+
+                EventService.emit("merge_started", video_id=video_id, streaming=False)
+                merged_path = self.video_service.merging(video_safe_filename, audio_safe_filename, codecs=codecs)
+            EventService.emit("merge_finished", video_id=video_id, path=merged_path)
+
+            self.record_download(video_id, video_stream.itag, merged_path, KIND_VIDEO)
+
+        except InterruptedError as error:
+            EventService.emit("cancelled", video_id=video_id)
+            error_console.print(f"❗ {error}")
+            return False
 
         except Exception as error:
+            EventService.error(error, video_id=video_id)
             error_console.print(
                 f"❗ Error (please report this in github issue: https://github.com/Hetari/pyutube/issues):\n {error}")
-            sys.exit()
+            return False
 
         console.print("\n\n✅ Download completed", style="success")
         return self.quality
 
+    def track_progress(self, video: YouTube, video_id: str, streams: list):
+        """
+        Register the progress callbacks of the streams of a video.
+
+        Args:
+            video: The video the streams belong to.
+            video_id: The id of the video.
+            streams: The streams that are downloaded.
+
+        Returns:
+            The context manager that shows the progress while the streams download.
+        """
+        video.register_on_progress_callback(None)
+        progress = contextlib.nullcontext()
+        if self.show_progress:
+            progress = ProgressService(streams, video.title)
+            video.register_on_progress_callback(progress.on_progress)
+
+        EventService.track_progress(video, video_id, streams)
+        return progress
+
+    @staticmethod
+    def record_download(video_id: str, itag: int, path: str, kind: str) -> None:
+        """
+        Record a completed download in the archive, so playlists can skip it later.
+
+        Args:
+            video_id: The id of the downloaded video.
+            itag: The itag of the downloaded stream.
+            path: The path of the downloaded file.
+            kind: Whether the download is the audio (`KIND_AUDIO`) or the video (`KIND_VIDEO`).
+
+        Returns:
+            None
+        """
+        EventService.emit("finished", video_id=video_id, itag=itag, path=path)
+        try:
+            ArchiveService().record(video_id, itag, path, kind)
+        except Exception as error:
+            # The file is downloaded, only the skip check of the next run is affected
+            error_console.print(f"❗ Could not record the download in the archive: {error}")
+
     def asking_video_or_audio(self):
         try:
             self.is_audio = asking_video_or_audio()
@@ -115,37 +219,249 @@ class DownloadService:
         handler = PlaylistHandler(self.url, self.path)
         new_path, is_audio, videos_selected, make_in_order, playlist_videos = handler.process_playlist()
         self.make_playlist_in_order = make_in_order
-        selected_titles = [
-            title for title, video_id in playlist_videos if video_id in videos_selected
-        ]
-
-        # Download the selected videos
-        for index, video_id in enumerate(videos_selected):
-            url = f"https://www.youtube.com/watch?v={video_id}"
-            if make_in_order:
-                i = int(selected_titles[index].split('__')[0])
-            else:
-                i = ''
-
-            self.url = url
-            self.path = new_path
-            self.is_audio = is_audio
-
-            if index == 0:
-                # If it is the first video, download it and store the quality
-                self.video_service = VideoService(self.url, self.quality, self.path)
-                quality = self.download(i)
-                continue
-
-            # If it is not the first video, download it with the stored quality
-            self.quality = quality
-            self.video_service = VideoService(self.url, self.quality, self.path)
-            self.download(i)
+        self.path = new_path
+        self.is_audio = is_audio
+        titles = {video_id: title for title, video_id in playlist_videos}
+
+        items = []
+        for video_id in videos_selected:
+            title = titles.get(video_id, video_id)
+            i = int(title.split('__')[0]) if make_in_order else ''
+            items.append((video_id, title, i))
+
+        if not items:
+            return
+
+        self.queue_items(items)
+        results = [None] * len(items)
+        start = 0
+        prefetch_service = PrefetchService([video_id for video_id, _, _ in items], self.path, self.prefetch)
+        try:
+            if not self.is_audio and not self.quality:
+                # The first video asks for the quality, the rest reuse it, and are prefetched meanwhile
+                video_id, _, i = items[0]
+                self.url = f"https://www.youtube.com/watch?v={video_id}"
+                self.video_service = VideoService(self.url, self.quality, self.path, video=prefetch_service.take(0))
+                self.quality = self.download(i)
+                results[0] = bool(self.quality)
+                self.show_playlist_result(0, len(items), items[0][1], results[0])
+                start = 1
+
+                if not self.quality:
+                    error_console.print("❗ Could not get the quality of the first video, stopping.")
+                    return
+
+            # Download the remaining videos with the stored quality
+            self.download_items(items, results, start, prefetch_service)
+        finally:
+            prefetch_service.close()
+
+        self.show_summary(items, results)
+
+    def download_batch(self, video_ids: Iterable[str], results: list = None) -> bool:
+        """
+        Download many videos without any prompt, with the shared worker pool.
+
+        The ids are read as the downloads go, so the first videos of a playlist
+        download while its next pages load.
+
+        Args:
+            video_ids: The ids of the videos to download.
+            results: The list the results are appended to, a None per video as it is read,
+                replaced by its result as soon as it is known.
+
+        Returns:
+            bool: True if all the videos were downloaded, False otherwise.
+        """
+        self.interactive = False
+        items = []
+        if results is None:
+            results = []
+
+        prefetch_service = PrefetchService([], self.path, self.prefetch)
+        try:
+            self.download_items(
+                items, results, prefetch_service=prefetch_service,
+                incoming=((video_id, video_id, '') for video_id in video_ids))
+        finally:
+            prefetch_service.close()
+
+        self.show_summary(items, results)
+
+        return all(results)
+
+    def download_items(self, items: list, results: list, start: int = 0,
+                       prefetch_service: PrefetchService = None, incoming: Iterator = None) -> None:
+        """
+        Download the (video_id, title, title_number) items from `start`, `self.jobs` at a time.
+
+        The results are stored in `results` and reported in the items order, as soon as they are known.
+
+        Args:
+            items: The items to download.
+            results: The results of the items, filled in place.
+            start: The index of the first item to download.
+            prefetch_service: Fetches the info of the next items while the current ones download.
+            incoming: More items, appended to `items` (and a None to `results`) only when
+                they are about to be downloaded or prefetched.
+
+        Returns:
+            None
+        """
+        lookahead = prefetch_service.lookahead if prefetch_service else 0
+
+        def read_ahead(count: int) -> None:
+            nonlocal incoming
+            while incoming is not None and len(items) < count:
+                item = next(incoming, None)
+                if item is None:
+                    incoming = None
+                    break
+                self.queue_item(len(items), item)
+                items.append(item)
+                results.append(None)
+                if prefetch_service is not None:
+                    prefetch_service.add(item[0])
+
+        def download(index: int) -> bool:
+            video_id, _, i = items[index]
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                return False
+            video = prefetch_service.take(index) if prefetch_service else None
+            return self.download_item(video_id, i, self.show_progress, video)
+
+        def show_result(index: int) -> None:
+            # The total is only known once all the items are read
+            total = len(items) if incoming is None else None
+            self.show_playlist_result(index, total, items[index][1], results[index])
+
+        # The items of `index` and of the prefetch lookahead after it are read before it starts
+        read_ahead(start + 1 + lookahead)
+        if self.jobs == 1:
+            index = start
+            while index < len(items):
+                results[index] = download(index)
+                show_result(index)
+                index += 1
+                read_ahead(index + 1 + lookahead)
+            return
+
+        # Set on Ctrl+C, the running downloads stop and the queued ones never start
+        if self.cancel_event is None:
+            self.cancel_event = threading.Event()
+
+        if incoming is None:
+            console.print(f"⏳ Downloading {len(items) - start} videos, {self.jobs} at a time...", style="info")
+        else:
+            console.print(f"⏳ Downloading the videos, {self.jobs} at a time...", style="info")
+
+        executor = ThreadPoolExecutor(max_workers=self.jobs)
+        try:
+            # A few more items than the workers are queued, so a worker never waits for the next one
+            futures = {}
+            next_submit = next_index = start
+            while True:
+                while next_submit < len(items) and len(futures) < 2 * self.jobs:
+                    futures[executor.submit(download, next_submit)] = next_submit
+                    next_submit += 1
+                    read_ahead(next_submit + 1 + lookahead)
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures.pop(future)] = future.result()
+                while next_index < len(items) and results[next_index] is not None:
+                    show_result(next_index)
+                    next_index += 1
+        except BaseException:
+            self.cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        executor.shutdown()
+
+    @staticmethod
+    def queue_items(items: list) -> None:
+        for index, item in enumerate(items):
+            DownloadService.queue_item(index, item, len(items))
+
+    @staticmethod
+    def queue_item(index: int, item: tuple, total: int = None) -> None:
+        video_id, title, _ = item
+        fields = {"index": index}
+        # The batch items are named by their id, their title is only known from the `metadata` event
+        if title != video_id:
+            fields["title"] = title
+        if total is not None:
+            fields["total"] = total
+        EventService.emit("queued", video_id=video_id, **fields)
+
+    @staticmethod
+    def show_summary(items: list, results: list) -> None:
+        failed = [title for (_, title, _), result in zip(items, results) if not result]
+        console.print(
+            f"\n✅ Downloaded {len(items) - len(failed)} of {len(items)} videos", style="success")
+        if failed:
+            error_console.print(f"❗ Failed to download {len(failed)} videos:")
+            for title in failed:
+                error_console.print(f"   - {title}")
+
+    def download_item(self, video_id: str, title_number, show_progress: bool = False, video: YouTube = None) -> bool:
+        """
+        Download one video with its own services, so it can run in a worker thread.
+
+        Args:
+            video_id: The id of the video to download.
+            title_number: The order number of the video in the playlist.
+            show_progress: Whether to show the download progress bar.
+            video: The prefetched video, if any.
+
+        Returns:
+            bool: True if the video was downloaded, False otherwise.
+        """
+        service = DownloadService(
+            f"https://www.youtube.com/watch?v={video_id}",
+            self.path,
+            self.quality,
+            self.is_audio,
+            self.make_playlist_in_order,
+            show_progress=show_progress,
+            connections=self.connections,
+            # The workers of a pool must not prompt at the same time, the existing files are skipped
+            interactive=self.interactive and self.jobs == 1,
+            video=video,
+            stream_merge=self.stream_merge,
+            cancel_event=self.cancel_event,
+        )
+
+        # One failed video must not stop the whole playlist
+        with TraceService.span("item", "item", video_id=video_id, prefetched=video is not None) as trace_args:
+            try:
+                return bool(service.download(title_number))
+            except InterruptedError as error:
+                EventService.emit("cancelled", video_id=video_id)
+                error_console.print(f"❗ {error}")
+                return False
+            except Exception as error:
+                trace_args["error"] = type(error).__name__
+                EventService.error(error, video_id=video_id)
+                error_console.print(f"❗ Failed to download {video_id}: {describe_error(error)}")
+                return False
+
+    @staticmethod
+    def show_playlist_result(index: int, total: int, title: str, result: bool) -> None:
+        position = f"{index + 1}/{total}" if total is not None else f"{index + 1}"
+        if result:
+            console.print(f"✅ [{position}] {title}", style="success")
+        else:
+            error_console.print(f"❌ [{position}] {title}")
 
     def download_preparing(self):
         video = self.video_service.search_process()
         console.print(f"Title: {video.title}\n", style="info")
         video_id = video.video_id
+        EventService.emit("metadata", video_id=video_id, title=video.title, length=video.length)
         streams, video_audio, self.quality = self.video_service.get_selected_stream(video, self.is_audio)
 
         return video, video_id,  streams, video_audio, self.quality
@@ -0,0 +1,179 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+from pyutube.utils import classify_error, console, error_console
+
+# The progress of an item is reported at most this often, and when it completes
+PROGRESS_INTERVAL = 0.5
+
+
+class ProgressEvents:
+    """Reports the progress of the streams of one item as throttled `progress` events."""
+
+    def __init__(self, video_id: str, streams: list, callback=None):
+        self.video_id = video_id
+        self.total = sum(stream.filesize for stream in streams)
+        self.received = {stream.itag: 0 for stream in streams}
+        self.resumed = {}
+        self.callback = callback
+        self.started = time.monotonic()
+        self.next_report = self.started
+        self.lock = threading.Lock()
+
+    def on_progress(self, stream, chunk: bytes, bytes_remaining: int) -> None:
+        """
+        Progress callback that emits the bytes of the item, then calls the replaced callback.
+
+        The bytes of a resumed stream that were already on disk count for `bytes`, the
+        `speed` only counts the bytes received in this run.
+
+        Args:
+            stream: The stream that received the chunk.
+            chunk: The received chunk.
+            bytes_remaining: The bytes remaining for this stream.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            done = stream.filesize - bytes_remaining
+            resumed = self.resumed.setdefault(stream.itag, done - len(chunk))
+            self.received[stream.itag] = max(0, done - resumed)
+            received = sum(self.received.values())
+            done = received + sum(self.resumed.values())
+            now = time.monotonic()
+            if now >= self.next_report or done >= self.total:
+                self.next_report = now + PROGRESS_INTERVAL
+                elapsed = now - self.started
+                EventService.emit(
+                    "progress", video_id=self.video_id, bytes=done, total=self.total,
+                    speed=round(received / elapsed) if elapsed else None)
+
+        if self.callback is not None:
+            self.callback(stream, chunk, bytes_remaining)
+
+
+class EventService:
+    """
+    Writes the events of the downloads as JSON lines (NDJSON), for the programs
+    that drive pyutube. Every event has an `event` name and a `time`.
+
+    Events are off until `start` is called, emitting costs nothing meanwhile.
+    """
+
+    enabled = False
+    output = None
+    lock = threading.Lock()
+
+    @classmethod
+    def start(cls, path: str) -> None:
+        """
+        Start writing the events.
+
+        When they are written to stdout, the messages for humans are hidden
+        (the errors still go to stderr), and everything else written to stdout
+        (the prompts, plain prints, ffmpeg) goes to stderr, so stdout only holds the events.
+
+        Args:
+            path: The path of the events file, or `-` for stdout.
+
+        Returns:
+            None
+        """
+        if path == "-":
+            cls.output = cls.take_stdout()
+            console.quiet = True
+        else:
+            cls.output = open(path, "a", encoding="utf-8")
+        cls.enabled = True
+
+    @staticmethod
+    def take_stdout():
+        """
+        Keep stdout for the events, and send the rest of the output of the process to stderr.
+
+        The file descriptors are swapped, so the prompts (written to the real stdout)
+        and the child processes are redirected too.
+
+        Returns:
+            The file the events are written to.
+        """
+        sys.stdout.flush()
+        try:
+            stdout_fd = sys.stdout.fileno()
+            stderr_fd = sys.stderr.fileno()
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            # Not backed by a file descriptor (captured output), only redirect the Python writes
+            output, sys.stdout = sys.stdout, sys.stderr
+            return output
+
+        output = os.fdopen(os.dup(stdout_fd), "w", encoding="utf-8")
+        os.dup2(stderr_fd, stdout_fd)
+        return output
+
+    @classmethod
+    def emit(cls, event: str, **fields) -> None:
+        """
+        Write one event.
+
+        Args:
+            event: The name of the event.
+            **fields: The details of the event.
+
+        Returns:
+            None
+        """
+        if not cls.enabled:
+            return
+
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, default=str)
+        with cls.lock:
+            try:
+                cls.output.write(line + "\n")
+                cls.output.flush()
+            except (OSError, ValueError) as error:
+                # The reader went away, the downloads go on without the events
+                cls.enabled = False
+                error_console.print(f"❗ Could not write the events: {error}")
+
+    @classmethod
+    def error(cls, error: BaseException, **fields) -> None:
+        """
+        Write an `error` event, with the class of the error (network, http, unavailable or unknown).
+
+        Args:
+            error: The raised error.
+            **fields: The details of the event, like the video id.
+
+        Returns:
+            None
+        """
+        if not cls.enabled:
+            return
+
+        cls.emit(
+            "error", **fields, error_class=classify_error(error), error_type=type(error).__name__,
+            message=str(error))
+
+    @classmethod
+    def track_progress(cls, video, video_id: str, streams: list) -> None:
+        """
+        Emit the progress of the streams of a video, next to its current progress callback.
+
+        Args:
+            video: The video the streams belong to.
+            video_id: The id of the video.
+            streams: The streams that are downloaded.
+
+        Returns:
+            None
+        """
+        if not cls.enabled:
+            return
+
+        video.register_on_progress_callback(
+            ProgressEvents(video_id, streams, video.stream_monostate.on_progress).on_progress)
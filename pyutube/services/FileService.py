@@ -1,26 +1,88 @@
 import os
-import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pytubefix import YouTube
 from pytubefix.helpers import safe_filename
 from termcolor import colored
 
 from pyutube.utils import ask_rename_file, error_console, console
+from pyutube.services.TransferService import TransferService
+from pyutube.services.TraceService import traced
 
 
 class FileService:
-    def save_file(self, video: YouTube, filename: str, path: str) -> None:
+    def __init__(self, connections: int = 4, interactive: bool = True, cancel_event: threading.Event = None):
+        self.transfer_service = TransferService(connections)
+        self.interactive = interactive
+        self.cancel_event = cancel_event
+
+    def save_file(self, video: YouTube, filename: str, path: str, interrupt_checker=None, video_id: str = None) -> None:
         """
         Save the file to the specified path with the given filename.
 
+        The stream is downloaded over several connections when the server
+        accepts range requests, resuming any unfinished download of the same
+        stream, otherwise over a single connection. Both go through the rate limit.
+
         Args:
             video: The video to be saved.
             path: The path where the video will be saved.
             filename: The name of the file.
+            interrupt_checker: A callable that stops the download when it returns True.
+            video_id: The id of the video, used to match unfinished downloads.
+
+        Returns:
+            None
+
+        Raises:
+            InterruptedError: If the download was cancelled with the cancel event of the service.
+        """
+        if self.cancel_event is not None:
+            checker = interrupt_checker
+            interrupt_checker = lambda: self.cancel_event.is_set() or (checker is not None and checker())
+
+        file_path = os.path.join(path, filename)
+        if not self.transfer_service.download(video, file_path, interrupt_checker, video_id):
+            self.transfer_service.download_sequential(video, file_path, interrupt_checker)
+
+        # Only the `.part` file is kept, to resume the download if the video is submitted again
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.remove_file(path, filename)
+            raise InterruptedError("The download was cancelled")
+
+    def save_files(self, downloads: list, path: str, video_id: str = None) -> None:
+        """
+        Save several streams to the specified path at the same time.
+
+        If one of the downloads fails or is interrupted, the others are cancelled.
+        Their `.part` files are kept to be resumed later, the partial files of
+        downloads that can not be resumed are removed.
+
+        Args:
+            downloads: A list of (stream, filename) tuples.
+            path: The path where the files will be saved.
+            video_id: The id of the video, used to match unfinished downloads.
 
         Returns:
             None
         """
-        video.download(output_path=path, filename=filename)
+        cancel_event = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=len(downloads)) as executor:
+            futures = [
+                executor.submit(self.save_file, stream, filename, path, cancel_event.is_set, video_id)
+                for stream, filename in downloads
+            ]
+
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                cancel_event.set()
+                wait(futures)
+                for _, filename in downloads:
+                    self.remove_file(path, filename)
+                raise
 
     def generate_filename(self, video, video_id, is_audio=False, filename: str = ""):
         """
@@ -38,18 +100,28 @@ class FileService:
 
         return f"{title}_{file_type}{extension}"
 
+    @traced("check_existing_file", "filesystem")
     def handle_existing_file(
-            self, video: YouTube, video_id: str, filename: str, path: str, is_audio: bool = False) -> None:
+            self, video: YouTube, video_id: str, filename: str, path: str, is_audio: bool = False) -> str:
         """
         Handle the case where a file with the same name already exists.
 
+        Without prompts, existing files are kept and None is returned.
+
         Returns:
-            str: The user's choice.
+            str: The filename to download to, or None if the file is skipped
+            (kept, an invalid new name, or a cancelled download).
         """
         # If file with the same name already exists in the path
         if not self.is_file_exists(path, filename):
+            if self.transfer_service.has_partial_download(os.path.join(path, filename), video_id):
+                console.print(f"⏩ Resuming the unfinished download of '{filename}'", style="info")
             return filename
 
+        if not self.interactive:
+            console.print(f"⏩ '{filename}' already exists, skipping", style="info")
+            return None
+
         choice = ask_rename_file(filename).lower()
         if choice.startswith('rename'):
             filename = safe_filename(
@@ -57,13 +129,13 @@ class FileService:
             )
             if not filename:
                 error_console.print("Invalid filename")
-                return False
+                return None
             filename = self.generate_filename(video, video_id, is_audio, filename)
 
             return filename
         elif choice.startswith('cancel'):
             console.print("Download canceled", style="info")
-            sys.exit()
+            return None
 
         # else overwrite
         return filename
@@ -78,6 +150,22 @@ class FileService:
         text = colored(filename, 'yellow')
         return input(f"Rename {text} to: ")
 
+    @staticmethod
+    def remove_file(path: str, filename: str) -> None:
+        """
+        Remove a file if it exists.
+
+        Args:
+            path: The path where the file is located.
+            filename: The name of the file to remove.
+
+        Returns:
+            None
+        """
+        file_path = os.path.join(path, filename)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
     @staticmethod
     def is_file_exists(path: str, filename: str) -> bool:
         """
@@ -0,0 +1,302 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pyutube.utils import console, error_console, get_connection_stats
+
+# The finished jobs kept for their status, the oldest are forgotten first
+MAX_FINISHED_JOBS = 1000
+# The most videos of one job downloaded at once
+MAX_JOB_WORKERS = 16
+JOB_STATES = ("queued", "running", "finished", "failed", "cancelled")
+
+
+class Job:
+    """A URL submitted to the server, with its options and the results of its videos."""
+
+    def __init__(self, job_id: str, url: str, path: str, audio: bool = False, quality: str = None,
+                 jobs: int = 1, stream_merge: bool = False):
+        self.id = job_id
+        self.url = url
+        self.path = path
+        self.audio = audio
+        self.quality = quality
+        self.jobs = jobs
+        self.stream_merge = stream_merge
+
+        self.status = "queued"
+        self.error = None
+        self.results = []
+        self.rejected = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def to_dict(self) -> dict:
+        """
+        The status of the job, as sent to the clients.
+
+        Returns:
+            dict: The options, the state and the counters of the job.
+        """
+        results = list(self.results)
+        return {
+            "id": self.id,
+            "url": self.url,
+            "path": self.path,
+            "audio": self.audio,
+            "quality": self.quality,
+            "status": self.status,
+            "error": self.error,
+            "videos": len(results),
+            "downloaded": sum(1 for result in results if result),
+            "failed": sum(1 for result in results if result is False),
+            "rejected": self.rejected,
+            "created": round(self.created, 3),
+            "started": round(self.started, 3) if self.started else None,
+            "finished": round(self.finished, 3) if self.finished else None,
+        }
+
+
+class JobService:
+    """
+    Runs the jobs submitted to `pyutube serve`, `workers` at a time.
+
+    The process stays up between the jobs, so the shared HTTP session keeps its
+    connections open, the caches stay loaded and the worker pool is reused.
+    """
+
+    def __init__(self, path: str, workers: int = 1, connections: int = 4, prefetch: int = 2):
+        self.path = os.path.realpath(path)
+        self.workers = max(1, workers)
+        self.connections = connections
+        self.prefetch = prefetch
+
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pyutube-job")
+
+        self.started = time.monotonic()
+        self.running = 0
+        # The time spent with at least one running job, the throughput is measured over it
+        self.busy_seconds = 0.0
+        self.busy_since = None
+
+    def submit(self, url: str, path: str = None, audio: bool = False, quality: str = None,
+               jobs: int = 1, stream_merge: bool = False) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            url: The URL of the video, short or playlist, or a video id.
+            path: The directory to save the videos, relative to the directory of the server
+                and inside it, the directory of the server by default.
+            audio: Whether to download only the audio.
+            quality: The policy used to pick the resolution of each video, `best` by default.
+            jobs: The number of videos of the job downloaded at once.
+            stream_merge: Whether to merge the video and audio while they download.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            ValueError: If an option is invalid.
+        """
+        if not isinstance(url, str) or not url.strip():
+            raise ValueError("The url of the job is missing")
+        if quality is not None:
+            from pyutube.services.QualityService import QualityService
+
+            QualityService(quality)
+        if not isinstance(jobs, int) or isinstance(jobs, bool) or not 1 <= jobs <= MAX_JOB_WORKERS:
+            raise ValueError(f"The jobs of the job must be a number from 1 to {MAX_JOB_WORKERS}")
+        path = self.resolve_path(path)
+
+        with self.lock:
+            job = Job(str(next(self.ids)), url.strip(), path, bool(audio), quality, jobs, bool(stream_merge))
+            self.jobs[job.id] = job
+            self.forget_finished_jobs()
+            job.future = self.executor.submit(self.run, job)
+
+        console.print(f"📥 Job {job.id} queued: {job.url}", style="info")
+        return job
+
+    def resolve_path(self, path: str = None) -> str:
+        """
+        Resolve the directory of a job, the clients can only save inside the directory of the server.
+
+        Args:
+            path: The directory, relative to the directory of the server.
+
+        Returns:
+            str: The absolute directory.
+
+        Raises:
+            ValueError: If the directory is not inside the directory of the server.
+        """
+        if path is None:
+            return self.path
+        if not isinstance(path, str):
+            raise ValueError("The path of the job must be a string")
+
+        # The links are resolved, so they can not lead out of the directory either
+        resolved = os.path.realpath(os.path.join(self.path, path))
+        if os.path.commonpath([self.path, resolved]) != self.path:
+            raise ValueError("The path of the job must be inside the directory of the server")
+        return resolved
+
+    def get(self, job_id: str) -> Job:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list[Job]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a job. A queued job never starts, a running job stops its transfers
+        and skips its remaining videos.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            Job: The job, or None if there is no such job.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+
+            job.cancel_event.set()
+            if job.future.cancel():
+                job.status = "cancelled"
+                job.finished = time.time()
+
+        console.print(f"🛑 Job {job_id} cancelled", style="info")
+        return job
+
+    def run(self, job: Job) -> None:
+        """
+        Download the videos of a job, in a worker of the pool.
+
+        Args:
+            job: The job.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            # Cancelled while the worker was picking it up
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+                job.finished = time.time()
+                return
+            job.status = "running"
+            job.started = time.time()
+            self.running += 1
+            if self.running == 1:
+                self.busy_since = time.monotonic()
+
+        try:
+            job.status = self.download(job)
+        except Exception as error:
+            job.status = "failed"
+            job.error = str(error)
+            error_console.print(f"❗ Job {job.id} failed: {error}")
+        finally:
+            with self.lock:
+                job.finished = time.time()
+                self.running -= 1
+                if self.running == 0:
+                    self.busy_seconds += time.monotonic() - self.busy_since
+                    self.busy_since = None
+
+        console.print(f"🏁 Job {job.id} {job.status}", style="info")
+
+    def download(self, job: Job) -> str:
+        """
+        Expand the URL of a job into its videos and download them.
+
+        Returns:
+            str: The final state of the job.
+        """
+        from pyutube.handlers.BatchHandler import BatchHandler
+        from pyutube.services.DownloadService import DownloadService
+
+        batch_handler = BatchHandler(job.url)
+        # The rejected URLs are added as the videos are read, the status shows them meanwhile
+        job.rejected = batch_handler.rejected
+        video_ids = batch_handler.iter_video_ids([job.url])
+        first_video_id = next(video_ids, None)
+        if first_video_id is None:
+            job.error = "Invalid link" if job.rejected else "No videos to download"
+            return "failed"
+
+        os.makedirs(job.path, exist_ok=True)
+
+        # The results are filled in place, so the status shows the progress of the job
+        download_service = DownloadService(
+            None, job.path, job.quality, is_audio=job.audio, jobs=job.jobs, connections=self.connections,
+            interactive=False, show_progress=False, prefetch=self.prefetch, stream_merge=job.stream_merge,
+            cancel_event=job.cancel_event)
+        succeeded = download_service.download_batch(itertools.chain([first_video_id], video_ids), job.results)
+
+        if job.cancel_event.is_set():
+            return "cancelled"
+        return "finished" if succeeded and not job.rejected else "failed"
+
+    def metrics(self) -> dict:
+        """
+        The queue depth and the throughput of the server.
+
+        Returns:
+            dict: The number of jobs in each state, the downloaded bytes, the throughput
+            while jobs were running (bytes per second) and the reuse of the HTTP connections.
+        """
+        from pyutube.services.RateLimitService import RateLimitService
+
+        with self.lock:
+            states = dict.fromkeys(JOB_STATES, 0)
+            for job in self.jobs.values():
+                states[job.status] += 1
+
+            busy_seconds = self.busy_seconds
+            if self.busy_since is not None:
+                busy_seconds += time.monotonic() - self.busy_since
+
+        transferred = RateLimitService.transferred
+        return {
+            "queue_depth": states["queued"],
+            "jobs": states,
+            "workers": self.workers,
+            "bytes": transferred,
+            "busy_seconds": round(busy_seconds, 3),
+            "throughput": round(transferred / busy_seconds) if busy_seconds > 0 else 0,
+            "uptime": round(time.monotonic() - self.started, 3),
+            "connections": get_connection_stats(),
+        }
+
+    def forget_finished_jobs(self) -> None:
+        """Forget the oldest finished jobs past `MAX_FINISHED_JOBS`, the lock must be held."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def shutdown(self) -> None:
+        """
+        Cancel the jobs and wait for the running ones to stop.
+
+        Returns:
+            None
+        """
+        for job in self.list_jobs():
+            self.cancel(job.id)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pytubefix import YouTube
+
+from pyutube.services.CacheService import CacheService, URL_EXPIRY_MARGIN
+from pyutube.services.VideoService import VideoService
+
+
+class PrefetchService:
+    """
+    Fetch the info and the stream manifest of the next videos while the current ones download.
+
+    At most `lookahead` videos are fetched ahead of the last taken one. A video
+    whose stream urls are about to expire is dropped, and fetched again when
+    its download starts.
+    """
+
+    def __init__(self, video_ids: list[str], path: str, lookahead: int = 2):
+        self.video_ids = video_ids
+        self.path = path
+        self.lookahead = max(0, lookahead)
+        self.futures = {}
+        self.next_index = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.lookahead, thread_name_prefix="pyutube-prefetch") if self.lookahead else None
+
+    def add(self, video_id: str) -> None:
+        """
+        Add an item after the known ones, it is prefetched when its turn comes.
+
+        Args:
+            video_id: The id of the video of the item.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.video_ids.append(video_id)
+
+    def take(self, index: int) -> YouTube:
+        """
+        Take the prefetched video of an item, and start prefetching the next ones.
+
+        Args:
+            index: The index of the item.
+
+        Returns:
+            YouTube: The video, or None if it was not prefetched, failed or expires soon.
+        """
+        if self.executor is None:
+            return None
+
+        with self.lock:
+            future = self.futures.pop(index, None)
+            self.next_index = max(self.next_index, index + 1)
+            self.fill()
+
+        if future is None:
+            return None
+
+        try:
+            video = future.result()
+        except Exception:
+            # The download fetches the video again, and reports the error
+            return None
+
+        return None if self.is_expiring(video) else video
+
+    def fill(self) -> None:
+        """
+        Drop the expiring videos of the lookahead, and prefetch the next items until it is full.
+
+        Returns:
+            None
+        """
+        for index, future in list(self.futures.items()):
+            if future.done() and (future.exception() is not None or self.is_expiring(future.result())):
+                del self.futures[index]
+
+        while len(self.futures) < self.lookahead and self.next_index < len(self.video_ids):
+            self.futures[self.next_index] = self.executor.submit(self.fetch, self.video_ids[self.next_index])
+            self.next_index += 1
+
+    def fetch(self, video_id: str) -> YouTube:
+        """Fetch a video in a prefetch thread, the errors are raised by `take`."""
+        video_service = VideoService(f"https://www.youtube.com/watch?v={video_id}", None, self.path)
+        return video_service.prefetch_video()
+
+    @staticmethod
+    def is_expiring(video: YouTube) -> bool:
+        """
+        Check if the stream urls of a video expire too soon to be downloaded.
+
+        Args:
+            video: The video.
+
+        Returns:
+            bool: True if a stream url expires soon, False otherwise.
+        """
+        try:
+            return CacheService.get_expiration(video) - time.time() < URL_EXPIRY_MARGIN
+        except Exception:
+            return True
+
+    def close(self) -> None:
+        """
+        Stop prefetching, the videos that are not fetched yet are cancelled.
+
+        Returns:
+            None
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,156 @@
+import threading
+import time
+
+from pytubefix import Stream
+from rich.live import Live
+from rich.text import Text
+
+from pyutube.utils import console
+
+# The display is redrawn this many times a second, however many chunks arrive
+REFRESH_PER_SECOND = 10
+BAR_WIDTH = 20
+ONE_MB = 1024 * 1024
+
+
+class ProgressService:
+    """
+    The progress of one download (all its streams), shown with the other
+    running downloads in a single display, with the total and the ETA.
+
+    The progress callback only records the received bytes, the display is
+    redrawn by its own thread at `REFRESH_PER_SECOND`, so the cost of a chunk
+    does not depend on the terminal or on the number of downloads. The bytes
+    of a resumed stream that were already on disk count for the progress,
+    not for the speed.
+    """
+
+    active = []
+    live = None
+    lock = threading.Lock()
+
+    def __init__(self, streams: list[Stream], name: str = ""):
+        self.name = name
+        self.total = sum(stream.filesize for stream in streams)
+        self.received = {stream.itag: 0 for stream in streams}
+        self.resumed = {}
+        self.started = time.monotonic()
+
+    def __enter__(self) -> "ProgressService":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.finish()
+
+    def on_progress(self, stream: Stream, chunk: bytes, bytes_remaining: int) -> None:
+        """
+        Progress callback that records the bytes of the stream received in this run.
+
+        Args:
+            stream: The stream that received the chunk.
+            chunk: The received chunk.
+            bytes_remaining: The bytes remaining for this stream.
+
+        Returns:
+            None
+        """
+        done = stream.filesize - bytes_remaining
+        # The first chunk of the run tells how much of the stream was already on disk
+        resumed = self.resumed.setdefault(stream.itag, done - len(chunk))
+        self.received[stream.itag] = max(0, done - resumed)
+
+    def start(self) -> None:
+        """
+        Add the download to the display, the display is started by the first one.
+
+        Returns:
+            None
+        """
+        cls = ProgressService
+        self.started = time.monotonic()
+        with cls.lock:
+            cls.active.append(self)
+            if cls.live is None:
+                cls.live = Live(
+                    get_renderable=cls.render, console=console,
+                    refresh_per_second=REFRESH_PER_SECOND, transient=True)
+                cls.live.start()
+
+    def finish(self) -> None:
+        """
+        Remove the download from the display, the display is stopped with the last one.
+
+        Returns:
+            None
+        """
+        cls = ProgressService
+        live = None
+        with cls.lock:
+            if self in cls.active:
+                cls.active.remove(self)
+            if not cls.active:
+                live, cls.live = cls.live, None
+
+        # Stopped outside of the lock, the refresh thread may be rendering
+        if live is not None:
+            live.stop()
+
+    @classmethod
+    def render(cls) -> Text:
+        """
+        Render a line for each running download, and their total when there are several.
+
+        Returns:
+            Text: The display.
+        """
+        downloads = list(cls.active)
+        now = time.monotonic()
+        lines = []
+        received_sum = total_sum = speed_sum = 0
+
+        for download in downloads:
+            received = sum(download.received.values())
+            done = received + sum(download.resumed.values())
+            elapsed = now - download.started
+            speed = received / elapsed if elapsed > 0 else 0
+            lines.append(cls.format_line(download.name, done, download.total, speed))
+
+            received_sum += done
+            total_sum += download.total
+            speed_sum += speed
+
+        if len(downloads) > 1:
+            lines.append(cls.format_line(f"Total ({len(downloads)} downloads)", received_sum, total_sum, speed_sum))
+
+        # The names are at the end of the lines, they are cut to fit the terminal
+        return Text("\n".join(lines), style="info", no_wrap=True, overflow="ellipsis")
+
+    @staticmethod
+    def format_line(name: str, received: int, total: int, speed: float) -> str:
+        """
+        Format the progress of a download, like `████░░░░  50% 5.0/10.0 MB  2.0 MB/s  ETA 0:03  name`.
+
+        Args:
+            name: The name of the download.
+            received: The received bytes.
+            total: The total bytes.
+            speed: The speed in bytes per second.
+
+        Returns:
+            str: The line.
+        """
+        ratio = min(1.0, received / total) if total else 0.0
+        filled = int(BAR_WIDTH * ratio)
+        bar = "█" * filled + "░" * (BAR_WIDTH - filled)
+
+        if speed > 0 and total > received:
+            remaining = int((total - received) / speed)
+            eta = f"{remaining // 60}:{remaining % 60:02d}"
+        else:
+            eta = "-:--"
+
+        return (
+            f"{bar} {ratio:4.0%} {received / ONE_MB:.1f}/{total / ONE_MB:.1f} MB  "
+            f"{speed / ONE_MB:.1f} MB/s  ETA {eta}  {name}"
+        )
@@ -0,0 +1,170 @@
+import re
+
+# <=1080p, <=2500kbps, <=2.5mbps, <=500mb, <=1.5gb
+LIMIT_PATTERN = re.compile(r"^<=\s*(\d+(?:\.\d+)?)\s*(p|kbps|mbps|kb|mb|gb)$")
+# 720p, 720p|nearest, 720p|best, 720p|smallest
+RESOLUTION_PATTERN = re.compile(r"^(\d+)p?(?:\s*\|\s*(nearest|best|smallest))?$")
+
+BITRATE_UNITS = {"kbps": 1000, "mbps": 1000 * 1000}
+SIZE_UNITS = {"kb": 1024, "mb": 1024 * 1024, "gb": 1024 * 1024 * 1024}
+
+
+class QualityService:
+    """
+    Resolve a quality policy against the video streams of each video, without prompting.
+
+    The policies are:
+        best                The highest resolution.
+        smallest            The lowest resolution.
+        720p, 720p|nearest  The given resolution, or the nearest one.
+        720p|best           The given resolution, or the highest one.
+        720p|smallest       The given resolution, or the lowest one.
+        <=1080p             The highest resolution up to 1080p.
+        <=2500kbps          The highest resolution whose bitrate (with audio) fits, also in mbps.
+        <=500mb             The highest resolution whose size (with audio) fits, also in kb and gb.
+
+    The limits fall back to the lowest resolution when nothing fits. Bitrates and
+    sizes are read from the stream manifest, the streams are never requested.
+    """
+
+    def __init__(self, policy: str):
+        self.policy = policy
+        self.kind, self.value, self.fallback = self.parse(policy)
+
+    @staticmethod
+    def parse(policy: str) -> tuple:
+        """
+        Parse a quality policy.
+
+        Args:
+            policy: The quality policy.
+
+        Returns:
+            tuple: The kind of the policy (best, smallest, resolution, height, bitrate or size),
+            its value and the fallback of a resolution policy.
+
+        Raises:
+            ValueError: If the policy is not valid.
+        """
+        text = policy.strip().lower()
+
+        if text in ("best", "smallest"):
+            return text, None, None
+
+        match = RESOLUTION_PATTERN.match(text)
+        if match:
+            return "resolution", int(match.group(1)), match.group(2) or "nearest"
+
+        match = LIMIT_PATTERN.match(text)
+        if match:
+            number, unit = float(match.group(1)), match.group(2)
+            if unit == "p":
+                return "height", int(number), None
+            if unit in BITRATE_UNITS:
+                return "bitrate", number * BITRATE_UNITS[unit], None
+            return "size", number * SIZE_UNITS[unit], None
+
+        raise ValueError(f"Invalid quality '{policy}', use best, smallest, 720p, 720p|nearest, <=1080p, "
+                         "<=2500kbps or <=500mb")
+
+    def select(self, streams, audio_stream=None):
+        """
+        Select the video stream that matches the policy.
+
+        Args:
+            streams: The video streams to choose from.
+            audio_stream: The audio stream merged with the video, counted in the bitrate and size limits.
+
+        Returns:
+            Stream: The selected stream, or None if there is no video stream.
+        """
+        table = self.index(streams)
+        if not table:
+            return None
+
+        # The table is ordered from the lowest to the highest resolution
+        heights = list(table)
+
+        if self.kind == "best":
+            return table[heights[-1]][0]
+
+        if self.kind == "smallest":
+            return table[heights[0]][0]
+
+        if self.kind == "resolution":
+            if self.value in table:
+                return table[self.value][0]
+            if self.fallback == "best":
+                return table[heights[-1]][0]
+            if self.fallback == "smallest":
+                return table[heights[0]][0]
+            nearest = min(heights, key=lambda height: (abs(height - self.value), -height))
+            return table[nearest][0]
+
+        for height in reversed(heights):
+            for stream in table[height]:
+                if self.fits(stream, height, audio_stream):
+                    return stream
+
+        return table[heights[0]][0]
+
+    def fits(self, stream, height: int, audio_stream=None) -> bool:
+        """
+        Check if a stream is within the limit of the policy.
+
+        Args:
+            stream: The video stream.
+            height: The resolution of the stream.
+            audio_stream: The audio stream merged with the video.
+
+        Returns:
+            bool: True if the stream is within the limit, False otherwise.
+        """
+        if self.kind == "height":
+            return height <= self.value
+
+        if self.kind == "bitrate":
+            bitrate = (stream.bitrate or 0) + ((audio_stream.bitrate or 0) if audio_stream else 0)
+            return bitrate <= self.value
+
+        size = self.estimate_size(stream) + (self.estimate_size(audio_stream) if audio_stream else 0)
+        return size <= self.value
+
+    @staticmethod
+    def estimate_size(stream) -> int:
+        """
+        Get the size of a stream from the manifest, or estimate it from its bitrate and duration.
+
+        Args:
+            stream: The stream.
+
+        Returns:
+            int: The size of the stream in bytes, 0 if it is unknown.
+        """
+        if stream._filesize:
+            return stream._filesize
+
+        duration = stream._monostate.duration
+        if duration and stream.bitrate:
+            return int(duration * stream.bitrate / 8)
+
+        return 0
+
+    @staticmethod
+    def index(streams) -> dict:
+        """
+        Index the video streams by resolution.
+
+        Args:
+            streams: The video streams.
+
+        Returns:
+            dict: The streams of each resolution (in the manifest order), from the lowest to the highest resolution.
+        """
+        table = {}
+        for stream in streams:
+            match = re.match(r"^(\d+)p", stream.resolution or "")
+            if match:
+                table.setdefault(int(match.group(1)), []).append(stream)
+
+        return dict(sorted(table.items()))
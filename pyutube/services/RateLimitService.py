@@ -0,0 +1,205 @@
+import os
+import re
+import threading
+import time
+import weakref
+
+from pyutube.utils import error_console
+
+# A full bucket lets this many seconds of traffic through at once
+BURST_SECONDS = 0.5
+# The longest sleep between two checks, so rate changes and cancels apply quickly
+MAX_WAIT = 0.25
+RATE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?(?:/s)?$")
+RATE_UNITS = {"": 1, "k": 1024, "m": 1024 * 1024, "g": 1024 * 1024 * 1024}
+
+
+class TokenBucket:
+    """A token bucket that lets `rate` bytes per second through, 0 means unlimited."""
+
+    def __init__(self, rate: float = 0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+        self.tokens = self.capacity
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the rate of the bucket, the waiting transfers pick it up at once.
+
+        Args:
+            rate: The new rate in bytes per second, 0 means unlimited.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.refill()
+            self.rate = max(0, rate)
+            self.capacity = self.rate * BURST_SECONDS
+            self.tokens = min(self.tokens, self.capacity)
+
+    def refill(self) -> None:
+        """Add the tokens earned since the last refill, the lock must be held."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: int, should_stop=None) -> None:
+        """
+        Wait until `amount` bytes may go through the bucket.
+
+        A chunk bigger than the bucket goes through when the bucket is full,
+        and the next chunks wait for the debt to be paid back.
+
+        Args:
+            amount: The number of bytes.
+            should_stop: A callable that stops the wait when it returns True.
+
+        Returns:
+            None
+        """
+        while True:
+            with self.lock:
+                if not self.rate:
+                    return
+
+                self.refill()
+                if self.tokens >= min(amount, self.capacity):
+                    self.tokens -= amount
+                    return
+
+                wait = (min(amount, self.capacity) - self.tokens) / self.rate
+
+            time.sleep(min(wait, MAX_WAIT))
+            if should_stop is not None and should_stop():
+                return
+
+
+class RateLimitService:
+    """
+    Limits the download rate of all the transfers of the process.
+
+    Every transfer goes through the global bucket, shared by the video and audio
+    streams and the playlist workers, and through its own bucket.
+    Both rates can be changed while the downloads are running.
+    """
+
+    global_bucket = TokenBucket()
+    transfer_rate = 0
+    transfer_buckets = weakref.WeakSet()
+    # The bytes that went through, for the throughput of the long-running process
+    transferred = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def set_rates(cls, global_rate: float = None, transfer_rate: float = None) -> None:
+        """
+        Change the global rate and the rate of each transfer, including the running ones.
+
+        Args:
+            global_rate: The rate of all the transfers together in bytes per second, 0 means unlimited.
+            transfer_rate: The rate of each transfer in bytes per second, 0 means unlimited.
+
+        Returns:
+            None
+        """
+        if global_rate is not None:
+            cls.global_bucket.set_rate(global_rate)
+
+        if transfer_rate is not None:
+            with cls.lock:
+                cls.transfer_rate = transfer_rate
+                buckets = list(cls.transfer_buckets)
+            for bucket in buckets:
+                bucket.set_rate(transfer_rate)
+
+    @classmethod
+    def new_transfer(cls) -> TokenBucket:
+        """
+        Create the bucket of a new transfer.
+
+        Returns:
+            TokenBucket: The bucket, limited to the current rate of each transfer.
+        """
+        with cls.lock:
+            bucket = TokenBucket(cls.transfer_rate)
+            cls.transfer_buckets.add(bucket)
+        return bucket
+
+    @classmethod
+    def throttle(cls, bucket: TokenBucket, amount: int, should_stop=None) -> None:
+        """
+        Wait until `amount` bytes of the transfer may go through.
+
+        Args:
+            bucket: The bucket of the transfer.
+            amount: The number of bytes.
+            should_stop: A callable that stops the wait when it returns True.
+
+        Returns:
+            None
+        """
+        bucket.consume(amount, should_stop)
+        cls.global_bucket.consume(amount, should_stop)
+        with cls.lock:
+            cls.transferred += amount
+
+    @staticmethod
+    def parse_rate(text: str) -> float:
+        """
+        Parse a rate like `500k`, `2M`, `1.5MB/s` or `0` (unlimited) into bytes per second.
+
+        Args:
+            text: The rate.
+
+        Returns:
+            float: The rate in bytes per second.
+
+        Raises:
+            ValueError: If the rate is not valid.
+        """
+        match = RATE_PATTERN.match(text.strip().lower())
+        if not match:
+            raise ValueError(f"Invalid rate '{text}', use a number of bytes per second like 500k or 2M")
+
+        return float(match.group(1)) * RATE_UNITS[match.group(2)]
+
+    @classmethod
+    def watch_file(cls, path: str, interval: float = 1.0) -> threading.Thread:
+        """
+        Apply the rates written in a file whenever it changes, in a background thread.
+
+        The file holds the global rate, optionally followed by the rate of each transfer,
+        for example `2M` or `2M 500k`.
+
+        Args:
+            path: The path of the file.
+            interval: The number of seconds between two checks of the file.
+
+        Returns:
+            threading.Thread: The started daemon thread.
+        """
+        def watch() -> None:
+            last_modified = None
+            while True:
+                try:
+                    modified = os.stat(path).st_mtime
+                    if modified != last_modified:
+                        last_modified = modified
+                        with open(path, encoding="utf-8") as file:
+                            rates = [cls.parse_rate(rate) for rate in file.read().split()]
+                        if rates:
+                            cls.set_rates(*rates[:2])
+                except FileNotFoundError:
+                    pass
+                except (OSError, ValueError) as error:
+                    error_console.print(f"❗ Could not apply the rate limit file: {error}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=watch, name="pyutube-rate-limit", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,163 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+from pyutube.utils import error_console
+
+
+class Span:
+    """A timed phase, recorded when it ends. Its args can be filled while it runs."""
+
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> dict:
+        self.start = time.perf_counter()
+        return self.args
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+
+        # Transfers report their bytes, the throughput is derived from the span
+        if "bytes" in self.args and end > self.start:
+            self.args["throughput"] = round(self.args["bytes"] / (end - self.start))
+
+        TraceService.add(self.name, self.category, self.start, end, self.args)
+
+
+class _NoSpan:
+    """The span used when tracing is off, it records nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        return None
+
+
+NO_SPAN = _NoSpan()
+
+
+class TraceService:
+    """
+    Records the phases of the downloads as spans, and writes them in the
+    Chrome trace-event format (chrome://tracing, Perfetto, speedscope).
+
+    Tracing is off until `start` is called, the spans cost nothing meanwhile.
+    """
+
+    enabled = False
+    path = None
+    events = []
+    threads = {}
+    origin = time.perf_counter()
+    lock = threading.Lock()
+
+    @classmethod
+    def start(cls, path: str) -> None:
+        """
+        Start recording, the trace is written to the path when the process exits.
+
+        Args:
+            path: The path of the trace file.
+
+        Returns:
+            None
+        """
+        cls.path = path
+        cls.origin = time.perf_counter()
+        cls.enabled = True
+        atexit.register(cls.save)
+
+    @classmethod
+    def span(cls, name: str, category: str = "pyutube", **args) -> Span:
+        """
+        Time a phase, use it as `with TraceService.span("merge") as args: ...`.
+
+        Args:
+            name: The name of the phase.
+            category: The category of the phase.
+            **args: The details shown with the span, `bytes` adds the throughput.
+
+        Returns:
+            Span: The context manager of the span.
+        """
+        if not cls.enabled:
+            return NO_SPAN
+        return Span(name, category, args)
+
+    @classmethod
+    def add(cls, name: str, category: str, start: float, end: float, args: dict) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - cls.origin) * 1_000_000),
+            "dur": round((end - start) * 1_000_000),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with cls.lock:
+            cls.events.append(event)
+            cls.threads.setdefault(thread.ident, thread.name)
+
+    @classmethod
+    def save(cls) -> None:
+        """
+        Write the recorded spans to the trace file.
+
+        Returns:
+            None
+        """
+        if not cls.enabled or not cls.path:
+            return
+
+        with cls.lock:
+            events = list(cls.events)
+            threads = dict(cls.threads)
+
+        # Name the threads, so the workers are told apart in the viewers
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+            for ident, name in threads.items()
+        ]
+
+        try:
+            with open(cls.path, "w", encoding="utf-8") as file:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file, default=str)
+        except OSError as error:
+            error_console.print(f"❗ Could not write the trace: {error}")
+
+
+def traced(name: str, category: str = "pyutube"):
+    """
+    Decorator that records every call of the function as a span.
+
+    Args:
+        name: The name of the phase.
+        category: The category of the phase.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TraceService.span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,461 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from pytubefix import Stream
+
+from pyutube.utils import get_session
+from pyutube.services.RateLimitService import RateLimitService
+from pyutube.services.TraceService import TraceService
+
+
+# Streams smaller than two segments are not worth splitting
+MIN_SEGMENT_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Streams written in order (to a pipe) are requested in ranges of this size
+STREAM_RANGE_SIZE = 9 * 1024 * 1024
+
+# Unfinished downloads are written to `<file>.part`, and their state to `<file>.part.json`
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+STATE_SAVE_INTERVAL = 1.0
+
+
+class RangeNotSupported(Exception):
+    """Raised when the server does not answer a range request with partial content."""
+
+
+class TransferService:
+    def __init__(self, connections: int = 4, timeout: int = 30, max_retries: int = 3):
+        self.connections = connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def split_ranges(self, ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Split the byte ranges to download into segments, one for each connection.
+
+        Args:
+            ranges: The (start, end) byte ranges to download, both inclusive.
+
+        Returns:
+            list[tuple[int, int]]: The (start, end) byte ranges of the segments.
+        """
+        total = sum(end - start + 1 for start, end in ranges)
+        segment_size = max(MIN_SEGMENT_SIZE, -(-total // max(1, self.connections)))
+
+        return [
+            (segment_start, min(segment_start + segment_size, end + 1) - 1)
+            for start, end in ranges
+            for segment_start in range(start, end + 1, segment_size)
+        ]
+
+    @staticmethod
+    def merge_ranges(ranges: list) -> list[list[int]]:
+        """
+        Merge overlapping and adjacent byte ranges.
+
+        Args:
+            ranges: The (start, end) byte ranges, both inclusive.
+
+        Returns:
+            list[list[int]]: The sorted and merged byte ranges.
+        """
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    @staticmethod
+    def missing_ranges(completed: list, size: int) -> list[tuple[int, int]]:
+        """
+        Get the byte ranges that are not downloaded yet.
+
+        Args:
+            completed: The merged byte ranges that are already downloaded.
+            size: The size of the file in bytes.
+
+        Returns:
+            list[tuple[int, int]]: The byte ranges that are still missing.
+        """
+        missing = []
+        position = 0
+        for start, end in completed:
+            if start > position:
+                missing.append((position, start - 1))
+            position = max(position, end + 1)
+
+        if position < size:
+            missing.append((position, size - 1))
+        return missing
+
+    @staticmethod
+    def load_state(file_path: str) -> dict:
+        """
+        Load the state of an unfinished download of the file.
+
+        Args:
+            file_path: The path of the final file.
+
+        Returns:
+            dict: The saved state, or None if there is no usable one.
+        """
+        if not os.path.isfile(file_path + PART_SUFFIX):
+            return None
+
+        try:
+            with open(file_path + STATE_SUFFIX, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def save_state(file_path: str, state: dict) -> None:
+        """
+        Save the state of an unfinished download, replacing the old one atomically.
+
+        Args:
+            file_path: The path of the final file.
+            state: The state to save.
+
+        Returns:
+            None
+        """
+        temp_path = f"{file_path}{STATE_SUFFIX}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, file_path + STATE_SUFFIX)
+
+    @staticmethod
+    def remove_partial_files(file_path: str) -> None:
+        """
+        Remove the `.part` file and the state of an unfinished download.
+
+        Args:
+            file_path: The path of the final file.
+
+        Returns:
+            None
+        """
+        for suffix in (PART_SUFFIX, STATE_SUFFIX):
+            if os.path.isfile(file_path + suffix):
+                os.remove(file_path + suffix)
+
+    def has_partial_download(self, file_path: str, video_id: str) -> bool:
+        """
+        Check if there is an unfinished download of the file that can be resumed.
+
+        Args:
+            file_path: The path of the final file.
+            video_id: The id of the video the file belongs to.
+
+        Returns:
+            bool: True if the download can be resumed, False otherwise.
+        """
+        state = self.load_state(file_path)
+        return bool(state) and state.get("video_id") == video_id
+
+    def download(self, stream: Stream, file_path: str, interrupt_checker=None, video_id: str = None) -> bool:
+        """
+        Download the stream to the file path over several connections at once,
+        each one fetching its own byte range into a preallocated `.part` file.
+
+        The downloaded ranges are saved next to the `.part` file, so an interrupted
+        download is resumed from where it stopped by the next call.
+
+        Args:
+            stream: The stream to download.
+            file_path: The path of the file to write.
+            interrupt_checker: A callable that stops the download when it returns True.
+            video_id: The id of the video the stream belongs to.
+
+        Returns:
+            bool: True if the stream was downloaded (or interrupted) here, False if it
+            can not be downloaded with range requests and pytubefix should be used.
+        """
+        try:
+            size = stream.filesize
+        except Exception:
+            return False
+
+        if not size:
+            return False
+
+        # The same file was already downloaded
+        if os.path.isfile(file_path) and os.path.getsize(file_path) == size:
+            stream.on_complete(file_path)
+            return True
+
+        part_path = file_path + PART_SUFFIX
+        state = self.load_state(file_path)
+        if not state or (state.get("video_id"), state.get("itag"), state.get("size")) != (video_id, stream.itag, size):
+            state = {"video_id": video_id, "itag": stream.itag, "size": size, "ranges": []}
+            with open(part_path, "wb") as file:
+                file.truncate(size)
+
+        completed = self.merge_ranges(state["ranges"])
+        tasks = [[start, start, end] for start, end in self.split_ranges(self.missing_ranges(completed, size))]
+        full_response_ok = len(tasks) == 1 and tasks[0][0] == 0 and tasks[0][2] == size - 1
+
+        cancel_event = threading.Event()
+        bucket = RateLimitService.new_transfer()
+        lock = threading.Lock()
+        bytes_remaining = [sum(end - start + 1 for _, start, end in tasks)]
+        next_save = [time.monotonic() + STATE_SAVE_INTERVAL]
+
+        def should_stop() -> bool:
+            return cancel_event.is_set() or (interrupt_checker is not None and interrupt_checker())
+
+        def throttle(amount: int) -> None:
+            RateLimitService.throttle(bucket, amount, should_stop)
+
+        def save() -> None:
+            state["ranges"] = self.merge_ranges(
+                completed + [[start, position - 1] for start, position, _ in tasks if position > start])
+            self.save_state(file_path, state)
+
+        def on_chunk(chunk: bytes) -> None:
+            with lock:
+                bytes_remaining[0] -= len(chunk)
+                stream.on_progress_for_chunks(chunk, bytes_remaining[0])
+
+                if time.monotonic() >= next_save[0]:
+                    save()
+                    next_save[0] = time.monotonic() + STATE_SAVE_INTERVAL
+
+        try:
+            with TraceService.span("transfer", "transfer", itag=stream.itag, size=size,
+                                   segments=len(tasks), connections=self.connections) as trace_args, \
+                    ThreadPoolExecutor(max_workers=max(1, min(self.connections, len(tasks)))) as executor:
+                futures = [
+                    executor.submit(
+                        self.download_range,
+                        stream.url, part_path, task, should_stop, on_chunk, full_response_ok, throttle)
+                    for task in tasks
+                ]
+
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    cancel_event.set()
+                    raise
+                finally:
+                    trace_args["bytes"] = sum(position - start for start, position, _ in tasks)
+
+        except RangeNotSupported:
+            self.remove_partial_files(file_path)
+            return False
+
+        except BaseException:
+            save()
+            raise
+
+        if should_stop():
+            save()
+            return True
+
+        os.replace(part_path, file_path)
+        self.remove_partial_files(file_path)
+        stream.on_complete(file_path)
+        return True
+
+    def stream(self, stream: Stream, output, interrupt_checker=None) -> None:
+        """
+        Download the stream in order into a writable file object, like a pipe,
+        one range request after another, retrying from the last written byte.
+
+        Args:
+            stream: The stream to download.
+            output: The binary file object to write to.
+            interrupt_checker: A callable that stops the download when it returns True.
+
+        Returns:
+            None
+        """
+        size = stream.filesize
+        bucket = RateLimitService.new_transfer()
+        position = 0
+        tries = 0
+
+        def should_stop() -> bool:
+            return interrupt_checker is not None and interrupt_checker()
+
+        with TraceService.span("transfer", "transfer", itag=stream.itag, size=size, streamed=True) as trace_args:
+            try:
+                while position < size:
+                    if should_stop():
+                        return
+
+                    last_position = position
+                    end = min(position + STREAM_RANGE_SIZE, size) - 1
+                    try:
+                        with get_session().get(
+                            stream.url,
+                            headers={"Range": f"bytes={position}-{end}"},
+                            stream=True,
+                            timeout=self.timeout,
+                        ) as response:
+                            response.raise_for_status()
+                            if response.status_code != 206:
+                                if position:
+                                    raise RangeNotSupported(f"Range requests are not supported: {response.status_code}")
+                                end = size - 1
+
+                            for chunk in response.iter_content(CHUNK_SIZE):
+                                if should_stop():
+                                    return
+
+                                chunk = chunk[:end + 1 - position]
+                                if not chunk:
+                                    continue
+
+                                RateLimitService.throttle(bucket, len(chunk), should_stop)
+                                output.write(chunk)
+                                position += len(chunk)
+                                stream.on_progress_for_chunks(chunk, size - position)
+
+                    except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                        if tries >= self.max_retries:
+                            raise
+
+                    # Only count the attempts that did not make any progress
+                    if position == last_position:
+                        tries += 1
+                        if tries > self.max_retries:
+                            raise IOError(f"Could not download the bytes {position}-{end}")
+            finally:
+                trace_args["bytes"] = position
+
+    def download_sequential(self, stream: Stream, file_path: str, interrupt_checker=None) -> None:
+        """
+        Download the stream in order with pytubefix's requests, for the streams that
+        can not be downloaded with range requests (unknown size, or segmented streams),
+        through the rate limit like the other transfers.
+
+        Args:
+            stream: The stream to download.
+            file_path: The path of the file to write.
+            interrupt_checker: A callable that stops the download when it returns True.
+
+        Returns:
+            None
+        """
+        from urllib.error import HTTPError
+
+        from pytubefix import request
+
+        try:
+            size = stream.filesize
+        except Exception:
+            size = 0
+
+        bucket = RateLimitService.new_transfer()
+        received = 0
+
+        def should_stop() -> bool:
+            return interrupt_checker is not None and interrupt_checker()
+
+        def write(chunks, file) -> bool:
+            nonlocal received
+            for chunk in chunks:
+                if should_stop():
+                    return False
+                RateLimitService.throttle(bucket, len(chunk), should_stop)
+                file.write(chunk)
+                received += len(chunk)
+                stream.on_progress_for_chunks(chunk, max(0, size - received))
+            return True
+
+        with TraceService.span("transfer", "transfer", itag=stream.itag, size=size, connections=1) as trace_args, \
+                open(file_path, "wb") as file:
+            try:
+                try:
+                    completed = write(request.stream(stream.url, max_retries=self.max_retries), file)
+                except HTTPError as error:
+                    # Like pytubefix, a missing stream ends the download
+                    if error.code != 404:
+                        raise
+                    completed = True
+                except StopIteration:
+                    # Some adaptive streams are only served in numbered segments
+                    completed = write(request.seq_stream(stream.url, max_retries=self.max_retries), file)
+            finally:
+                trace_args["bytes"] = received
+
+        if completed:
+            stream.on_complete(file_path)
+
+    def download_range(self, url: str, file_path: str, task: list, should_stop, on_chunk,
+                       full_response_ok: bool = False, throttle=None) -> None:
+        """
+        Download one byte range of the url into the same range of the file,
+        retrying from the last received byte when the connection drops.
+
+        Args:
+            url: The url of the stream.
+            file_path: The path of the preallocated file.
+            task: The [start, position, end] of the range, the position is updated
+                after every written chunk.
+            should_stop: A callable that stops the download when it returns True.
+            on_chunk: A callable that is called with every received chunk.
+            full_response_ok: Whether a full (200) response is accepted for this range.
+            throttle: A callable that is called with the size of every received chunk,
+                and waits while the rate limit is reached.
+
+        Returns:
+            None
+        """
+        _, position, end = task
+        tries = 0
+
+        # Unbuffered, so the saved ranges never get ahead of the bytes written to the file
+        with open(file_path, "r+b", buffering=0) as file:
+            while position <= end:
+                if should_stop():
+                    return
+
+                last_position = position
+                try:
+                    with get_session().get(
+                        url,
+                        headers={"Range": f"bytes={position}-{end}"},
+                        stream=True,
+                        timeout=self.timeout,
+                    ) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206 and not (full_response_ok and position == 0):
+                            raise RangeNotSupported(f"Range requests are not supported: {response.status_code}")
+
+                        file.seek(position)
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            if should_stop():
+                                return
+
+                            # The response is read to the end, so its connection can be reused
+                            chunk = chunk[:end + 1 - position]
+                            if not chunk:
+                                continue
+
+                            if throttle is not None:
+                                throttle(len(chunk))
+                            file.write(chunk)
+                            position += len(chunk)
+                            task[1] = position
+                            on_chunk(chunk)
+
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                    if tries >= self.max_retries:
+                        raise
+
+                # Only count the attempts that did not make any progress
+                if position == last_position:
+                    tries += 1
+                    if tries > self.max_retries:
+                        raise IOError(f"Could not download the bytes {position}-{end}")
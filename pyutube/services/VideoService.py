@@ -1,62 +1,119 @@
+import errno
 import os
-import sys
-
-from yaspin import yaspin
-from yaspin.spinners import Spinners
-from pytubefix import YouTube
-from pytubefix.cli import on_progress
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from pytubefix import YouTube, extract
+from pytubefix.exceptions import RegexMatchError
 from termcolor import colored
-from moviepy.video.io.ffmpeg_tools import ffmpeg_merge_video_audio
 
 from pyutube.utils import (
     console,
     error_console,
     ask_resolution,
+    get_session,
+    mark_online,
+    with_spinner,
     CANCEL_PREFIX
 )
+from pyutube.services.CacheService import CacheService
+from pyutube.services.QualityService import QualityService
+from pyutube.services.TraceService import TraceService, traced
+
+# Codecs that can be copied into an mp4 container without re-encoding
+MP4_CODECS = ("avc1", "avc3", "av01", "hev1", "hvc1", "vp09", "mp4a", "opus", "flac", "ac-3", "ec-3")
+
+# The sizes missing from the manifest are fetched this many at a time
+SIZE_LOOKUP_WORKERS = 8
+# The resolution menu waits this long for them, the slower ones are estimated from the bitrate
+SIZE_LOOKUP_WAIT = 2.0
+SIZE_LOOKUP_TIMEOUT = 10
 
 
 class VideoService:
-    def __init__(self, url: str, quality: str, path: str) -> None:
+    def __init__(
+            self, url: str, quality: str, path: str, interactive: bool = True, video: YouTube = None) -> None:
         self.url = url
+        self.video = video
         self.quality = quality
         self.path = path
+        self.interactive = interactive
+        self.cache_service = CacheService()
 
     # Helper functions for the Downloader class
 
+    @traced("metadata", "video")
     def search_process(self) -> YouTube:
         """
         Performs the video search process.
 
         Returns:
             YouTube: An instance of the YouTube class representing the searched video.
+
+        Raises:
+            Exception: The error raised while fetching the video info, the callers report it
+                with its class (see `classify_error`).
         """
+        # The video was prefetched while the previous downloads were running
+        if self.video is not None:
+            return self.video
+
+        # A fresh cache entry answers without any request to YouTube
         try:
-            video = self.__video_search()
-        except Exception as error:
-            error_console.print(f"Error: {error}")
-            sys.exit(1)
+            video = self.cache_service.get_video(extract.video_id(self.url))
+        except RegexMatchError:
+            video = None
+
+        if video:
+            return video
+
+        return self.__video_search()
+
+    def prefetch_video(self) -> YouTube:
+        """
+        Fetch the video info and its stream manifest ahead of its download.
 
-        if not video:
-            error_console.print("No stream available for the url.")
-            sys.exit()
+        Returns:
+            YouTube: The video, from the cache or from YouTube.
+
+        Raises:
+            Exception: If the video can not be fetched.
+        """
+        try:
+            video = self.cache_service.get_video(extract.video_id(self.url))
+        except RegexMatchError:
+            video = None
+
+        if video:
+            return video
+
+        video = self.__video_search()
+        video.fmt_streams
         return video
 
-    @yaspin(
+    @with_spinner(
         text=colored("Searching for the video", "green"),
-        color="green", spinner=Spinners.point
+        color="green", spinner="point"
     )
     def __video_search(self) -> YouTube:
-        return YouTube(
+        video = YouTube(
             self.url,
             use_oauth=True,
             allow_oauth_cache=True,
-            on_progress_callback=on_progress,
         )
 
-    @yaspin(
+        # Fetch the video info here, it is the first request to YouTube
+        video.title
+        mark_online()
+        return video
+
+    @with_spinner(
         text=colored("getting video streams", "green"),
-        spinner=Spinners.point
+        spinner="point"
     )
     def get_available_resolutions(self, video: YouTube) -> set:
         """
@@ -68,12 +125,7 @@ class VideoService:
         Returns:
             set: A set containing all available resolutions.
         """
-        streams = video.streams
-
-        available_streams = streams.filter(
-            progressive=False, adaptive=True, mime_type="video/mp4")
-        audio_stream = streams.filter(
-            only_audio=True).order_by('mime_type').first()
+        available_streams, audio_stream = self.get_streams(video)
 
         resolutions_with_sizes = self.get_video_resolutions_sizes(
             available_streams, audio_stream
@@ -88,65 +140,100 @@ class VideoService:
         resolutions = list(resolutions)
         sizes = list(sizes)
 
+        # The stream sizes are known now, cache them with the manifest
+        self.cache_video(video)
+
         return resolutions, sizes, available_streams, audio_stream
 
-    @yaspin(
-        text=colored("Downloading the video...", "green"),
-        color="green", spinner=Spinners.dots13
-    )
-    def get_video_streams(self, quality: str, streams: YouTube.streams) -> YouTube:
+    @staticmethod
+    def get_streams(video: YouTube) -> tuple:
+        """
+        Get the mp4 video streams and the audio stream of the video, without fetching their sizes.
+
+        Args:
+            video: The video to retrieve the streams from.
+
+        Returns:
+            tuple: The video streams and the audio stream.
+        """
+        streams = video.streams
+
+        available_streams = streams.filter(
+            progressive=False, adaptive=True, mime_type="video/mp4")
+        audio_stream = streams.filter(
+            only_audio=True).order_by('mime_type').first()
+
+        return available_streams, audio_stream
+
+    def cache_video(self, video: YouTube) -> None:
+        """
+        Cache the video info and its stream manifest on disk.
+
+        Args:
+            video: The video to cache.
+
+        Returns:
+            None
+        """
+        try:
+            self.cache_service.put(video)
+        except Exception as error:
+            error_console.print(f"❗ Could not cache the video info: {error}")
+
+    def get_video_streams(self, quality: str, streams: YouTube.streams, audio_stream: YouTube = None) -> YouTube:
         """
         Downloads the video streams based on the specified quality.
-        If the specified quality is not available, it selects the nearest quality.
+        The quality is a policy (see `QualityService`), a plain resolution
+        selects the nearest quality if it is not available.
 
         Args:
             video: The video to retrieve streams from.
             quality: The desired quality of the video streams.
+            audio_stream: The audio stream, counted in the bitrate and size limits.
 
         Returns:
             The video stream with the specified quality,
             or the best available stream if no match is found.
-        """
-        stream = streams.filter(res=quality).first()
 
+        Raises:
+            InterruptedError: If the user cancelled the download.
+        """
         if quality.startswith(CANCEL_PREFIX):
-            error_console.print("❗ Cancel the download...")
-            sys.exit()
-
-        if not stream:
-            available_qualities = [stream.resolution for stream in streams]
-
-            available_qualities = [int(res.replace("p", "")) for res in available_qualities]
-
-            quality_int = int(quality.replace("p", "")) if "p" in quality else int(quality)
-            selected_quality = min(available_qualities,
-                                   key=lambda x: abs(quality_int - x)
-                                   )
+            raise InterruptedError("The download was cancelled")
 
-            stream = streams.filter(res=str(selected_quality) + "p").first()
-
-        return stream
+        return QualityService(quality).select(streams, audio_stream)
 
+    @traced("select_stream", "video")
     def get_selected_stream(self, video, is_audio: bool = False):
         """
         Get the selected video stream based on user preference.
 
         Returns:
             YouTube: The selected video stream.
+
+        Raises:
+            LookupError: If the video has no stream to download.
+            InterruptedError: If the user cancelled the download.
         """
-        resolutions, sizes,  streams, video_audio = self.get_available_resolutions(
-            video)
+        if not is_audio and not self.quality and not self.interactive:
+            # Without prompts, the best resolution is downloaded
+            self.quality = "best"
+
+        if is_audio or self.quality:
+            # The quality policy is resolved from the manifest, the stream sizes are not needed
+            streams, video_audio = self.get_streams(video)
+            self.cache_video(video)
+        else:
+            resolutions, sizes, streams, video_audio = self.get_available_resolutions(video)
 
         if not streams:
-            error_console.print("❗ Cancel the download...")
-            sys.exit()
+            raise LookupError("No stream available for the video")
 
-        if not is_audio:
-            self.quality = self.quality or ask_resolution(resolutions, sizes)
+        if not is_audio and not self.quality:
+            self.quality = ask_resolution(resolutions, sizes)
 
         if not self.quality and not is_audio:
-            error_console.print("❗ Cancel the download...")
-            sys.exit()
+            raise InterruptedError("The download was cancelled")
 
         # TODO:
         # [] if self.quality.startswith(CANCEL_PREFIX) else
@@ -154,85 +241,282 @@ class VideoService:
 
         return streams, video_audio, self.quality
 
-    def merging(self, video_name: str, audio_name: str):
+    @traced("merge", "merge")
+    def merging(self, video_name: str, audio_name: str, codecs: tuple = (), remux: bool = True):
         """
         Merges the video and audio files into a single file.
 
+        The streams are copied into the mp4 container as they are (remux),
+        only the streams whose codec can not go into mp4 are re-encoded.
+
         Args:
             video_name: The name of the video file.
             audio_name: The name of the audio file.
+            codecs: The (video, audio) codecs of the streams, if known.
+            remux: Whether to copy the streams when possible, or always re-encode them.
 
         Returns:
-            None
+            str: The path of the merged file.
         """
-        output_directory = os.path.join(self.path, "output")
-        os.makedirs(output_directory, exist_ok=True)
+        # The video file may have the name of the merged file, so the merge is written
+        # apart first, in its own directory, as other merges may run at the same time
+        output_directory = tempfile.mkdtemp(prefix=".pyutube-merge-", dir=self.path)
+        try:
+            return self.merge_into(video_name, audio_name, output_directory, codecs, remux)
+        finally:
+            shutil.rmtree(output_directory, ignore_errors=True)
+
+    def merge_into(self, video_name: str, audio_name: str, output_directory: str, codecs: tuple,
+                   remux: bool) -> str:
+        """
+        Merge the video and audio files in `output_directory`, then move the merged file to the path.
 
+        Returns:
+            str: The path of the merged file.
+        """
         # Output file path
         base_name = os.path.splitext(os.path.basename(video_name))[0]
         output_file = os.path.join(output_directory, f"{base_name}.mp4")
-        # output_file = os.path.join(output_directory, os.path.basename(
-        #     video_name).replace(os.path.splitext(video_name)[1], '.mp4'))
-
-        # Extract base names to match files
-        video_base_name = os.path.splitext(os.path.basename(video_name))[0]
-        audio_base_name = os.path.splitext(os.path.basename(audio_name))[0]
-
-        # Locate the video file
-        video_path = None
-        for file in os.listdir(self.path):
-            if file.startswith(video_base_name):
-                video_path = os.path.join(self.path, file)
-                break
 
+        # Locate the video and audio files
+        video_path = self.find_file(video_name)
         if video_path is None:
-            error_console.print(f"❗ Video file not found: {video_name}")
-            sys.exit(1)
+            raise FileNotFoundError(f"Video file not found: {video_name}")
 
-        # Locate the audio file
-        audio_path = None
-        for file in os.listdir(self.path):
-            if file.startswith(audio_base_name):
-                audio_path = os.path.join(self.path, file)
-                break
+        audio_path = self.find_file(audio_name)
 
         if audio_path is None:
-            error_console.print(f"❗ Audio file not found: {audio_name}")
-            sys.exit(1)
+            raise FileNotFoundError(f"Audio file not found: {audio_name}")
 
+        video_codec, audio_codec = codecs or (None, None)
+        copy_video = remux and self.can_copy_codec(video_codec)
+        copy_audio = remux and self.can_copy_codec(audio_codec)
+
+        # Merge video and audio
         try:
-            # Merge video and audio
-            ffmpeg_merge_video_audio(
-                video_path,
-                audio_path,
-                output_file,
-                # vcodec='copy',
-                # acodec='copy',
-                logger=None
-            )
-
-            # Remove original files
-            os.remove(video_path)
-            os.remove(audio_path)
-
-            # Move the merged file to the current directory
-            if os.path.exists(output_file):
-                merged_file_name = os.path.basename(output_file)
-                parent_directory = os.path.dirname(output_directory)
-
-                final_path = os.path.join(parent_directory, merged_file_name)
-
-                os.replace(output_file, final_path)
-                os.rmdir(output_directory)
-            else:
-                error_console.print("❗ Merged video file not found in the output directory.")
-                sys.exit(1)
+            self.ffmpeg_merge(video_path, audio_path, output_file, copy_video, copy_audio)
+        except RuntimeError:
+            if not (copy_video or copy_audio):
+                raise
+
+            # The container refused the copied streams, re-encode them
+            self.ffmpeg_merge(video_path, audio_path, output_file, False, False)
+
+        # Remove original files
+        os.remove(video_path)
+        os.remove(audio_path)
+
+        # Move the merged file to the current directory
+        if not os.path.exists(output_file):
+            raise FileNotFoundError("Merged video file not found in the output directory.")
+
+        final_path = os.path.join(self.path, os.path.basename(output_file))
+        os.replace(output_file, final_path)
+        return final_path
 
-        except Exception as e:
-            error_console.print(f"❗ An error occurred: {str(e)}")
-            sys.exit(1)
+    def can_stream_merge(self, codecs: tuple) -> bool:
+        """
+        Check if the streams can be merged while they download: ffmpeg reads them
+        from named pipes (POSIX only) and copies them into mp4 without re-encoding.
+
+        Args:
+            codecs: The (video, audio) codecs of the streams.
+
+        Returns:
+            bool: True if the streams can be merged while they download, False otherwise.
+        """
+        return hasattr(os, "mkfifo") and all(codec and self.can_copy_codec(codec) for codec in codecs)
+
+    @traced("stream_merge", "merge")
+    def stream_merging(self, video_stream, audio_stream, video_name: str, transfer_service,
+                       interrupt_checker=None) -> str:
+        """
+        Download the video and audio streams straight into ffmpeg, which remuxes
+        them into the final file, so only the merged file is written to the disk.
+
+        Each stream is downloaded in order into its own named pipe. If a download
+        or ffmpeg fails, the unfinished file is removed and an error is raised.
+
+        Args:
+            video_stream: The video stream.
+            audio_stream: The audio stream.
+            video_name: The name of the video file, the merged file gets its base name.
+            transfer_service: The TransferService that downloads the streams.
+            interrupt_checker: A callable that stops the downloads and ffmpeg when it returns True.
+
+        Returns:
+            str: The path of the merged file.
+
+        Raises:
+            RuntimeError: If the streams could not be downloaded or merged.
+            InterruptedError: If the merge was stopped by `interrupt_checker`.
+        """
+        from moviepy.config import FFMPEG_BINARY
+
+        base_name = os.path.splitext(os.path.basename(video_name))[0]
+        final_path = os.path.join(self.path, f"{base_name}.mp4")
+        temp_path = f"{final_path}.merging"
+
+        with tempfile.TemporaryDirectory(prefix="pyutube-") as pipe_directory:
+            video_pipe = os.path.join(pipe_directory, "video")
+            audio_pipe = os.path.join(pipe_directory, "audio")
+            os.mkfifo(video_pipe)
+            os.mkfifo(audio_pipe)
+
+            command = [
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-i", video_pipe,
+                "-i", audio_pipe,
+                "-map", "0:v:0",
+                "-map", "1:a:0",
+                "-c", "copy",
+                "-f", "mp4",
+                temp_path,
+            ]
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+            cancel_event = threading.Event()
+            errors = []
+
+            def interrupted() -> bool:
+                return interrupt_checker is not None and interrupt_checker()
+
+            def should_stop() -> bool:
+                return cancel_event.is_set() or interrupted()
+
+            def open_pipe(pipe_path: str):
+                # Without blocking, so a feeder never waits for an ffmpeg that already stopped
+                while not should_stop():
+                    try:
+                        descriptor = os.open(pipe_path, os.O_WRONLY | os.O_NONBLOCK)
+                    except OSError as error:
+                        if error.errno != errno.ENXIO:
+                            raise
+                        time.sleep(0.05)
+                        continue
+
+                    os.set_blocking(descriptor, True)
+                    return open(descriptor, "wb")
+                return None
+
+            def feed(stream, pipe_path: str) -> None:
+                try:
+                    pipe = open_pipe(pipe_path)
+                    if pipe is not None:
+                        with pipe:
+                            transfer_service.stream(stream, pipe, should_stop)
+                    # ffmpeg would merge the truncated stream, it is stopped instead
+                    if interrupted():
+                        cancel_event.set()
+                        process.kill()
+                except BaseException as error:
+                    errors.append(error)
+                    cancel_event.set()
+                    process.kill()
+
+            feeders = [
+                threading.Thread(target=feed, args=(video_stream, video_pipe), daemon=True),
+                threading.Thread(target=feed, args=(audio_stream, audio_pipe), daemon=True),
+            ]
+            for feeder in feeders:
+                feeder.start()
+
+            try:
+                _, stderr = process.communicate()
+            finally:
+                cancel_event.set()
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+                for feeder in feeders:
+                    feeder.join()
+
+                if errors or process.returncode != 0 or interrupted():
+                    if os.path.isfile(temp_path):
+                        os.remove(temp_path)
+
+        if interrupted():
+            raise InterruptedError("The download was cancelled")
+
+        # A broken pipe only means that ffmpeg stopped, its own error explains why
+        failures = [error for error in errors if not isinstance(error, BrokenPipeError)]
+        if failures:
+            raise RuntimeError(f"Could not download the streams: {failures[0]}")
+        if process.returncode != 0:
+            raise RuntimeError((stderr or b"").decode(errors="replace").strip() or "ffmpeg failed")
+        if errors:
+            raise RuntimeError(f"Could not download the streams: {errors[0]}")
+
+        os.replace(temp_path, final_path)
+        return final_path
+
+    def find_file(self, filename: str) -> str:
+        """
+        Find a downloaded file by its exact name. The files of other videos may
+        share its base name (`video1` and `video10`) and be merged at the same time,
+        so no other name is matched.
+
+        Args:
+            filename: The name of the file, with its extension.
+
+        Returns:
+            str: The path of the file, or None if it is not found.
+        """
+        file_path = os.path.join(self.path, filename)
+        return file_path if os.path.isfile(file_path) else None
+
+    @staticmethod
+    def can_copy_codec(codec: str) -> bool:
+        """
+        Check if a stream with the given codec can be copied into an mp4 container.
+
+        Args:
+            codec: The codec of the stream (ex: 'avc1.640028'), or None if unknown.
+
+        Returns:
+            bool: True if the stream can be copied, False if it has to be re-encoded.
+        """
+        if not codec:
+            return True
+
+        return codec.lower().startswith(MP4_CODECS)
+
+    @staticmethod
+    def ffmpeg_merge(video_path: str, audio_path: str, output_file: str,
+                     copy_video: bool = True, copy_audio: bool = True) -> None:
+        """
+        Run ffmpeg to merge the video and audio files into the output file.
+
+        Args:
+            video_path: The path of the video file.
+            audio_path: The path of the audio file.
+            output_file: The path of the merged file.
+            copy_video: Whether to copy the video stream or re-encode it to H.264.
+            copy_audio: Whether to copy the audio stream or re-encode it to AAC.
+
+        Returns:
+            None
+        """
+        from moviepy.config import FFMPEG_BINARY
+
+        command = [
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-i", video_path,
+            "-i", audio_path,
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-c:v", "copy" if copy_video else "libx264",
+            "-c:a", "copy" if copy_audio else "aac",
+            output_file,
+        ]
+
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors="replace").strip())
 
     @staticmethod
+    @traced("stream_sizes", "video")
     def get_video_resolutions_sizes(
             available_streams: list[YouTube],
             audio_stream: YouTube
@@ -250,34 +534,104 @@ class VideoService:
         if not available_streams:
             return []
 
-        # Calculate the total audio file size in bytes
-        audio_filesize = audio_stream.filesize
+        sizes = VideoService.get_stream_sizes([*available_streams, audio_stream])
+        audio_filesize, audio_exact = sizes[audio_stream.itag]
 
         resolutions_with_sizes = []
-        one_mb = 1024 * 1024
-        one_gb = one_mb * 1024
         for stream in available_streams:
             if stream.resolution:
                 # Calculate the total video file size including audio in bytes
-                video_filesize_bytes = stream.filesize
+                video_filesize_bytes, exact = sizes[stream.itag]
 
                 if not stream.is_progressive:
                     video_filesize_bytes += audio_filesize
+                    exact = exact and audio_exact
 
-                # Convert the video file size to KB or MB dynamically
-                if video_filesize_bytes >= one_gb:
-                    # If size is >= 1 GB
-                    video_filesize = \
-                        f"{video_filesize_bytes / (one_gb):.4f} GB"
-
-                elif video_filesize_bytes >= one_mb:
-                    # If size is >= 1 MB
-                    video_filesize = \
-                        f"{video_filesize_bytes / (one_mb):.2f} MB"
-                else:
-                    video_filesize = f"{video_filesize_bytes / 1024:.2f} KB"
+                video_filesize = VideoService.format_size(video_filesize_bytes)
+                if not video_filesize_bytes:
+                    video_filesize = "unknown size"
+                elif not exact:
+                    video_filesize += " (estimated)"
 
                 resolutions_with_sizes.append(
                     (stream.resolution, video_filesize))
 
         return resolutions_with_sizes
+
+    @staticmethod
+    def get_stream_sizes(streams: list) -> dict:
+        """
+        Get the size of each stream, from the manifest when it is there.
+
+        The missing sizes are fetched concurrently, `SIZE_LOOKUP_WORKERS` at a time,
+        and kept in their stream. The ones not known after `SIZE_LOOKUP_WAIT` seconds
+        are estimated from the bitrate, so the menu does not wait for them: the lookups
+        not started are cancelled, and the late ones are dropped, so the streams (and the
+        cached manifest) only hold the sizes known when the menu is shown.
+
+        Args:
+            streams: The streams.
+
+        Returns:
+            dict: `{itag: (size, exact)}`, the size is 0 if it can not be estimated.
+        """
+        sizes = {}
+        missing = []
+        for stream in streams:
+            if stream._filesize:
+                sizes[stream.itag] = (stream._filesize, True)
+            elif stream not in missing:
+                missing.append(stream)
+
+        if not missing:
+            return sizes
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(SIZE_LOOKUP_WORKERS, len(missing)), thread_name_prefix="pyutube-size")
+        futures = {executor.submit(VideoService.fetch_stream_size, stream): stream for stream in missing}
+        done, _ = wait(futures, timeout=SIZE_LOOKUP_WAIT)
+        # The lookups still running finish in the background, their result is not used
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for future, stream in futures.items():
+            if future in done and future.exception() is None and future.result():
+                stream._filesize = future.result()
+                sizes[stream.itag] = (stream._filesize, True)
+            else:
+                sizes[stream.itag] = (QualityService.estimate_size(stream), False)
+
+        return sizes
+
+    @staticmethod
+    def fetch_stream_size(stream) -> int:
+        """
+        Fetch the size of a stream with a HEAD request.
+
+        Args:
+            stream: The stream.
+
+        Returns:
+            int: The size of the stream in bytes, 0 if the server does not tell it.
+        """
+        response = get_session().head(stream.url, allow_redirects=True, timeout=SIZE_LOOKUP_TIMEOUT)
+        response.raise_for_status()
+        return int(response.headers.get("Content-Length", 0))
+
+    @staticmethod
+    def format_size(size: int) -> str:
+        """
+        Format a size in bytes as KB, MB or GB.
+
+        Args:
+            size: The size in bytes.
+
+        Returns:
+            str: The formatted size.
+        """
+        one_mb = 1024 * 1024
+        one_gb = one_mb * 1024
+        if size >= one_gb:
+            return f"{size / one_gb:.4f} GB"
+        if size >= one_mb:
+            return f"{size / one_mb:.2f} MB"
+        return f"{size / 1024:.2f} KB"
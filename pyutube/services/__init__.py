@@ -2,6 +2,16 @@ from .DownloadService import DownloadService
 from .VideoService import VideoService
 from .AudioService import AudioService
 from .FileService import FileService
+from .ProgressService import ProgressService
+from .TransferService import TransferService
+from .CacheService import CacheService
+from .ArchiveService import ArchiveService
+from .QualityService import QualityService
+from .RateLimitService import RateLimitService
+from .PrefetchService import PrefetchService
+from .TraceService import TraceService
+from .EventService import EventService
+from .JobService import JobService
 
 
-__all__ = ['DownloadService', 'VideoService', 'AudioService', 'FileService']
+__all__ = ['DownloadService', 'VideoService', 'AudioService', 'FileService', 'ProgressService', 'TransferService', 'CacheService', 'ArchiveService', 'QualityService', 'RateLimitService', 'PrefetchService', 'TraceService', 'EventService', 'JobService']
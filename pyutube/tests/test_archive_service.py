@@ -0,0 +1,49 @@
+import os
+import sqlite3
+from contextlib import closing
+
+from pyutube.services.ArchiveService import ArchiveService, KIND_AUDIO, KIND_VIDEO
+
+
+def test_downloads_are_recorded_and_found(tmp_path):
+    archive = ArchiveService(str(tmp_path / "archive.sqlite3"))
+    video = tmp_path / "video_720p.mp4"
+    video.write_bytes(b"video")
+
+    archive.record("dQw4w9WgXcQ", 136, str(video), KIND_VIDEO)
+    archive.record("abcdefghijk", 136, str(tmp_path / "removed_720p.mp4"), KIND_VIDEO)
+
+    # The downloads whose file was removed are downloaded again
+    assert archive.get_downloaded(str(tmp_path)) == {"dQw4w9WgXcQ": os.path.abspath(video)}
+    assert archive.get_downloaded(str(tmp_path / "other")) == {}
+
+
+def test_audio_downloads_do_not_count_as_videos(tmp_path):
+    archive = ArchiveService(str(tmp_path / "archive.sqlite3"))
+    audio = tmp_path / "song_audio.m4a"
+    audio.write_bytes(b"audio")
+
+    archive.record("dQw4w9WgXcQ", 140, str(audio), KIND_AUDIO)
+
+    assert archive.get_downloaded(str(tmp_path), KIND_VIDEO) == {}
+    assert archive.get_downloaded(str(tmp_path), KIND_AUDIO) == {"dQw4w9WgXcQ": os.path.abspath(audio)}
+
+
+def test_archives_without_the_kind_are_migrated(tmp_path):
+    database = str(tmp_path / "archive.sqlite3")
+    audio, video = tmp_path / "song_audio.m4a", tmp_path / "song_720p.mp4"
+    audio.write_bytes(b"audio")
+    video.write_bytes(b"video")
+    with closing(sqlite3.connect(database)) as connection, connection:
+        connection.execute(
+            "CREATE TABLE downloads (video_id TEXT NOT NULL, itag INTEGER, size INTEGER, directory TEXT NOT NULL, "
+            "path TEXT NOT NULL, completed_at REAL NOT NULL, PRIMARY KEY (video_id, directory))")
+        connection.executemany("INSERT INTO downloads VALUES (?, ?, ?, ?, ?, 0)", [
+            ("audio000000", 140, 5, str(tmp_path), str(audio)),
+            ("video000000", 136, 5, str(tmp_path), str(video)),
+        ])
+
+    archive = ArchiveService(database)
+
+    assert archive.get_downloaded(str(tmp_path), KIND_AUDIO) == {"audio000000": str(audio)}
+    assert archive.get_downloaded(str(tmp_path), KIND_VIDEO) == {"video000000": str(video)}
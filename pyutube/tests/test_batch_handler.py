@@ -0,0 +1,49 @@
+from pyutube.handlers.BatchHandler import BatchHandler
+
+
+def test_read_urls_skips_blank_lines_and_comments(tmp_path):
+    batch_file = tmp_path / "urls.txt"
+    batch_file.write_text("# my videos\nhttps://youtu.be/dQw4w9WgXcQ\n\n  dQw4w9WgXcQ  \n")
+
+    urls = BatchHandler(str(batch_file)).read_urls()
+
+    assert urls == ["https://youtu.be/dQw4w9WgXcQ", "dQw4w9WgXcQ"]
+
+
+def test_collect_video_ids_removes_duplicates_and_rejects_invalid_links():
+    urls = [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://www.youtube.com/shorts/abcdefghijk",
+        "https://example.com/video",
+        "dQw4w9WgXcQ",
+    ]
+
+    video_ids, rejected = BatchHandler("-").collect_video_ids(urls)
+
+    assert video_ids == ["dQw4w9WgXcQ", "abcdefghijk"]
+    assert rejected == ["https://example.com/video"]
+
+
+def test_playlists_are_expanded_as_their_pages_are_read(monkeypatch):
+    import pytubefix
+
+    pages = []
+
+    class Playlist:
+        def __init__(self, url):
+            self.url = url
+
+        def url_generator(self):
+            for page in range(3):
+                pages.append(page)
+                yield f"https://www.youtube.com/watch?v=video{page:05d}0"
+            raise ConnectionError("The next page could not be loaded")
+
+    monkeypatch.setattr(pytubefix, "Playlist", Playlist)
+    batch_handler = BatchHandler("-")
+    video_ids = batch_handler.iter_video_ids(["https://www.youtube.com/playlist?list=PLabcdefghijklmnopqrstuvwxyz012345"])
+
+    assert next(video_ids) == "video000000" and pages == [0]
+    assert list(video_ids) == ["video000010", "video000020"]
+    assert batch_handler.rejected == ["https://www.youtube.com/playlist?list=PLabcdefghijklmnopqrstuvwxyz012345"]
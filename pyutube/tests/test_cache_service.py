@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from pytubefix import Stream
+from pytubefix.monostate import Monostate
+
+from pyutube.services.CacheService import CacheService
+
+
+def make_video(video_id, expire):
+    monostate = Monostate(None, None, "Title", 100)
+
+    def raw_stream(itag, mime_type, size, **extra):
+        stream = {
+            "url": f"https://example.com/videoplayback?expire={expire}&itag={itag}",
+            "itag": itag,
+            "mimeType": mime_type,
+            "is_otf": False,
+            "bitrate": 1000,
+            "contentLength": str(size),
+        }
+        stream.update(extra)
+        return stream
+
+    class Video:
+        pass
+
+    video = Video()
+    video.video_id = video_id
+    video.title = "Title"
+    video.length = 100
+    video.fmt_streams = [
+        Stream(raw_stream(137, 'video/mp4; codecs="avc1.640028"', 5000, width=1920, height=1080, fps=30), monostate),
+        Stream(raw_stream(140, 'audio/mp4; codecs="mp4a.40.2"', 300), monostate),
+    ]
+    return video
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYUTUBE_NO_CACHE", raising=False)
+    return CacheService(cache_dir=str(tmp_path))
+
+
+def test_cache_round_trip(cache):
+    cache.put(make_video("dQw4w9WgXcQ", int(time.time()) + 6 * 3600))
+
+    video = cache.get_video("dQw4w9WgXcQ")
+
+    assert video.title == "Title"
+    assert video.length == 100
+    streams = video.streams
+    video_stream = streams.filter(progressive=False, adaptive=True, mime_type="video/mp4").first()
+    audio_stream = streams.filter(only_audio=True).first()
+    assert (video_stream.itag, video_stream.resolution, video_stream.filesize) == (137, "1080p", 5000)
+    assert (audio_stream.itag, audio_stream.audio_codec, audio_stream.filesize) == (140, "mp4a.40.2", 300)
+
+
+def test_cache_ignores_expiring_stream_urls(cache):
+    cache.put(make_video("dQw4w9WgXcQ", int(time.time()) + 60))
+
+    assert cache.get_video("dQw4w9WgXcQ") is None
+
+
+def test_cache_evicts_least_recently_used(cache, monkeypatch):
+    # A fixed clock, so every entry is serialized to the same size
+    now = int(time.time())
+    monkeypatch.setattr(sys.modules[CacheService.__module__], "time", SimpleNamespace(time=lambda: now))
+
+    cache.put(make_video("aaaaaaaaaaa", now + 6 * 3600))
+    cache.max_size = os.path.getsize(cache.get_path("aaaaaaaaaaa")) * 2
+
+    os.utime(cache.get_path("aaaaaaaaaaa"), (now - 100, now - 100))
+    cache.put(make_video("bbbbbbbbbbb", now + 6 * 3600))
+    cache.put(make_video("ccccccccccc", now + 6 * 3600))
+
+    assert cache.get("aaaaaaaaaaa") is None
+    assert cache.get("bbbbbbbbbbb") is not None
+    assert cache.get("ccccccccccc") is not None
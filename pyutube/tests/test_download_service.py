@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from pyutube.services.DownloadService import DownloadService
+
+
+def test_interrupted_downloads_stop_the_queue(tmp_path, monkeypatch):
+    service = DownloadService(None, str(tmp_path), "best", jobs=2, show_progress=False, interactive=False)
+    started = []
+    lock = threading.Lock()
+
+    def download_item(video_id, title_number, show_progress=False, video=None):
+        with lock:
+            started.append(video_id)
+        if video_id == "video01":
+            # Like a Ctrl+C while the downloads run
+            raise KeyboardInterrupt
+        while not service.cancel_event.is_set():
+            time.sleep(0.01)
+        return False
+
+    monkeypatch.setattr(service, "download_item", download_item)
+    items = [(f"video{index:02d}", f"video{index:02d}", "") for index in range(20)]
+
+    with pytest.raises(KeyboardInterrupt):
+        service.download_items(items, [None] * len(items))
+
+    assert service.cancel_event.is_set()
+    time.sleep(0.1)
+    assert len(started) < 20
+
+
+def test_workers_of_a_pool_never_prompt(tmp_path, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(DownloadService, "download", lambda self, title_number=0: prompts.append(self.interactive) or True)
+    service = DownloadService(None, str(tmp_path), "best", jobs=2, show_progress=False)
+    items = [(f"video{index:02d}", f"video{index:02d}", "") for index in range(4)]
+    results = [None] * len(items)
+
+    service.download_items(items, results)
+
+    assert prompts == [False] * 4 and all(results)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batches_start_before_all_the_videos_are_read(tmp_path, monkeypatch, jobs):
+    service = DownloadService(None, str(tmp_path), "best", jobs=jobs, show_progress=False, prefetch=0)
+    read = []
+    read_at_start = {}
+
+    def video_ids():
+        # Like the pages of a long playlist
+        for index in range(100):
+            read.append(index)
+            yield f"video{index:02d}"
+
+    def download_item(video_id, title_number, show_progress=False, video=None):
+        read_at_start.setdefault(video_id, len(read))
+        return True
+
+    monkeypatch.setattr(service, "download_item", download_item)
+    results = []
+
+    assert service.download_batch(video_ids(), results)
+
+    assert read_at_start["video00"] <= 2 * jobs + 1
+    assert len(results) == 100 and all(results)
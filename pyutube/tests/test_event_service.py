@@ -0,0 +1,92 @@
+import json
+import os
+from types import SimpleNamespace
+from urllib.error import URLError
+
+import pytest
+
+from pyutube.services.EventService import EventService, ProgressEvents
+
+
+@pytest.fixture
+def events(tmp_path, monkeypatch):
+    path = tmp_path / "events.jsonl"
+    monkeypatch.setattr(EventService, "enabled", False)
+    EventService.start(str(path))
+    yield lambda: [json.loads(line) for line in path.read_text().splitlines()]
+    EventService.output.close()
+
+
+def test_events_are_written_as_json_lines(events):
+    EventService.emit("queued", video_id="abc", index=0, total=1)
+    EventService.error(URLError("timed out"), video_id="abc")
+
+    queued, error = events()
+    assert queued["event"] == "queued" and queued["video_id"] == "abc"
+    assert error["event"] == "error"
+    assert error["error_class"] == "network"
+    assert error["error_type"] == "URLError"
+
+
+def test_progress_events_are_throttled(events):
+    stream = SimpleNamespace(itag=140, filesize=1000)
+    calls = []
+    progress = ProgressEvents("abc", [stream], lambda *args: calls.append(args))
+
+    for received in range(100, 1001, 100):
+        progress.on_progress(stream, b"x" * 100, stream.filesize - received)
+
+    reported = [event["bytes"] for event in events() if event["event"] == "progress"]
+    # The first chunk and the completion are reported, the chunks in between are not
+    assert reported == [100, 1000]
+    assert len(calls) == 10
+
+
+def test_progress_events_of_a_resumed_stream_count_its_speed_from_this_run(events):
+    stream = SimpleNamespace(itag=140, filesize=1000)
+    progress = ProgressEvents("abc", [stream])
+    progress.started -= 1
+
+    progress.on_progress(stream, b"x" * 100, 400)
+
+    event, = [event for event in events() if event["event"] == "progress"]
+    assert event["bytes"] == 600
+    assert 90 <= event["speed"] <= 100
+
+
+def test_metadata_errors_keep_their_class(events, tmp_path, monkeypatch):
+    from pyutube.services.DownloadService import DownloadService
+    from pyutube.services.VideoService import VideoService
+
+    def video_search(self):
+        raise URLError("timed out")
+
+    monkeypatch.setenv("PYUTUBE_NO_CACHE", "1")
+    monkeypatch.setattr(VideoService, "_VideoService__video_search", video_search)
+    service = DownloadService(None, str(tmp_path), "best", interactive=False, show_progress=False)
+
+    assert service.download_item("dQw4w9WgXcQ", "") is False
+    error, = [event for event in events() if event["event"] == "error"]
+    assert error["video_id"] == "dQw4w9WgXcQ"
+    assert error["error_class"] == "network"
+
+
+def test_events_on_stdout_are_not_mixed_with_the_other_output():
+    import subprocess
+    import sys
+
+    script = (
+        "import os, sys\n"
+        "from pyutube.services.EventService import EventService\n"
+        "EventService.start('-')\n"
+        "print('Select the videos')\n"
+        "sys.__stdout__.write('a prompt\\n'); sys.__stdout__.flush()\n"
+        "os.system('echo from ffmpeg')\n"
+        "EventService.emit('queued', video_id='abc', index=0, total=1)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=root)
+
+    queued, = [json.loads(line) for line in result.stdout.splitlines()]
+    assert queued["event"] == "queued" and "title" not in queued
+    assert result.stderr.split() == ["Select", "the", "videos", "a", "prompt", "from", "ffmpeg"]
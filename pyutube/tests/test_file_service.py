@@ -0,0 +1,16 @@
+import sys
+
+import pytest
+
+from pyutube.services.FileService import FileService
+
+
+@pytest.mark.parametrize("choice, new_name", [("Rename it", ""), ("Cancel", None)])
+def test_skipped_existing_files_have_no_filename(tmp_path, monkeypatch, choice, new_name):
+    (tmp_path / "video_720p.mp4").write_bytes(b"video")
+    monkeypatch.setattr(sys.modules[FileService.__module__], "ask_rename_file", lambda filename: choice)
+    monkeypatch.setattr(FileService, "prompt_new_filename", lambda self, filename: new_name)
+
+    filename = FileService().handle_existing_file(None, "dQw4w9WgXcQ", "video_720p.mp4", str(tmp_path))
+
+    assert filename is None
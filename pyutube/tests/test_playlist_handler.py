@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+from pytubefix import Playlist
+
+from pyutube.handlers.PlaylistHandler import PlaylistHandler
+
+
+def make_playlist_page(items: list) -> str:
+    data = {
+        "contents": {"twoColumnBrowseResultsRenderer": {"tabs": [{"tabRenderer": {"content": {
+            "sectionListRenderer": {"contents": [{"itemSectionRenderer": {"contents": [
+                {"playlistVideoListRenderer": {"contents": items}}
+            ]}}]}
+        }}}]}},
+        "responseContext": {"webResponseContextExtensionData": {"ytConfigData": {"visitorData": ""}}},
+    }
+    return f"<script>var ytInitialData = {json.dumps(data)};</script>"
+
+
+def test_playlist_videos_are_listed_from_the_playlist_pages():
+    items = [
+        {"playlistVideoRenderer": {"videoId": "dQw4w9WgXcQ", "title": {"runs": [{"text": "First: video"}]},
+                                   "lengthSeconds": "212"}},
+        {"richItemRenderer": {"content": {"shortsLockupViewModel": {
+            "onTap": {"innertubeCommand": {"reelWatchEndpoint": {"videoId": "abcdefghijk"}}},
+            "overlayMetadata": {"primaryText": {"content": "A short"}},
+        }}}},
+        {"somethingElse": {}},
+    ]
+    playlist = Playlist("https://www.youtube.com/playlist?list=PLynG8gQD-n8BM")
+    playlist._html = make_playlist_page(items)
+
+    videos = list(PlaylistHandler("", "").iter_playlist_videos(playlist))
+
+    assert videos == [("First video", "dQw4w9WgXcQ", 212), ("A short", "abcdefghijk", 0)]
+
+
+def test_playlist_videos_are_not_shared_between_handlers():
+    PlaylistHandler("", "").playlist_videos.append(("title", "video000000"))
+
+    assert PlaylistHandler("", "").playlist_videos == []
+
+
+def test_playlist_videos_fall_back_to_the_public_api():
+    # A pytubefix without the internals used to read the pages
+    playlist = SimpleNamespace(videos=[
+        SimpleNamespace(title="First: video", video_id="dQw4w9WgXcQ", length=212),
+        SimpleNamespace(title="Second", video_id="abcdefghijk", length=None),
+    ])
+
+    videos = list(PlaylistHandler("", "").iter_playlist_videos(playlist))
+
+    assert videos == [("First video", "dQw4w9WgXcQ", 212), ("Second", "abcdefghijk", 0)]
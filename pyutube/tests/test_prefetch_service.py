@@ -0,0 +1,52 @@
+import time
+
+from pytubefix import Stream
+from pytubefix.monostate import Monostate
+
+from pyutube.services.PrefetchService import PrefetchService
+
+
+class Video:
+    def __init__(self, video_id, expire):
+        self.video_id = video_id
+        self.fmt_streams = [Stream({
+            "url": f"https://example.com/videoplayback?expire={expire}&itag=140",
+            "itag": 140,
+            "mimeType": 'audio/mp4; codecs="mp4a.40.2"',
+            "is_otf": False,
+            "bitrate": 1000,
+        }, Monostate(None, None))]
+
+
+class FakePrefetchService(PrefetchService):
+    def __init__(self, video_ids, lookahead, expire):
+        super().__init__(video_ids, "", lookahead)
+        self.expire = expire
+        self.fetched = []
+
+    def fetch(self, video_id):
+        self.fetched.append(video_id)
+        return Video(video_id, self.expire)
+
+
+def test_prefetches_a_bounded_lookahead():
+    prefetch_service = FakePrefetchService(["a", "b", "c", "d", "e"], 2, int(time.time()) + 6 * 3600)
+    try:
+        assert prefetch_service.take(0) is None
+        assert sorted(prefetch_service.futures) == [1, 2]
+
+        assert prefetch_service.take(1).video_id == "b"
+        assert sorted(prefetch_service.futures) == [2, 3]
+    finally:
+        prefetch_service.close()
+
+
+def test_drops_videos_whose_urls_expire():
+    prefetch_service = FakePrefetchService(["a", "b"], 2, int(time.time()) + 60)
+    try:
+        prefetch_service.take(0)
+        prefetch_service.futures[1].result()
+
+        assert prefetch_service.take(1) is None
+    finally:
+        prefetch_service.close()
@@ -0,0 +1,48 @@
+import time
+from types import SimpleNamespace
+
+from pyutube.services.ProgressService import ProgressService
+
+
+def test_progress_of_all_downloads_is_rendered_with_a_total():
+    video = SimpleNamespace(itag=137, filesize=3 * 1024 * 1024)
+    audio = SimpleNamespace(itag=140, filesize=1024 * 1024)
+    first = ProgressService([video, audio], "first")
+    second = ProgressService([audio], "second")
+
+    first.on_progress(video, b"", video.filesize - 1024 * 1024)
+    first.on_progress(audio, b"", 0)
+    second.on_progress(audio, b"", audio.filesize)
+
+    ProgressService.active = [first, second]
+    try:
+        lines = ProgressService.render().plain.splitlines()
+    finally:
+        ProgressService.active = []
+
+    assert len(lines) == 3
+    assert " 50% 2.0/4.0 MB" in lines[0] and lines[0].endswith("first")
+    assert "  0% 0.0/1.0 MB" in lines[1]
+    assert " 40% 2.0/5.0 MB" in lines[2] and lines[2].endswith("Total (2 downloads)")
+
+
+def test_eta_is_unknown_without_speed():
+    assert ProgressService.format_line("name", 0, 100, 0).split("ETA ")[1] == "-:--  name"
+    assert "ETA 1:40" in ProgressService.format_line("name", 0, 100 * 1024, 1024)
+
+
+def test_resumed_bytes_count_for_the_progress_but_not_for_the_speed():
+    audio = SimpleNamespace(itag=140, filesize=4 * 1024 * 1024)
+    progress = ProgressService([audio], "resumed")
+    progress.started = time.monotonic() - 1
+
+    # Half of the stream was on disk, the first megabyte of this run arrives in one second
+    progress.on_progress(audio, b"x" * 1024 * 1024, 1024 * 1024)
+
+    ProgressService.active = [progress]
+    try:
+        line, = ProgressService.render().plain.splitlines()
+    finally:
+        ProgressService.active = []
+
+    assert " 75% 3.0/4.0 MB  1.0 MB/s  ETA 0:01" in line
@@ -0,0 +1,47 @@
+import pytest
+from pytubefix import Stream
+from pytubefix.monostate import Monostate
+
+from pyutube.services.QualityService import QualityService
+
+MONOSTATE = Monostate(None, None, "Title", 100)
+
+
+def make_stream(itag, height, bitrate, size=0):
+    return Stream({
+        "url": f"https://example.com/videoplayback?itag={itag}",
+        "itag": itag,
+        "mimeType": 'video/mp4; codecs="avc1.640028"' if height else 'audio/mp4; codecs="mp4a.40.2"',
+        "is_otf": False,
+        "bitrate": bitrate,
+        "contentLength": str(size),
+    }, MONOSTATE)
+
+
+STREAMS = [
+    make_stream(137, 1080, 4_000_000, 50_000_000),
+    make_stream(136, 720, 2_000_000, 25_000_000),
+    make_stream(135, 480, 1_000_000),
+    make_stream(160, 144, 100_000, 1_000_000),
+]
+AUDIO = make_stream(140, None, 128_000, 1_600_000)
+
+
+@pytest.mark.parametrize("policy, itag", [
+    ("best", 137),
+    ("smallest", 160),
+    ("720p", 136),
+    ("550p|nearest", 135),
+    ("600p|best", 137),
+    ("<=720p", 136),
+    ("<=2.5mbps", 136),
+    ("<=20MB", 135),
+    ("<=1kb", 160),
+])
+def test_select(policy, itag):
+    assert QualityService(policy).select(STREAMS, AUDIO).itag == itag
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        QualityService("huge")
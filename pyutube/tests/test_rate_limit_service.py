@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from pyutube.services.RateLimitService import RateLimitService, TokenBucket
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(200 * 1024)
+
+    started = time.monotonic()
+    for _ in range(10):
+        bucket.consume(30 * 1024)
+    elapsed = time.monotonic() - started
+
+    # 100 KiB go through at once, the other 200 KiB take a second
+    assert 0.8 <= elapsed <= 1.5
+
+
+def test_rate_change_applies_to_running_transfers():
+    bucket = RateLimitService.new_transfer()
+    try:
+        RateLimitService.set_rates(transfer_rate=1024)
+        assert bucket.rate == 1024
+    finally:
+        RateLimitService.set_rates(transfer_rate=0)
+
+    started = time.monotonic()
+    RateLimitService.throttle(bucket, 10 * 1024 * 1024)
+    assert time.monotonic() - started < 0.1
+
+
+@pytest.mark.parametrize("text, rate", [("0", 0), ("500k", 500 * 1024), ("2M", 2 * 1024 * 1024), ("1.5MB/s", 1.5 * 1024 * 1024)])
+def test_parse_rate(text, rate):
+    assert RateLimitService.parse_rate(text) == rate
+
+
+def test_sequential_downloads_are_rate_limited(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from pytubefix import request
+
+    from pyutube.services.TransferService import TransferService
+
+    throttled = []
+    monkeypatch.setattr(request, "stream", lambda url, **kwargs: iter([b"a" * 100, b"b" * 50]))
+    monkeypatch.setattr(
+        RateLimitService, "throttle", classmethod(lambda cls, bucket, amount, should_stop=None: throttled.append(amount)))
+    progress = []
+    stream = SimpleNamespace(
+        url="https://example.com/videoplayback", itag=140, filesize=150,
+        on_progress_for_chunks=lambda chunk, remaining: progress.append(remaining),
+        on_complete=lambda path: None)
+
+    TransferService().download_sequential(stream, str(tmp_path / "audio.m4a"))
+
+    assert throttled == [100, 50]
+    assert progress == [50, 0]
+    assert (tmp_path / "audio.m4a").read_bytes() == b"a" * 100 + b"b" * 50
@@ -0,0 +1,95 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from pyutube.handlers.ServerHandler import create_server
+from pyutube.services.JobService import JobService
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def download(job):
+        release.wait(5)
+        job.results = [True]
+        return "finished"
+
+    job_service = JobService(str(tmp_path), workers=1)
+    monkeypatch.setattr(job_service, "download", download)
+    server = create_server(job_service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        try:
+            with urlopen(Request(url, data=data, method=method, headers=headers), timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    yield request, release
+    release.set()
+    server.shutdown()
+    server.server_close()
+    job_service.shutdown()
+
+
+def test_jobs_are_queued_and_cancelled(server):
+    request, release = server
+
+    status, first = request("POST", "/jobs", {"url": "dQw4w9WgXcQ"})
+    assert status == 201
+    _, second = request("POST", "/jobs", {"url": "https://youtu.be/dQw4w9WgXcQ", "audio": True})
+
+    # The only worker is busy with the first job
+    _, metrics = request("GET", "/metrics")
+    assert metrics["queue_depth"] == 1
+
+    status, cancelled = request("DELETE", f"/jobs/{second['id']}")
+    assert status == 200 and cancelled["status"] == "cancelled"
+
+    release.set()
+    for _ in range(100):
+        _, first = request("GET", f"/jobs/{first['id']}")
+        if first["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert first["status"] == "finished" and first["downloaded"] == 1
+
+
+def test_invalid_requests_are_rejected(server):
+    request, _ = server
+
+    assert request("POST", "/jobs", {"url": "dQw4w9WgXcQ", "quality": "huge"})[0] == 400
+    assert request("POST", "/jobs", {})[0] == 400
+    assert request("GET", "/jobs/42")[0] == 404
+    assert request("PUT", "/rate", {"global": "fast"})[0] == 400
+
+
+def test_web_pages_and_other_directories_are_refused(server):
+    request, _ = server
+    job = {"url": "dQw4w9WgXcQ"}
+
+    assert request("POST", "/jobs", job, {"Origin": "https://example.com"})[0] == 403
+    assert request("POST", "/jobs", job, {"Content-Type": "text/plain"})[0] == 415
+    assert request("POST", "/jobs", {**job, "path": "../elsewhere"})[0] == 400
+    assert request("POST", "/jobs", {**job, "path": "/tmp"})[0] == 400
+    assert request("POST", "/jobs", {**job, "jobs": 1000})[0] == 400
+
+    status, accepted = request("POST", "/jobs", {**job, "path": "music"})
+    assert status == 201 and accepted["path"].endswith("music")
+
+
+def test_handlers_do_not_load_the_download_modules():
+    code = "import sys, pyutube.handlers; print('pytubefix' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from pyutube.services.TraceService import TraceService, traced
+
+
+@pytest.fixture
+def trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(TraceService, "events", [])
+    monkeypatch.setattr(TraceService, "threads", {})
+    monkeypatch.setattr(TraceService, "path", str(tmp_path / "trace.json"))
+    monkeypatch.setattr(TraceService, "enabled", True)
+    return tmp_path / "trace.json"
+
+
+def test_spans_are_written_in_chrome_trace_format(trace):
+    @traced("merge", "merge")
+    def merge():
+        pass
+
+    with TraceService.span("transfer", "transfer", itag=137) as args:
+        args["bytes"] = 1024
+    merge()
+    with pytest.raises(ValueError):
+        with TraceService.span("metadata"):
+            raise ValueError()
+    TraceService.save()
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+
+    assert set(spans) == {"transfer", "merge", "metadata"}
+    assert spans["transfer"]["args"]["itag"] == 137
+    assert "throughput" in spans["transfer"]["args"]
+    assert spans["metadata"]["args"]["error"] == "ValueError"
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in events)
+
+
+def test_spans_are_not_recorded_when_tracing_is_off(monkeypatch):
+    monkeypatch.setattr(TraceService, "events", [])
+    monkeypatch.setattr(TraceService, "enabled", False)
+
+    with TraceService.span("transfer") as args:
+        args["bytes"] = 1024
+
+    assert TraceService.events == []
@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from pyutube import utils
+from pyutube.services.FileService import FileService
+from pyutube.services.TransferService import TransferService
+
+MEDIA = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def media_server():
+    """A local media server that answers range requests like googlevideo, or ignores them."""
+    server = SimpleNamespace(ranges=True, requests=[])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            range_header = self.headers.get("Range")
+            server.requests.append(range_header)
+            if server.ranges and range_header:
+                start, end = (int(value) for value in range_header[len("bytes="):].split("-"))
+                end = min(end, len(MEDIA) - 1)
+                body = MEDIA[start:end + 1]
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(MEDIA)}")
+            else:
+                body = MEDIA
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{http_server.server_address[1]}/videoplayback?id=test"
+    yield server
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def make_stream(url: str, size: int = len(MEDIA)):
+    return SimpleNamespace(
+        url=url, itag=140, filesize=size,
+        on_progress_for_chunks=lambda chunk, remaining: None, on_complete=lambda path: None)
+
+
+def test_sequential_downloads_give_their_connections_back(media_server, tmp_path, monkeypatch):
+    from pytubefix import request
+
+    # A small pool, the leaked connections would block the download past its size
+    monkeypatch.setattr(utils, "_session", None)
+    monkeypatch.setattr(utils, "HTTP_POOL_SIZE", 2)
+    monkeypatch.setattr(request, "_execute_request", utils._execute_request)
+
+    def download_all():
+        for index in range(utils.HTTP_POOL_SIZE + 3):
+            TransferService().download_sequential(make_stream(media_server.url), str(tmp_path / f"{index}.m4a"))
+
+    thread = threading.Thread(target=download_all, daemon=True)
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert (tmp_path / f"{utils.HTTP_POOL_SIZE + 2}.m4a").read_bytes() == MEDIA
+
+
+def test_streams_are_downloaded_in_segments(media_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys.modules[TransferService.__module__], "MIN_SEGMENT_SIZE", 64 * 1024)
+    segment_size = len(MEDIA) // 4
+
+    assert TransferService(connections=4).download(make_stream(media_server.url), str(tmp_path / "audio.m4a"))
+
+    assert (tmp_path / "audio.m4a").read_bytes() == MEDIA
+    assert sorted(media_server.requests) == sorted(
+        f"bytes={start}-{start + segment_size - 1}" for start in range(0, len(MEDIA), segment_size))
+    assert os.listdir(tmp_path) == ["audio.m4a"]
+
+
+def test_servers_without_range_requests_fall_back_to_one_connection(media_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys.modules[TransferService.__module__], "MIN_SEGMENT_SIZE", 64 * 1024)
+    media_server.ranges = False
+
+    assert not TransferService(connections=4).download(make_stream(media_server.url), str(tmp_path / "audio.m4a"))
+    assert os.listdir(tmp_path) == []
+
+    FileService(connections=4).save_file(make_stream(media_server.url), "audio.m4a", str(tmp_path))
+    assert (tmp_path / "audio.m4a").read_bytes() == MEDIA
+
+
+def write_partial_download(file_path, video_id: str, ranges: list) -> None:
+    part = bytearray(len(MEDIA))
+    for start, end in ranges:
+        part[start:end + 1] = MEDIA[start:end + 1]
+    with open(f"{file_path}.part", "wb") as file:
+        file.write(part)
+    TransferService.save_state(str(file_path), {"video_id": video_id, "itag": 140, "size": len(MEDIA), "ranges": ranges})
+
+
+def test_unfinished_downloads_only_fetch_the_missing_ranges(media_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys.modules[TransferService.__module__], "MIN_SEGMENT_SIZE", 64 * 1024)
+    file_path = tmp_path / "audio.m4a"
+    half = len(MEDIA) // 2
+    write_partial_download(file_path, "dQw4w9WgXcQ", [[0, half - 1]])
+
+    assert TransferService(connections=2).has_partial_download(str(file_path), "dQw4w9WgXcQ")
+    assert TransferService(connections=2).download(make_stream(media_server.url), str(file_path), video_id="dQw4w9WgXcQ")
+
+    assert file_path.read_bytes() == MEDIA
+    quarter = len(MEDIA) // 4
+    assert sorted(media_server.requests) == [
+        f"bytes={half}-{half + quarter - 1}", f"bytes={half + quarter}-{len(MEDIA) - 1}"]
+    assert os.listdir(tmp_path) == ["audio.m4a"]
+
+
+def test_unfinished_downloads_of_another_video_start_over(media_server, tmp_path):
+    file_path = tmp_path / "audio.m4a"
+    write_partial_download(file_path, "abcdefghijk", [[0, len(MEDIA) // 2 - 1]])
+
+    assert TransferService().download(make_stream(media_server.url), str(file_path), video_id="dQw4w9WgXcQ")
+
+    assert file_path.read_bytes() == MEDIA
+    assert media_server.requests == [f"bytes=0-{len(MEDIA) - 1}"]
+
+
+def test_interrupted_downloads_are_resumed(media_server, tmp_path):
+    file_path = tmp_path / "audio.m4a"
+    received = []
+    stream = make_stream(media_server.url)
+    stream.on_progress_for_chunks = lambda chunk, remaining: received.append(len(chunk))
+
+    # Stopped after the first chunks, the received ranges are saved next to the .part file
+    TransferService(connections=1).download(stream, str(file_path), lambda: sum(received) >= 128 * 1024, "dQw4w9WgXcQ")
+    assert not file_path.exists()
+    saved = TransferService.load_state(str(file_path))["ranges"]
+    assert saved and saved[0][0] == 0
+
+    media_server.requests.clear()
+    assert TransferService(connections=1).download(make_stream(media_server.url), str(file_path), video_id="dQw4w9WgXcQ")
+
+    assert file_path.read_bytes() == MEDIA
+    assert media_server.requests == [f"bytes={saved[0][1] + 1}-{len(MEDIA) - 1}"]
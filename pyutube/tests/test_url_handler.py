@@ -0,0 +1,32 @@
+import pytest
+
+from pyutube.handlers.URLHandler import URLHandler, classify_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", ("video", "dQw4w9WgXcQ", None)),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLynG8gQD-n8BM", ("video", "dQw4w9WgXcQ", "PLynG8gQD-n8BM")),
+    ("https://www.youtube.com/watch?t=10&v=dQw4w9WgXcQ", ("video", "dQw4w9WgXcQ", None)),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", ("short", "dQw4w9WgXcQ", None)),
+    ("https://www.youtube.com/playlist?list=PLynG8gQD-n8BM", ("playlist", None, "PLynG8gQD-n8BM")),
+    ("https://youtu.be/dQw4w9WgXcQ?si=abc", ("video", "dQw4w9WgXcQ", None)),
+    ("dQw4w9WgXcQ", ("video", "dQw4w9WgXcQ", None)),
+    ("https://www.youtube.com/user/name/videos", ("unknown", None, None)),
+    ("https://www.youtube.com/watch?list=PLynG8gQD-n8BM", ("unknown", None, None)),
+])
+def test_classify_url(url, expected):
+    assert classify_url(url) == expected
+
+
+def test_classify_many_keeps_each_video_once():
+    links, rejected = URLHandler.classify_many([
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube.com/playlist?list=PLynG8gQD-n8BM",
+        "https://www.youtube.com/playlist?list=PLynG8gQD-n8BM",
+        "https://example.com/watch?v=dQw4w9WgXcQ",
+        "abcdefghijk",
+    ])
+
+    assert links == [("video", "dQw4w9WgXcQ"), ("playlist", "PLynG8gQD-n8BM"), ("video", "abcdefghijk")]
+    assert rejected == ["https://example.com/watch?v=dQw4w9WgXcQ"]
@@ -1,4 +1,5 @@
 import os
+import time
 import pytest
 from unittest.mock import patch
 
@@ -49,7 +50,7 @@ from pyutube.utils import is_youtube_video
      False, "error_missing_question_mark"),
     ("https://youtu.be/dQw4w9WgXcQextra", True, "error_extra_characters"),
     ("https://www.youtube.com/watch?time_continue=1&v=dQw4w9WgXcQ",
-     False, "error_unexpected_params"),
+     True, "video_id_after_other_params"),
 
     ("https://example.com/watch?v=dQw4w9WgXcQ", False, "non_youtube_domain"),
     ("https://www.youtube.com/watchv=dQw4w9WgXcQ", False, "typo_in_query"),
@@ -101,3 +102,63 @@ def test_is_youtube_link_error_cases(link, expected_result):
 
     # Assert
     assert result == expected_result
+
+
+def test_clear_does_not_write_into_a_pipe(monkeypatch):
+    from pyutube import utils
+
+    monkeypatch.setattr(utils.console, "quiet", True)
+    with patch("os.system") as system:
+        utils.clear()
+    system.assert_not_called()
+
+
+def test_shared_session_limits_the_connections_of_each_host():
+    from pyutube.utils import HTTP_POOL_SIZE, get_session
+
+    pool = get_session().get_adapter("https://www.youtube.com").poolmanager.connection_from_url(
+        "https://www.youtube.com")
+    assert pool.block
+    assert pool.pool.maxsize == HTTP_POOL_SIZE
+
+
+def test_failed_update_checks_are_not_repeated_on_every_run(tmp_path, monkeypatch):
+    from pyutube import utils
+
+    requests = []
+
+    class OfflineSession:
+        def get(self, url, **kwargs):
+            requests.append(url)
+            raise ConnectionError("No internet connection")
+
+    monkeypatch.setattr(utils, "get_cache_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(utils, "get_session", OfflineSession)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            utils.find_updates()
+    assert len(requests) == 1
+
+    # Retried once the failure is old enough
+    monkeypatch.setattr(utils.time, "time", lambda: os.path.getmtime(tmp_path / utils.UPDATE_CHECK_FILE)
+                        + utils.UPDATE_CHECK_FAILURE_TTL + 1)
+    with pytest.raises(ConnectionError):
+        utils.find_updates()
+    assert len(requests) == 2
+
+
+def test_network_errors_after_a_recent_request_are_not_reported_as_offline(monkeypatch):
+    from pyutube import utils
+
+    monkeypatch.setattr(utils, "_last_online", 0.0)
+    error = ConnectionError("Connection reset by peer")
+    assert utils.describe_error(error).startswith("No internet connection")
+
+    utils.mark_online()
+    assert utils.is_online()
+    assert utils.describe_error(error).startswith("The connection to YouTube failed")
+
+    # Only for a short while
+    monkeypatch.setattr(utils, "_last_online", time.monotonic() - utils.ONLINE_TTL - 1)
+    assert not utils.is_online()
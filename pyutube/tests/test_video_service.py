@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from pyutube.services.VideoService import VideoService
+
+
+def make_stream(itag, size=0, bitrate=8000):
+    return SimpleNamespace(itag=itag, _filesize=size, bitrate=bitrate, _monostate=SimpleNamespace(duration=10))
+
+
+def test_stream_sizes_come_from_the_manifest_or_are_fetched(monkeypatch):
+    fetched = []
+
+    def fetch_stream_size(stream):
+        fetched.append(stream.itag)
+        return 5000
+
+    monkeypatch.setattr(VideoService, "fetch_stream_size", staticmethod(fetch_stream_size))
+    streams = [make_stream(137, 1000), make_stream(140)]
+    sizes = VideoService.get_stream_sizes(streams)
+
+    assert sizes == {137: (1000, True), 140: (5000, True)}
+    assert fetched == [140]
+    assert streams[1]._filesize == 5000
+
+
+def test_slow_stream_sizes_are_estimated(monkeypatch):
+    def fetch_stream_size(stream):
+        time.sleep(0.5)
+        return 5000
+
+    monkeypatch.setattr(sys.modules[VideoService.__module__], "SIZE_LOOKUP_WAIT", 0.05)
+    monkeypatch.setattr(VideoService, "fetch_stream_size", staticmethod(fetch_stream_size))
+    stream = make_stream(140)
+    started = time.monotonic()
+    sizes = VideoService.get_stream_sizes([stream])
+
+    # 10 seconds at 8000 bits per second
+    assert sizes == {140: (10000, False)}
+    assert time.monotonic() - started < 0.4
+
+    # The late size is dropped, the stream (and its cached manifest) does not change after the menu
+    time.sleep(0.6)
+    assert stream._filesize == 0
+
+
+def test_concurrent_merges_do_not_share_a_directory(tmp_path, monkeypatch):
+    def ffmpeg_merge(video_path, audio_path, output_file, copy_video=True, copy_audio=True):
+        time.sleep(0.05)
+        with open(output_file, "wb") as file:
+            file.write(b"merged")
+
+    monkeypatch.setattr(VideoService, "ffmpeg_merge", staticmethod(ffmpeg_merge))
+    service = VideoService(None, "best", str(tmp_path), interactive=False)
+    for index in range(8):
+        (tmp_path / f"video{index}.mp4").write_bytes(b"video")
+        (tmp_path / f"video{index}_audio.m4a").write_bytes(b"audio")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(
+            lambda index: service.merging(f"video{index}.mp4", f"video{index}_audio.m4a"), range(8)))
+
+    assert sorted(os.path.basename(path) for path in paths) == [f"video{index}.mp4" for index in range(8)]
+    assert sorted(os.listdir(tmp_path)) == [f"video{index}.mp4" for index in range(8)]
+
+
+def test_merges_only_use_the_files_of_their_video(tmp_path):
+    (tmp_path / "video10.mp4").write_bytes(b"video")
+    (tmp_path / "video10_audio.m4a").write_bytes(b"audio")
+    service = VideoService(None, "best", str(tmp_path), interactive=False)
+
+    with pytest.raises(FileNotFoundError):
+        service.merging("video1.mp4", "video1_audio.m4a")
+
+    assert sorted(os.listdir(tmp_path)) == ["video10.mp4", "video10_audio.m4a"]
@@ -1,19 +1,22 @@
 """
 This module contains the utils functions for the pyutube package.
+
+Heavy modules (requests, inquirer, yaspin, pytubefix) are imported inside the
+functions that need them, so the CLI starts fast.
 """
 
+import atexit
+import functools
+import json
 import subprocess
 import sys
 import os
+import threading
+import time
 
-import requests
-import inquirer
-from yaspin import yaspin
-from yaspin.spinners import Spinners
 from rich.console import Console
 from rich.theme import Theme
 from termcolor import colored
-from pytubefix import __version__ as pytubefix_version
 
 
 __version__ = "1.5.0"
@@ -21,6 +24,29 @@ __app__ = "pyutube"
 ABORTED_PREFIX = "Aborted"
 CANCEL_PREFIX = "Cancel"
 
+UPDATE_CHECK_FILE = "update_check.json"
+UPDATE_CHECK_TTL = 24 * 60 * 60
+# A failed check (offline, PyPI down) is retried after this, the runs meanwhile never wait for it
+UPDATE_CHECK_FAILURE_TTL = 60 * 60
+NO_UPDATE_CHECK_ENV = "PYUTUBE_NO_UPDATE_CHECK"
+
+# A successful request is trusted as a sign of internet connection for this long,
+# a failed one is never remembered
+ONLINE_TTL = 60
+_last_online = 0.0
+
+ERROR_NETWORK = "network"
+ERROR_HTTP = "http"
+ERROR_UNAVAILABLE = "unavailable"
+ERROR_UNKNOWN = "unknown"
+
+# All the requests of the process share one keep-alive connection pool
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+HTTP_POOL_HOSTS = 20
+HTTP_POOL_SIZE = 16
+_session = None
+_session_lock = threading.Lock()
+
 
 # Set up the console
 custom_theme = Theme({
@@ -32,6 +58,48 @@ console = Console(theme=custom_theme)
 error_console = Console(stderr=True, style="red")
 
 
+def is_terminal_output() -> bool:
+    """
+    Check if the messages for humans are shown on a terminal.
+
+    Returns:
+        bool: False when stdout is redirected or the console is quiet, so no spinner
+        or progress bar is drawn into a file or a pipe.
+    """
+    return console.is_terminal and not console.quiet
+
+
+def with_spinner(text: str, color: str = "green", spinner: str = "point"):
+    """
+    Decorator that shows a yaspin spinner while the decorated function runs.
+
+    A new spinner is created for every call, and it is only shown on the main
+    thread of a terminal, so functions running inside the download worker pool
+    never fight over the terminal.
+
+    Args:
+        text (str): The text shown next to the spinner.
+        color (str): The color of the spinner.
+        spinner (str): The name of the yaspin spinner to use.
+
+    Returns:
+        The decorator.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if threading.current_thread() is not threading.main_thread() or not is_terminal_output():
+                return fn(*args, **kwargs)
+
+            from yaspin import yaspin
+            from yaspin.spinners import Spinners
+
+            with yaspin(text=text, color=color, spinner=getattr(Spinners, spinner)):
+                return fn(*args, **kwargs)
+        return inner
+    return decorator
+
+
 def clear() -> None:
     """
     Function to clear the console screen, it can be used for any operating system
@@ -42,6 +110,10 @@ def clear() -> None:
     Returns:
         It does not return anything (None).
     """
+    # The escape codes would end up in the pipe (like the JSON events on stdout)
+    if not is_terminal_output():
+        return
+
     # For Windows
     if os.name == "nt":
         os.system("cls")
@@ -50,20 +122,259 @@ def clear() -> None:
         os.system("clear")
 
 
-@yaspin(text="Checking internet connection", color="blue", spinner=Spinners.earth)
-def is_internet_available() -> bool:
+def mark_online() -> None:
+    """
+    Remember that a request to YouTube just succeeded, so there is internet connection.
+
+    Returns:
+        None
+    """
+    global _last_online
+    _last_online = time.monotonic()
+
+
+def is_online() -> bool:
+    """
+    Check if a request to YouTube succeeded in the last `ONLINE_TTL` seconds, without any request.
+
+    Returns:
+        bool: True if the connection was working a moment ago, False if it is unknown.
+    """
+    return bool(_last_online) and time.monotonic() - _last_online < ONLINE_TTL
+
+
+def get_session():
     """
-    Checks if internet connection is available by making a simple request
-    to http://www.google.com with a timeout of 5 seconds.
+    Get the HTTP session shared by all the network activity of the process.
+
+    The session keeps the connections alive and reuses them, up to
+    `HTTP_POOL_SIZE` connections for each of `HTTP_POOL_HOSTS` hosts.
+    The requests past this limit wait for a connection of their host to be free.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers.update(HTTP_HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+
+        return _session
+
+
+def get_connection_stats() -> dict:
+    """
+    Count the requests and the connections of the shared session, for each host.
 
     Returns:
-        bool: the request status (True if available, False if not).
+        dict: `{host: {"requests": n, "connections": n, "reused": n}}`, reused is the
+        number of requests that went over an already open connection.
     """
+    if _session is None:
+        return {}
+
+    stats = {}
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = stats.setdefault(pool.host, {"requests": 0, "connections": 0, "reused": 0})
+            host["requests"] += pool.num_requests
+            host["connections"] += pool.num_connections
+            host["reused"] += max(0, pool.num_requests - pool.num_connections)
+
+    return stats
+
+
+def use_shared_session() -> None:
+    """
+    Make pytubefix send its requests (watch pages, player JS, innertube, streams)
+    through the shared session, instead of opening a new connection for each one.
+
+    Returns:
+        None
+    """
+    from pytubefix import request
+
+    if getattr(request._execute_request, "shared_session", False):
+        return
+
+    request._execute_request = _execute_request
+
+
+def _execute_request(url, method=None, headers=None, data=None, timeout=None):
+    """
+    Send a pytubefix request through the shared session.
+
+    It behaves like `pytubefix.request._execute_request`: the response has the
+    `read()` and `info()` of a urllib response, and the errors are urllib errors.
+    """
+    import io
+    import socket
+    from urllib.error import HTTPError, URLError
+
+    import requests
+
+    if data and not isinstance(data, bytes):
+        data = bytes(json.dumps(data), encoding="utf-8")
+    if not url.lower().startswith("http"):
+        raise ValueError("Invalid URL")
+    if not isinstance(timeout, (int, float)):
+        timeout = None
+
     try:
-        requests.get("https://www.google.com", timeout=5)
-        return True
-    except Exception:
-        return False
+        response = get_session().request(
+            method or ("POST" if data else "GET"), url,
+            headers=headers, data=data, timeout=timeout, stream=True,
+        )
+    except requests.Timeout as error:
+        raise URLError(socket.timeout(str(error)))
+    except requests.RequestException as error:
+        raise URLError(error)
+
+    if response.status_code >= 400:
+        body = response.content
+        raise HTTPError(url, response.status_code, response.reason, response.headers, io.BytesIO(body))
+
+    if response.request.method == "HEAD":
+        # There is no body to read, give the connection back to the pool now
+        response.close()
+
+    return _SessionResponse(response)
+
+
+_execute_request.shared_session = True
+
+
+class _SessionResponse:
+    """A requests response with the interface of the urllib responses pytubefix reads."""
+
+    def __init__(self, response):
+        self.response = response
+        self.status = response.status_code
+        self.headers = response.headers
+
+    def read(self, amt=None) -> bytes:
+        data = self.response.raw.read(amt, decode_content=True)
+        if amt is None or not data:
+            # The body is read to the end, the connection goes back to the pool
+            self.response.raw.release_conn()
+        return data
+
+    def info(self):
+        return self.response.headers
+
+    def getcode(self) -> int:
+        return self.status
+
+    def close(self) -> None:
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        # pytubefix drops some responses without reading them (the size probe of
+        # `request.stream`), their connection must go back to the pool or the
+        # requests past `HTTP_POOL_SIZE` would wait for it forever
+        self.close()
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classify an error raised while talking to YouTube.
+
+    Args:
+        error: The raised error.
+
+    Returns:
+        str: One of `ERROR_NETWORK`, `ERROR_HTTP`, `ERROR_UNAVAILABLE` or `ERROR_UNKNOWN`.
+    """
+    import socket
+    from urllib.error import HTTPError, URLError
+
+    # Only check the libraries that are already loaded
+    requests = sys.modules.get("requests")
+    pytubefix_exceptions = sys.modules.get("pytubefix.exceptions")
+
+    if isinstance(error, HTTPError) or (requests and isinstance(error, requests.HTTPError)):
+        return ERROR_HTTP
+
+    if isinstance(error, (URLError, socket.timeout, socket.gaierror, ConnectionError, TimeoutError)):
+        return ERROR_NETWORK
+
+    if requests and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return ERROR_NETWORK
+
+    if pytubefix_exceptions and isinstance(error, pytubefix_exceptions.VideoUnavailable):
+        return ERROR_UNAVAILABLE
+
+    return ERROR_UNKNOWN
+
+
+def describe_error(error: BaseException) -> str:
+    """
+    Get a message for the user that explains an error raised while talking to YouTube.
+
+    Args:
+        error: The raised error.
+
+    Returns:
+        str: The message.
+    """
+    messages = {
+        # The connection worked a moment ago, it dropped or YouTube did not answer
+        ERROR_NETWORK: "The connection to YouTube failed" if is_online() else
+        "No internet connection, or YouTube can not be reached",
+        ERROR_HTTP: "YouTube answered with an error",
+        ERROR_UNAVAILABLE: "The video is unavailable",
+        ERROR_UNKNOWN: "Error",
+    }
+    return f"{messages[classify_error(error)]}: {error}"
+
+
+def is_youtube_link(link: str) -> tuple[bool, str]:
+    """
+    Check if the given link is a YouTube video, short or playlist link.
+
+    Args:
+        link: The link to be checked.
+
+    Returns:
+        tuple[bool, str]: Whether the link is valid, and its type (video, short, playlist or unknown).
+    """
+    from pyutube.handlers.URLHandler import classify_url
+
+    link_type = classify_url(link)[0]
+    return link_type != "unknown", link_type
+
+
+def is_youtube_video(link: str) -> bool:
+    """
+    Check if the given link is a YouTube video link.
+
+    Args:
+        link: The link to be checked.
+
+    Returns:
+        bool: True if the link is a video link, False otherwise.
+    """
+    return is_youtube_link(link) == (True, "video")
 
 
 def file_type() -> str:
@@ -77,6 +388,8 @@ def file_type() -> str:
     Returns:
         str: The chosen file type as a string.
     """
+    import inquirer
+
     # make the console font to red
     questions = [
         inquirer.List(
@@ -112,6 +425,8 @@ def ask_resolution(resolutions: set, sizes) -> str:
     Returns:
         str: The chosen resolution as a string.
     """
+    import inquirer
+
     # Create a dictionary to relate each size with its resolution
     size_resolution_mapping = dict(zip(resolutions, sizes))
 
@@ -152,6 +467,8 @@ def ask_rename_file(filename: str) -> str:
     Returns:
         str: The user's choice to rename, overwrite, or cancel the file operation.
     """
+    import inquirer
+
     console.print(
         f"'{filename}' is already exists, do you want to:", style="info")
     questions = [
@@ -165,6 +482,8 @@ def ask_rename_file(filename: str) -> str:
 
 
 def ask_playlist_video_names(videos):
+    import inquirer
+
     note = colored("NOTE:", "cyan")
     select_one = colored("<space>", "red")
     select_all = colored("<ctrl+a>", "red")
@@ -198,6 +517,8 @@ def ask_playlist_video_names(videos):
 
 
 def ask_for_make_playlist_in_order():
+    import inquirer
+
     # make_in_order = colored( "", "cyan")
 
     questions = [
@@ -221,6 +542,158 @@ def ask_for_make_playlist_in_order():
     return answer
 
 
+def get_cache_dir() -> str:
+    """
+    Get the directory where pyutube keeps its cache files, creating it if needed.
+
+    Returns:
+        str: The path of the cache directory.
+    """
+    if os.name == "nt":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+
+    cache_dir = os.path.join(base_dir, __app__)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_data_dir() -> str:
+    """
+    Get the directory where pyutube keeps its persistent data, creating it if needed.
+
+    Returns:
+        str: The path of the data directory.
+    """
+    if os.name == "nt":
+        base_dir = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base_dir = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+
+    data_dir = os.path.join(base_dir, __app__)
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def get_installed_versions() -> dict:
+    """
+    Get the installed version of the packages that are kept up to date.
+
+    The versions are read from the package metadata, so the packages are not imported.
+
+    Returns:
+        dict: The installed version of each package, pyutube falls back to its own version.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    installed_versions = {}
+    for library in ('pyutube', 'pytubefix'):
+        try:
+            installed_versions[library] = version(library)
+        except PackageNotFoundError:
+            if library == 'pyutube':
+                installed_versions[library] = __version__
+    return installed_versions
+
+
+def find_updates() -> dict:
+    """
+    Find the packages that have a newer version on PyPI.
+
+    The latest versions are cached on disk for `UPDATE_CHECK_TTL` seconds,
+    so PyPI is asked at most once a day. A failed check is cached for
+    `UPDATE_CHECK_FAILURE_TTL` seconds, so offline runs do not retry it every time.
+
+    Returns:
+        dict: The latest version of each package that can be updated.
+
+    Raises:
+        Exception: If PyPI could not be asked, or the failed check is still cached.
+    """
+    installed_versions = get_installed_versions()
+
+    cache_file = os.path.join(get_cache_dir(), UPDATE_CHECK_FILE)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+        ttl = UPDATE_CHECK_FAILURE_TTL if cache.get("failed") else UPDATE_CHECK_TTL
+        if time.time() - cache["checked_at"] > ttl:
+            raise ValueError("The update check cache is expired")
+        latest_versions = cache["versions"]
+
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        latest_versions = {}
+        try:
+            for library in installed_versions:
+                r = get_session().get(
+                    f'https://pypi.org/pypi/{library}/json', headers={'Accept': 'application/json'}, timeout=5)
+                r.raise_for_status()
+                latest_versions[library] = r.json()['info']['version']
+        except Exception:
+            write_update_check_cache(cache_file, {}, failed=True)
+            raise
+
+        write_update_check_cache(cache_file, latest_versions)
+
+    else:
+        if cache.get("failed"):
+            raise ConnectionError("The last update check failed, it is retried later")
+
+    return {
+        library: latest_version
+        for library, latest_version in latest_versions.items()
+        if library in installed_versions and latest_version != installed_versions[library]
+    }
+
+
+def write_update_check_cache(cache_file: str, latest_versions: dict, failed: bool = False) -> None:
+    try:
+        with open(cache_file, "w", encoding="utf-8") as file:
+            json.dump({"checked_at": time.time(), "versions": latest_versions, "failed": failed}, file)
+    except OSError:
+        # The check is only repeated sooner
+        pass
+
+
+def update_package(library: str, latest_version: str) -> None:
+    """
+    Update a package to its latest version with pip.
+
+    Args:
+        library (str): The name of the package.
+        latest_version (str): The latest version of the package.
+
+    Returns:
+        None
+    """
+    console.print(
+        f"👉 A new version of [blue]{library}[/blue] is available: {latest_version} " +
+        f"Updating it now... ",
+        style="warning"
+    )
+    # auto-update the package
+    try:
+        subprocess.check_call(
+            [sys.executable, '-m', 'pip', 'install', '--upgrade', library, '--break-system-packages'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        console.print(
+            f"✅ Successfully updated [blue]{library}[/blue] to version {latest_version}.",
+            style="success"
+        )
+    except subprocess.CalledProcessError as e:
+        error_console.print(
+            f"❗ Failed to update [blue]{library}[/blue]: {e.stderr.decode()}"
+        )
+        console.print(
+            f"❗ If you want to use the latest version of [blue]{library}[/blue], " +
+            "Update it by running [bold red link=https://github.com/Hetari/pyutube] " +
+            f"pip install --upgrade {library}[/bold red link]"
+        )
+
+
 def check_for_updates() -> None:
     """
     A function to check for updates of a given package or packages.
@@ -228,75 +701,48 @@ def check_for_updates() -> None:
     Returns:
         None
     """
-    libraries = {
-        'pyutube': {
-            'version': __version__,
-            'repository': 'https://github.com/Hetari/pyutube'
-        },
-        'pytubefix': {
-            'version': pytubefix_version,
-            'repository': 'https://github.com/Hetari/pytubefix'
-        }
-    }
-
     try:
-        for library, version in libraries.items():
-            r = requests.get(
-                f'https://pypi.org/pypi/{library}/json', headers={'Accept': 'application/json'})
-            if r.status_code == 200:
-                latest_version = r.json()['info']['version']
-
-                if latest_version != version['version']:
-                    console.print(
-                        f"👉 A new version of [blue]{library}[/blue] is available: {latest_version} " +
-                        f"Updating it now... ",
-                        style="warning"
-                    )
-                    # auto-update the package
-                    try:
-                        subprocess.check_call(
-                            [sys.executable, '-m', 'pip', 'install', '--upgrade', library, '--break-system-packages'],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE
-                        )
-                        console.print(
-                            f"✅ Successfully updated [blue]{library}[/blue] to version {latest_version}.",
-                            style="success"
-                        )
-                    except subprocess.CalledProcessError as e:
-                        error_console.print(
-                            f"❗ Failed to update [blue]{library}[/blue]: {e.stderr.decode()}"
-                        )
-                        console.print(
-                            f"❗ If you want to use the latest version of [blue]{library}[/blue], " +
-                            "Update it by running [bold red link=https://github.com/Hetari/pyutube] " +
-                            f"pip install --upgrade {library}[/bold red link]"
-                        )
-
-            else:
-                error_console.print(
-                    f"❗ Error checking for updates: {r.status_code}")
+        for library, latest_version in find_updates().items():
+            update_package(library, latest_version)
     except Exception as error:
         error_console.print(f"❗ Error checking for updates: {error}")
 
 
-# main utils
-def check_internet_connection() -> bool:
+def check_for_updates_in_background() -> None:
     """
-    Checks if an internet connection is available.
+    Check for updates in a background thread, so it never delays the download.
+
+    The packages are only updated when the program exits, and only if the check
+    finished by then. Set the `PYUTUBE_NO_UPDATE_CHECK` environment variable to
+    disable the check, for example in automated runs.
 
     Returns:
-        bool: True if internet connection is available, False otherwise.
+        None
     """
-    if not is_internet_available():
-        error_console.print("❗ No internet connection")
-        return False
+    if os.environ.get(NO_UPDATE_CHECK_ENV):
+        return
 
-    console.print("✅ There is internet connection", style="success")
-    console.print()
-    return True
+    updates = {}
 
+    def check():
+        try:
+            updates.update(find_updates())
+        except Exception:
+            # Never interrupt the download because of the update check
+            pass
 
+    thread = threading.Thread(target=check, daemon=True)
+    thread.start()
+
+    def install_updates():
+        thread.join(timeout=1)
+        for library, latest_version in dict(updates).items():
+            update_package(library, latest_version)
+
+    atexit.register(install_updates)
+
+
+# main utils
 def asking_video_or_audio() -> bool:
     """
     Handles video link scenario.